@@ -1,4 +1,5 @@
 from .domains import router as domains_router
 from .notifications import router as notifications_router
+from .whois import router as whois_router
 
-__all__ = ["domains_router", "notifications_router"] 
\ No newline at end of file
+__all__ = ["domains_router", "notifications_router", "whois_router"] 
\ No newline at end of file
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -6,6 +7,9 @@ from pydantic import BaseModel, Field
 
 from ..models.database import get_db
 from ..services.domain_service import DomainService
+from ..services.export_service import export_service
+from ..services.import_service import ImportService, iter_lines
+from ..tasks.scheduler import scheduler
 
 router = APIRouter(prefix="/domains", tags=["domains"])
 
@@ -72,6 +76,10 @@ class DomainResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
 @router.post("/", response_model=DomainResponse)
 async def create_domain(
     domain: DomainCreate,
@@ -89,21 +97,77 @@ async def create_domain(
 
 @router.get("/", response_model=List[DomainResponse])
 async def get_domains(
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of records to skip (ignored when a cursor is given)"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
     status_filter: Optional[str] = Query(None, description="Filter by status: active, warning, critical, expired, inactive"),
     search: Optional[str] = Query(None, description="Search term for domain name"),
+    match: str = Query("contains", description="How search matches: contains, prefix (start of the name) or label (start of any label)"),
+    tag: Optional[List[str]] = Query(None, description="Only domains with this tag; repeat or comma-separate for several"),
+    tag_mode: str = Query("any", description="With several tags: any (at least one) or all"),
+    sort: str = Query("expiration_date", description="Sort by: expiration_date, name, last_checked, created_at, days_left"),
+    order: str = Query("asc", description="Sort order: asc or desc"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    include_total: bool = Query(True, description="Count all matching domains into X-Total-Count"),
     db: Session = Depends(get_db)
 ):
-    """Get all domains with optional filtering"""
+    """
+    Get all domains with optional filtering
+    
+    The body stays a plain list. The cursor for the next page comes back in
+    the X-Next-Cursor header (absent on the last page) and the number of
+    matching domains in X-Total-Count.
+    """
     domain_service = DomainService(db)
-    domains = domain_service.get_all_domains(
-        skip=skip,
-        limit=limit,
-        status_filter=status_filter,
-        search=search
-    )
-    return domains
+    try:
+        page = domain_service.get_domain_page(
+            limit=limit,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            skip=skip,
+            status_filter=status_filter,
+            search=search,
+            include_total=include_total,
+            match=match,
+            tags=tag,
+            tag_mode=tag_mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if page['next_cursor']:
+        response.headers["X-Next-Cursor"] = page['next_cursor']
+    if page['total'] is not None:
+        response.headers["X-Total-Count"] = str(page['total'])
+    return page['items']
+
+@router.post("/import")
+async def import_domains(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson; taken from the Content-Type if omitted"),
+    enrich: bool = Query(False, description="Queue imported domains for a WHOIS check right away"),
+    db: Session = Depends(get_db)
+):
+    """
+    Import domains in bulk from a streamed CSV (with a header row) or NDJSON body
+    
+    Each row needs a name and an expiration_date and may set any other domain
+    field. Existing domains are skipped; rejected rows are listed in the
+    report with their row numbers.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = (format or ("ndjson" if "json" in content_type else "csv")).lower()
+    try:
+        report = await ImportService(db).import_stream(iter_lines(request.stream()), fmt, enrich=enrich)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    
+    if enrich and report['imported']:
+        scheduler.run_check_now()
+    return report
 
 @router.get("/statistics")
 async def get_domain_statistics(db: Session = Depends(get_db)):
@@ -112,6 +176,30 @@ async def get_domain_statistics(db: Session = Depends(get_db)):
     stats = domain_service.get_domain_statistics()
     return stats
 
+@router.get("/tags", response_model=List[TagCount])
+async def get_tag_facets(
+    status_filter: Optional[str] = Query(None, description="Filter by status: active, warning, critical, expired, inactive"),
+    search: Optional[str] = Query(None, description="Search term for domain name"),
+    match: str = Query("contains", description="How search matches: contains, prefix or label"),
+    tag: Optional[List[str]] = Query(None, description="Only count domains with this tag; repeat or comma-separate for several"),
+    tag_mode: str = Query("any", description="With several tags: any or all"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of tags to return"),
+    db: Session = Depends(get_db)
+):
+    """Number of domains per tag, most used first, among the domains matching the list filters"""
+    domain_service = DomainService(db)
+    try:
+        return domain_service.get_tag_facets(
+            status_filter=status_filter,
+            search=search,
+            match=match,
+            tags=tag,
+            tag_mode=tag_mode,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/expiring")
 async def get_expiring_domains(
     days_ahead: int = Query(90, ge=1, le=365, description="Number of days to look ahead"),
@@ -122,6 +210,39 @@ async def get_expiring_domains(
     domains = domain_service.get_expiring_domains(days_ahead=days_ahead)
     return domains
 
+@router.get("/export")
+async def export_domains(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Gzip the file"),
+    status_filter: Optional[str] = Query(None, description="Filter by status: active, warning, critical, expired, inactive"),
+    search: Optional[str] = Query(None, description="Search term for domain name"),
+    match: str = Query("contains", description="How search matches: contains, prefix or label"),
+    tag: Optional[List[str]] = Query(None, description="Only domains with this tag; repeat or comma-separate for several"),
+    tag_mode: str = Query("any", description="With several tags: any or all")
+):
+    """Download every (matching) domain as one streamed NDJSON or CSV file"""
+    fmt = format.lower()
+    try:
+        body = export_service.stream(
+            fmt,
+            compress=gzip,
+            status_filter=status_filter,
+            search=search,
+            match=match,
+            tags=tag,
+            tag_mode=tag_mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"domains-{datetime.utcnow():%Y%m%d}.{fmt}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/{domain_id}", response_model=DomainResponse)
 async def get_domain(domain_id: int, db: Session = Depends(get_db)):
     """Get domain by ID"""
@@ -166,7 +287,7 @@ async def refresh_whois_data(domain_id: int, db: Session = Depends(get_db)):
     """Refresh WHOIS data for domain"""
     try:
         domain_service = DomainService(db)
-        updated_domain = await domain_service.refresh_whois_data(domain_id)
+        updated_domain = await domain_service.refresh_whois_data(domain_id, force=True)
         if not updated_domain:
             raise HTTPException(status_code=404, detail="Domain not found")
         return updated_domain
@@ -178,7 +299,7 @@ async def check_whois_availability(domain_name: str, db: Session = Depends(get_d
     """Check if WHOIS data can be fetched for a domain"""
     try:
         domain_service = DomainService(db)
-        whois_data = await domain_service.whois_service.get_domain_info(domain_name)
+        whois_data = await domain_service.whois_service.get_domain_info(domain_name, force=True)
         
         if whois_data and 'error' not in whois_data:
             return {
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from pydantic import BaseModel
 
 from ..models.database import get_db
-from ..services.notification_service import NotificationService
+from ..services.notification_service import get_notification_service
+from ..services.reminder_service import ReminderService
+from ..services.sms_providers import sms_sender
+from ..tasks.scheduler import scheduler
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -14,6 +18,20 @@ class TestEmailRequest(BaseModel):
 class TestSMSRequest(BaseModel):
     phone: str
 
+class DeadLetterResponse(BaseModel):
+    id: int
+    domain_id: int
+    type: str
+    recipient: str
+    days_before_expiration: int
+    scheduled_at: datetime
+    retry_count: int
+    error_message: Optional[str]
+    updated_at: Optional[datetime]
+
+class RequeueRequest(BaseModel):
+    ids: Optional[List[int]] = None  # All dead letters if omitted
+
 @router.post("/test-email")
 async def test_email_configuration(
     request: TestEmailRequest,
@@ -21,7 +39,7 @@ async def test_email_configuration(
 ):
     """Test email configuration"""
     try:
-        notification_service = NotificationService()
+        notification_service = get_notification_service()
         success = await notification_service.test_email_configuration()
         if success:
             return {"message": "Email configuration test successful"}
@@ -37,7 +55,7 @@ async def test_sms_configuration(
 ):
     """Test SMS configuration"""
     try:
-        notification_service = NotificationService()
+        notification_service = get_notification_service()
         success = await notification_service.test_sms_configuration(request.phone)
         if success:
             return {"message": "SMS configuration test successful"}
@@ -50,7 +68,7 @@ async def test_sms_configuration(
 async def test_desktop_notification():
     """Test desktop notification"""
     try:
-        notification_service = NotificationService()
+        notification_service = get_notification_service()
         success = await notification_service.send_desktop_notification(
             domain_name="test-domain.com",
             days_until_expiration=30
@@ -60,4 +78,60 @@ async def test_desktop_notification():
         else:
             raise HTTPException(status_code=500, detail="Desktop notification test failed")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Desktop notification test failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Desktop notification test failed: {str(e)}") 
+
+@router.post("/reminders/rebuild")
+async def rebuild_reminders(db: Session = Depends(get_db)):
+    """Regenerate pending reminders for every domain"""
+    try:
+        return ReminderService(db).rebuild_all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reminder rebuild failed: {str(e)}")
+
+@router.get("/dispatcher")
+async def get_dispatcher_stats():
+    """Get the notification dispatcher's queue and counters"""
+    return scheduler.dispatcher.get_stats()
+
+@router.get("/outbox")
+async def get_outbox_stats():
+    """Get the notification outbox's workers, lease and counters"""
+    return scheduler.outbox.get_stats()
+
+@router.get("/sms")
+async def get_sms_stats():
+    """Get the SMS provider, its limits and send counters"""
+    return sms_sender.get_stats()
+
+@router.get("/dead-letter", response_model=List[DeadLetterResponse])
+async def get_dead_letters(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Get notifications that ran out of retries"""
+    notifications = scheduler.outbox.dead_letters(db, skip=skip, limit=limit)
+    return [
+        DeadLetterResponse(
+            id=notification.id,
+            domain_id=notification.domain_id,
+            type=notification.type.value,
+            recipient=notification.recipient,
+            days_before_expiration=notification.days_before_expiration,
+            scheduled_at=notification.scheduled_at,
+            retry_count=notification.retry_count,
+            error_message=notification.error_message,
+            updated_at=notification.updated_at
+        )
+        for notification in notifications
+    ]
+
+@router.post("/dead-letter/requeue")
+async def requeue_dead_letters(request: RequeueRequest, db: Session = Depends(get_db)):
+    """Send dead-lettered notifications again"""
+    try:
+        requeued = scheduler.outbox.requeue(db, request.ids)
+        scheduler.dispatcher.notify()
+        return {"requeued": requeued}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Requeue failed: {str(e)}")
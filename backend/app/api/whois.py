@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+
+from ..services.whois_cache import whois_cache
+from ..services.whois_engine import whois_engine
+from ..services.whois_service import get_inflight_stats, normalize_domain_name
+
+router = APIRouter(prefix="/whois", tags=["whois"])
+
+@router.get("/cache")
+async def get_cache_statistics():
+    """Get WHOIS cache hit/miss counters"""
+    return whois_cache.get_stats()
+
+@router.delete("/cache/{domain_name}")
+async def invalidate_cache_entry(domain_name: str):
+    """Drop a domain from the WHOIS cache so the next lookup goes to the registry"""
+    domain_name = normalize_domain_name(domain_name)
+    await whois_cache.invalidate(domain_name)
+    return {"message": f"WHOIS cache cleared for {domain_name}"}
+
+@router.get("/inflight")
+async def get_inflight_statistics():
+    """Get counters for coalesced concurrent lookups"""
+    return get_inflight_stats()
+
+@router.get("/servers")
+async def get_server_status():
+    """Get per-server concurrency, rate limiter and circuit breaker state"""
+    return whois_engine.get_stats()
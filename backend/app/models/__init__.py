@@ -1,5 +1,7 @@
 from .domain import Domain
+from .domain_tag import DomainTag
 from .notification import Notification
 from .user import User
+from .whois_cache import WhoisCacheEntry
 
-__all__ = ["Domain", "Notification", "User"] 
\ No newline at end of file
+__all__ = ["Domain", "DomainTag", "Notification", "User", "WhoisCacheEntry"] 
\ No newline at end of file
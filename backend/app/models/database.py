@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, Enum, MetaData, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from databases import Database
@@ -55,4 +55,43 @@ async def disconnect_db():
 
 def create_tables():
     """Create all tables"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
+
+def migrate_schema():
+    """
+    Bring existing tables up to date with the models
+
+    create_all only creates missing tables, so columns and indexes added to
+    a model after its table was created are added here, as are values added
+    to an enum on PostgreSQL. New columns must be nullable or have a server
+    default.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT '{default}'" if isinstance(default, str) else f" DEFAULT {default}"
+                connection.exec_driver_sql(ddl)
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True) 
+
+    if engine.dialect.name == "postgresql":
+        # ADD VALUE can't run inside a transaction block on older servers
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for table in Base.metadata.sorted_tables:
+                for column in table.columns:
+                    if isinstance(column.type, Enum) and column.type.native_enum:
+                        for value in column.type.enums:
+                            connection.exec_driver_sql(
+                                f"ALTER TYPE {column.type.name} ADD VALUE IF NOT EXISTS '{value}'"
+                            )
@@ -1,8 +1,73 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Index, and_, case, literal, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy.sql.expression import FunctionElement
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
 from .database import Base
 
+# A domain's status changes once its expiration date is less than this far
+# away, i.e. once days_until_expiration (whole days, rounded down) drops to
+# 0, 7 and 30
+EXPIRED_WITHIN = timedelta(days=1)
+CRITICAL_WITHIN = timedelta(days=8)
+WARNING_WITHIN = timedelta(days=31)
+
+DOMAIN_STATUSES = ("active", "warning", "critical", "expired", "inactive", "unknown")
+
+# The time the current request is served at, so every status and day count in it agrees
+_request_now: ContextVar[Optional[datetime]] = ContextVar("request_now", default=None)
+
+def current_time() -> datetime:
+    """The current request's time if one is pinned, else the current UTC time"""
+    return _request_now.get() or datetime.utcnow()
+
+@contextmanager
+def pinned_time(now: Optional[datetime] = None):
+    """Make current_time() return one fixed time inside the block"""
+    token = _request_now.set(now or datetime.utcnow())
+    try:
+        yield
+    finally:
+        _request_now.reset(token)
+
+MICROSECONDS_PER_DAY = 86400 * 1000000
+
+def epoch_microseconds(moment: datetime) -> int:
+    return (moment - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+
+class days_until(FunctionElement):
+    """
+    SQL for whole days from a time until a datetime column, rounded down like timedelta.days
+
+    Called as days_until(column, epoch_microseconds(now)); counting in integer
+    microseconds keeps it exact right up to each day boundary.
+    """
+    type = Integer()
+    inherit_cache = True
+
+@compiles(days_until, "sqlite")
+def _days_until_sqlite(element, compiler, **kw):
+    moment, now_us = [compiler.process(clause, **kw) for clause in element.clauses]
+    # Stored as 'YYYY-MM-DD HH:MM:SS.ffffff'. The seconds and the fraction are
+    # read separately, since SQLite's date functions round to milliseconds
+    moment_us = (
+        f"(CAST(strftime('%s', substr({moment}, 1, 19)) AS INTEGER) * 1000000"
+        f" + CAST(substr({moment}, 21, 6) AS INTEGER))"
+    )
+    # Integer division truncates towards zero, which rounds down only for
+    # positive numbers, so shift into them and back
+    offset = 1000000
+    return f"(({moment_us} - {now_us} + {offset * MICROSECONDS_PER_DAY}) / {MICROSECONDS_PER_DAY} - {offset})"
+
+@compiles(days_until, "postgresql")
+def _days_until_postgresql(element, compiler, **kw):
+    moment, now_us = [compiler.process(clause, **kw) for clause in element.clauses]
+    return f"CAST(floor((extract(epoch from {moment}) * 1000000 - {now_us}) / {MICROSECONDS_PER_DAY}) AS INTEGER)"
+
 class Domain(Base):
     __tablename__ = "domains"
     
@@ -23,6 +88,7 @@ class Domain(Base):
     is_active = Column(Boolean, default=True)
     last_checked = Column(DateTime, default=datetime.utcnow)
     whois_last_updated = Column(DateTime, nullable=True)
+    next_check_at = Column(DateTime, nullable=True, index=True)
     
     # Notes and tags
     notes = Column(Text, nullable=True)
@@ -41,41 +107,94 @@ class Domain(Base):
     # Relationships
     notifications = relationship("Notification", back_populates="domain", cascade="all, delete-orphan")
     
-    @property
+    # Keyset pagination walks the domain list in (sort key, id) order
+    __table_args__ = (
+        Index("ix_domains_expiration_date_id", "expiration_date", "id"),
+        Index("ix_domains_name_id", "name", "id"),
+        Index("ix_domains_last_checked_id", "last_checked", "id"),
+        Index("ix_domains_created_at_id", "created_at", "id"),
+    )
+    
+    @hybrid_property
     def days_until_expiration(self):
         """Calculate days until expiration"""
         if self.expiration_date:
-            delta = self.expiration_date - datetime.utcnow()
+            delta = self.expiration_date - current_time()
             return delta.days
         return None
     
+    @days_until_expiration.expression
+    def days_until_expiration(cls):
+        return days_until(cls.expiration_date, literal(epoch_microseconds(current_time()), Integer))
+    
     @property
     def is_expired(self):
         """Check if domain is expired"""
         if self.expiration_date:
-            return datetime.utcnow() > self.expiration_date
+            return current_time() > self.expiration_date
         return False
     
-    @property
+    @hybrid_property
     def status(self):
         """Get domain status"""
-        if not self.is_active:
+        return self.status_at(self.is_active, self.expiration_date, current_time())
+    
+    @status.expression
+    def status(cls):
+        now = current_time()
+        return case(
+            (or_(cls.is_active.is_(None), cls.is_active == False), "inactive"),
+            (cls.expiration_date.is_(None), "unknown"),
+            (cls.expiration_date < now + EXPIRED_WITHIN, "expired"),
+            (cls.expiration_date < now + CRITICAL_WITHIN, "critical"),
+            (cls.expiration_date < now + WARNING_WITHIN, "warning"),
+            else_="active"
+        )
+    
+    @staticmethod
+    def status_at(is_active, expiration_date, now):
+        """Status of a domain with these values at a given time, for callers working with plain rows"""
+        if not is_active:
             return "inactive"
-        if self.is_expired:
-            return "expired"
-        
-        days_left = self.days_until_expiration
-        if days_left is None:
+        if expiration_date is None:
             return "unknown"
-        elif days_left <= 0:
+        if expiration_date < now + EXPIRED_WITHIN:
             return "expired"
-        elif days_left <= 7:
+        elif expiration_date < now + CRITICAL_WITHIN:
             return "critical"
-        elif days_left <= 30:
+        elif expiration_date < now + WARNING_WITHIN:
             return "warning"
         else:
             return "active"
     
+    @classmethod
+    def status_condition(cls, status: str, now: datetime):
+        """
+        Filter for domains with a status at a given time, as ranges on expiration_date
+        
+        Matches exactly the domains status_at would give that status, but
+        unlike comparing the status expression it can use the index on
+        expiration_date.
+        
+        Raises:
+            ValueError: On an unknown status
+        """
+        if status not in DOMAIN_STATUSES:
+            raise ValueError(f"Unsupported status: {status}")
+        if status == "inactive":
+            return or_(cls.is_active.is_(None), cls.is_active == False)
+        active = cls.is_active == True
+        if status == "unknown":
+            return and_(active, cls.expiration_date.is_(None))
+        expires = cls.expiration_date
+        if status == "expired":
+            return and_(active, expires < now + EXPIRED_WITHIN)
+        if status == "critical":
+            return and_(active, expires >= now + EXPIRED_WITHIN, expires < now + CRITICAL_WITHIN)
+        if status == "warning":
+            return and_(active, expires >= now + CRITICAL_WITHIN, expires < now + WARNING_WITHIN)
+        return and_(active, expires >= now + WARNING_WITHIN)
+    
     @property
     def tag_list(self):
         """Get tags as a list"""
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from .database import Base
+
+class DomainTag(Base):
+    """One tag of a domain, the indexed form of Domain.tags"""
+    __tablename__ = "domain_tags"
+    
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(500), primary_key=True)  # Normalized: trimmed and lowercased
+    
+    # Finding a tag's domains and counting them reads only this index
+    __table_args__ = (
+        Index("ix_domain_tags_tag_domain_id", "tag", "domain_id"),
+    )
+    
+    def __repr__(self):
+        return f"<DomainTag(domain_id={self.domain_id}, tag='{self.tag}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum as PyEnum
@@ -14,12 +14,13 @@ class NotificationStatus(PyEnum):
     SENT = "sent"
     FAILED = "failed"
     CANCELLED = "cancelled"
+    DEAD_LETTER = "dead_letter"  # Out of retries; only requeued by hand
 
 class Notification(Base):
     __tablename__ = "notifications"
     
     id = Column(Integer, primary_key=True, index=True)
-    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False, index=True)
     
     # Notification details
     type = Column(Enum(NotificationType), nullable=False)
@@ -39,6 +40,15 @@ class Notification(Base):
     error_message = Column(Text, nullable=True)
     retry_count = Column(Integer, default=0)
     max_retries = Column(Integer, default=3)
+    next_attempt_at = Column(DateTime, nullable=True)  # When a failed notification is retried
+    
+    # Outbox delivery: the worker holding the row and until when, when a
+    # delivery attempt started that has no recorded outcome yet, plus a key
+    # that identifies this reminder across retries and redeliveries
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempted_at = Column(DateTime, nullable=True)
+    idempotency_key = Column(String(255), nullable=True, unique=True, index=True)
     
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -47,6 +57,12 @@ class Notification(Base):
     # Relationships
     domain = relationship("Domain", back_populates="notifications")
     
+    # The dispatcher and outbox look up due rows and due retries by status and time
+    __table_args__ = (
+        Index("ix_notifications_status_scheduled_at", "status", "scheduled_at"),
+        Index("ix_notifications_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    
     @property
     def is_due(self):
         """Check if notification is due to be sent"""
@@ -60,7 +76,8 @@ class Notification(Base):
         """Check if notification can be retried"""
         return (
             self.status == NotificationStatus.FAILED and
-            self.retry_count < self.max_retries
+            self.retry_count < self.max_retries and
+            (self.next_attempt_at is None or datetime.utcnow() >= self.next_attempt_at)
         )
     
     def mark_sent(self):
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, DateTime, Boolean, Text
+from datetime import datetime
+from .database import Base
+
+class WhoisCacheEntry(Base):
+    __tablename__ = "whois_cache"
+    
+    domain_name = Column(String(255), primary_key=True)
+    data = Column(Text, nullable=False)  # JSON-encoded lookup result
+    is_negative = Column(Boolean, default=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    @property
+    def is_expired(self):
+        """Check if the cached result is stale"""
+        return datetime.utcnow() >= self.expires_at
+    
+    def __repr__(self):
+        return f"<WhoisCacheEntry(domain='{self.domain_name}', expires='{self.expires_at}')>"
@@ -1,5 +1,5 @@
 from .domain_service import DomainService
-from .notification_service import NotificationService
+from .notification_service import NotificationService, get_notification_service
 from .whois_service import WhoisService
 
-__all__ = ["DomainService", "NotificationService", "WhoisService"] 
\ No newline at end of file
+__all__ = ["DomainService", "NotificationService", "WhoisService", "get_notification_service"] 
\ No newline at end of file
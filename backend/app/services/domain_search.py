@@ -0,0 +1,145 @@
+import logging
+from typing import Optional
+from sqlalchemy import Integer, column, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..models.database import engine as default_engine
+from ..models.domain import Domain
+
+logger = logging.getLogger(__name__)
+
+MATCH_MODES = ("contains", "prefix", "label")
+
+# Trigram indexes can't look up anything shorter than one trigram
+MIN_INDEXED_LENGTH = 3
+# Past this many matches a term is common enough that scanning in page order
+# fills a page sooner than fetching and sorting every match from the index
+COMMON_TERM_MATCHES = 2000
+
+SQLITE_SETUP = (
+    """CREATE VIRTUAL TABLE domains_fts USING fts5(
+        name, content='domains', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS domains_fts_insert AFTER INSERT ON domains BEGIN
+        INSERT INTO domains_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS domains_fts_delete AFTER DELETE ON domains BEGIN
+        INSERT INTO domains_fts(domains_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS domains_fts_update AFTER UPDATE OF name ON domains BEGIN
+        INSERT INTO domains_fts(domains_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO domains_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    # Index the domains that were there before the table existed
+    "INSERT INTO domains_fts(domains_fts) VALUES ('rebuild')"
+)
+
+POSTGRES_SETUP = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_domains_name_trgm ON domains USING gin (name gin_trgm_ops)"
+)
+
+class DomainSearch:
+    """
+    Indexed search on domain names.
+
+    On SQLite an FTS5 table with the trigram tokenizer mirrors domains.name,
+    kept in sync by triggers so every write path (including bulk imports)
+    updates it. On PostgreSQL a pg_trgm GIN index on name serves the same
+    LIKE '%term%' queries directly. Where neither is available searches fall
+    back to scanning the table.
+
+    Three ways of matching a term:
+      contains: anywhere in the name
+      prefix:   at the start of the name, a range scan on the name index
+      label:    at the start of any label, so "mail" finds mail.example.com
+                and mailbox.org but not gmail.com
+    Terms shorter than a trigram can't use the trigram index and are
+    matched with a scan. So are terms the index finds more than
+    COMMON_TERM_MATCHES times: their matches are dense enough that walking
+    the list's sort index finds a page within a few rows.
+    """
+
+    def __init__(self, engine: Engine = default_engine):
+        self.engine = engine
+        self.fts_enabled = False
+
+    def install(self):
+        """Create the search index if this database supports one (safe to run on every start)"""
+        dialect = self.engine.dialect.name
+        try:
+            if dialect == "sqlite":
+                self._install_sqlite()
+            elif dialect == "postgresql":
+                with self.engine.begin() as connection:
+                    for statement in POSTGRES_SETUP:
+                        connection.exec_driver_sql(statement)
+                logger.info("Domain search using the pg_trgm index")
+        except DBAPIError as e:
+            logger.warning(f"Domain search index unavailable, searches will scan the table: {str(e)}")
+
+    def _install_sqlite(self):
+        with self.engine.begin() as connection:
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'domains_fts'"
+            ).first()
+            if not exists:
+                for statement in SQLITE_SETUP:
+                    connection.exec_driver_sql(statement)
+                logger.info("Built the domain search index")
+        self.fts_enabled = True
+
+    def apply(self, query, search: Optional[str], match: str = "contains"):
+        """
+        Filter a Domain query to the names matching a search term
+
+        Args:
+            query: Query over Domain (or its columns)
+            search: The term; ignored if blank
+            match: One of MATCH_MODES
+
+        Raises:
+            ValueError: On an unknown match mode
+        """
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unsupported match mode: {match}")
+        term = (search or "").strip().lower()
+        if not term:
+            return query
+
+        name = Domain.name
+        if match == "prefix":
+            # The range lets the name index find the rows; LIKE keeps the result exact under any collation
+            return query.filter(name >= term, name < term[:-1] + chr(ord(term[-1]) + 1), name.startswith(term, autoescape=True))
+
+        if self.fts_enabled and len(term) >= MIN_INDEXED_LENGTH and not self._is_common(query.session, term):
+            query = query.filter(Domain.id.in_(self._fts_ids(term)))
+            if match == "contains":
+                return query
+        elif match == "contains":
+            return query.filter(name.contains(term, autoescape=True))
+
+        return query.filter(or_(name.startswith(term, autoescape=True), name.contains("." + term, autoescape=True)))
+
+    def _is_common(self, db: Session, term: str) -> bool:
+        """Whether the index holds more than COMMON_TERM_MATCHES matches for term (reads no more than that)"""
+        probe = text(
+            "SELECT count(*) FROM (SELECT 1 FROM domains_fts WHERE domains_fts MATCH :domain_search LIMIT :probe_limit)"
+        )
+        matches = db.execute(probe, {'domain_search': self._phrase(term), 'probe_limit': COMMON_TERM_MATCHES + 1}).scalar()
+        return matches > COMMON_TERM_MATCHES
+
+    def _fts_ids(self, term: str):
+        """IDs of the domains whose name contains term, from the FTS5 index"""
+        return text(
+            "SELECT rowid FROM domains_fts WHERE domains_fts MATCH :domain_search"
+        ).bindparams(domain_search=self._phrase(term)).columns(column("rowid", Integer))
+
+    def _phrase(self, term: str) -> str:
+        # One quoted phrase, so punctuation in the term is matched literally
+        return '"' + term.replace('"', '""') + '"'
+
+# Global search instance
+domain_search = DomainSearch()
@@ -6,22 +6,30 @@ import logging
 import os
 from dotenv import load_dotenv
 
-from ..models.domain import Domain
+from ..models.domain import Domain, current_time
 from ..models.notification import Notification, NotificationType, NotificationStatus
-from .whois_service import WhoisService
+from .domain_stats import domain_stats
+from .domain_search import domain_search
+from .pagination import decode_cursor, keyset_filter, keyset_order, page_result
+from .refresh_planner import refresh_planner
+from .reminder_service import ReminderService, REMINDER_FIELDS
+from .tag_service import TagService, normalize_tags
+from .whois_service import WhoisService, normalize_domain_name
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 class DomainService:
+    # Sort keys the domain list supports, each backed by a (key, id) index
+    SORT_KEYS = ("expiration_date", "name", "last_checked", "created_at", "days_left")
+    # Days left only ever grows with the expiration date, so it sorts by that column
+    SORT_COLUMNS = {"days_left": "expiration_date"}
+    
     def __init__(self, db: Session):
         self.db = db
         self.whois_service = WhoisService()
-        self.default_reminder_days = [
-            int(day.strip()) 
-            for day in os.getenv("DEFAULT_REMINDER_DAYS", "90,30,14,7,3,1").split(",")
-            if day.strip().isdigit()
-        ]
+        self.reminder_service = ReminderService(db)
+        self.tag_service = TagService(db)
     
     async def create_domain(
         self,
@@ -33,11 +41,7 @@ class DomainService:
         """Create a new domain entry"""
         try:
             # Clean domain name
-            name = name.lower().strip()
-            if name.startswith(('http://', 'https://')):
-                name = name.split('://')[1]
-            if '/' in name:
-                name = name.split('/')[0]
+            name = normalize_domain_name(name)
             
             # Check if domain already exists
             existing_domain = self.db.query(Domain).filter(Domain.name == name).first()
@@ -45,11 +49,13 @@ class DomainService:
                 raise ValueError(f"Domain {name} already exists")
             
             # Create domain object
+            now = datetime.utcnow()
             domain_data = {
                 'name': name,
                 'expiration_date': expiration_date,
                 'registrar': registrar,
-                'last_checked': datetime.utcnow(),
+                'last_checked': now,
+                'next_check_at': refresh_planner.next_check_at(name, expiration_date, now),
                 **kwargs
             }
             
@@ -58,6 +64,11 @@ class DomainService:
             self.db.commit()
             self.db.refresh(domain)
             
+            domain_stats.record_change(None, (domain.is_active, domain.expiration_date))
+            self.reminder_service.sync_domains([domain.id])
+            if domain.tags:
+                self.tag_service.sync_domains([domain.id])
+            
             logger.info(f"Created domain: {name}")
             return domain
             
@@ -79,40 +90,133 @@ class DomainService:
         skip: int = 0,
         limit: int = 100,
         status_filter: Optional[str] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        tag_mode: str = "any"
     ) -> List[Domain]:
-        """Get all domains with optional filtering"""
-        query = self.db.query(Domain)
+        """Get all domains with optional filtering, soonest expiry first"""
+        return self.get_domain_page(
+            limit=limit,
+            skip=skip,
+            status_filter=status_filter,
+            search=search,
+            include_total=False,
+            tags=tags,
+            tag_mode=tag_mode
+        )['items']
+    
+    def get_domain_page(
+        self,
+        limit: int = 100,
+        sort: str = "expiration_date",
+        order: str = "asc",
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        status_filter: Optional[str] = None,
+        search: Optional[str] = None,
+        include_total: bool = True,
+        match: str = "contains",
+        tags: Optional[List[str]] = None,
+        tag_mode: str = "any"
+    ) -> Dict[str, Any]:
+        """
+        Get one page of domains, ordered by a sort key and then ID
+        
+        With a cursor the page starts right after the row it points to, using
+        the (sort key, id) index, so every page costs the same however deep it
+        is. skip still works for offset paging but gets slower with depth.
+        
+        Args:
+            limit: Page size
+            sort: One of SORT_KEYS
+            order: "asc" or "desc"
+            cursor: next_cursor from the previous page
+            skip: Rows to skip when no cursor is given
+            status_filter: active, warning, critical, expired, inactive or unknown
+            search: Term to look for in the domain name
+            include_total: Also count every matching domain
+            match: How search matches: contains, prefix or label
+            tags: Only domains with these tags
+            tag_mode: "any" (at least one of the tags) or "all"
+            
+        Returns:
+            Dict with the page's 'items', a 'next_cursor' (None on the last
+            page) and the 'total' (None if not counted)
+            
+        Raises:
+            ValueError: On an unknown sort key, order, status, match or tag mode, or an invalid cursor
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unsupported sort order: {order}")
+        column = getattr(Domain, self.SORT_COLUMNS.get(sort, sort))
+        
+        query = self.filter_domains(self.db.query(Domain), status_filter, search, match, tags, tag_mode)
+        total = query.count() if include_total else None
+        
+        if cursor:
+            value, row_id = decode_cursor(cursor, sort, order)
+            query = query.filter(keyset_filter(column, Domain.id, order, value, row_id))
+        query = query.order_by(*keyset_order(column, Domain.id, order))
+        if skip and not cursor:
+            query = query.offset(skip)
+        
+        # One row past the page tells whether there is a next one
+        items = query.limit(limit + 1).all()
+        return page_result(items, limit, sort, order, lambda domain: getattr(domain, column.key), total)
+    
+    def filter_domains(
+        self,
+        query,
+        status_filter: Optional[str] = None,
+        search: Optional[str] = None,
+        match: str = "contains",
+        tags: Optional[List[str]] = None,
+        tag_mode: str = "any",
+        now: Optional[datetime] = None
+    ):
+        """
+        Apply the list view's search, tag and status filters to a Domain query
         
+        now is the time statuses are judged at, current_time() by default;
+        pass it when the rows will be rendered at a time captured earlier.
+        """
         # Apply search filter
-        if search:
-            query = query.filter(Domain.name.contains(search.lower()))
+        query = domain_search.apply(query, search, match)
         
-        # Apply status filter
+        # Apply tag filter
+        query = self.tag_service.filter(query, tags, tag_mode)
+        
+        # Apply status filter, with the same boundaries as Domain.status
         if status_filter:
-            now = datetime.utcnow()
-            if status_filter == "expired":
-                query = query.filter(Domain.expiration_date < now)
-            elif status_filter == "critical":
-                query = query.filter(
-                    and_(
-                        Domain.expiration_date >= now,
-                        Domain.expiration_date <= now + timedelta(days=7)
-                    )
-                )
-            elif status_filter == "warning":
-                query = query.filter(
-                    and_(
-                        Domain.expiration_date > now + timedelta(days=7),
-                        Domain.expiration_date <= now + timedelta(days=30)
-                    )
-                )
-            elif status_filter == "active":
-                query = query.filter(Domain.expiration_date > now + timedelta(days=30))
-            elif status_filter == "inactive":
-                query = query.filter(Domain.is_active == False)
+            query = query.filter(Domain.status_condition(status_filter, now or current_time()))
+        
+        return query
+    
+    def get_tag_facets(
+        self,
+        status_filter: Optional[str] = None,
+        search: Optional[str] = None,
+        match: str = "contains",
+        tags: Optional[List[str]] = None,
+        tag_mode: str = "any",
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Count domains per tag, optionally among those matching the list filters
+        
+        Without filters the counts come straight from the tag index.
         
-        return query.offset(skip).limit(limit).all()
+        Returns:
+            List of {'tag', 'count'}, most used first
+            
+        Raises:
+            ValueError: On an unknown status, match or tag mode
+        """
+        domain_query = self.filter_domains(self.db.query(Domain.id), status_filter, search, match, tags, tag_mode)
+        filtered = bool(status_filter or (search and search.strip()) or normalize_tags(tags))
+        return self.tag_service.facets(domain_query if filtered else None, limit)
     
     async def update_domain(self, domain_id: int, **kwargs) -> Optional[Domain]:
         """Update domain information"""
@@ -121,15 +225,32 @@ class DomainService:
             if not domain:
                 return None
             
+            before = (domain.is_active, domain.expiration_date)
+            
             # Update fields
+            reminders_changed = False
             for key, value in kwargs.items():
                 if hasattr(domain, key):
+                    if key in REMINDER_FIELDS and getattr(domain, key) != value:
+                        reminders_changed = True
                     setattr(domain, key, value)
             
+            # A new expiry date moves the domain's place in the refresh queue
+            if 'expiration_date' in kwargs and 'next_check_at' not in kwargs:
+                domain.next_check_at = refresh_planner.next_check_at(domain.name, domain.expiration_date)
+            
             domain.updated_at = datetime.utcnow()
             self.db.commit()
             self.db.refresh(domain)
             
+            domain_stats.record_change(before, (domain.is_active, domain.expiration_date))
+            
+            # Only this domain's pending reminders depend on what changed
+            if reminders_changed:
+                self.reminder_service.sync_domains([domain.id])
+            if 'tags' in kwargs:
+                self.tag_service.sync_domains([domain.id])
+            
             logger.info(f"Updated domain: {domain.name}")
             return domain
             
@@ -145,8 +266,11 @@ class DomainService:
             if not domain:
                 return False
             
+            before = (domain.is_active, domain.expiration_date)
+            self.tag_service.delete_domain_tags(domain.id)
             self.db.delete(domain)
             self.db.commit()
+            domain_stats.record_change(before, None)
             
             logger.info(f"Deleted domain: {domain.name}")
             return True
@@ -156,51 +280,100 @@ class DomainService:
             logger.error(f"Failed to delete domain {domain_id}: {str(e)}")
             raise e
     
-    async def refresh_whois_data(self, domain_id: int) -> Optional[Domain]:
-        """Refresh WHOIS data for a domain"""
+    async def refresh_whois_data(self, domain_id: int, force: bool = False) -> Optional[Domain]:
+        """Refresh WHOIS data for a domain (force skips the WHOIS cache)"""
         try:
             domain = self.get_domain(domain_id)
             if not domain:
                 return None
             
-            whois_data = await self.whois_service.get_domain_info(domain.name)
-            
-            # Always update last_checked, even if WHOIS fails
-            updates = {'last_checked': datetime.utcnow()}
-            
-            if not whois_data or 'error' in whois_data:
-                error_msg = whois_data.get('error', 'Unknown WHOIS error') if whois_data else 'No WHOIS data returned'
-                logger.warning(f"Failed to fetch WHOIS data for {domain.name}: {error_msg}")
-                
-                # Still update the domain to mark it as checked
-                return await self.update_domain(domain_id, **updates)
-            
-            # Update domain with WHOIS data
-            if 'expiration_date' in whois_data and whois_data['expiration_date']:
-                updates['expiration_date'] = whois_data['expiration_date']
-            if 'registrar' in whois_data and whois_data['registrar']:
-                updates['registrar'] = whois_data['registrar']
-            if 'registration_date' in whois_data and whois_data['registration_date']:
-                updates['registration_date'] = whois_data['registration_date']
-            if 'admin_email' in whois_data and whois_data['admin_email']:
-                updates['admin_email'] = whois_data['admin_email']
-            
-            updates['whois_last_updated'] = datetime.utcnow()
+            whois_data = await self.whois_service.get_domain_info(domain.name, force=force)
             
+            # Always update last_checked and plan the next check, even if WHOIS fails
+            updates = self.build_whois_updates(domain.name, domain.expiration_date, whois_data)
             return await self.update_domain(domain_id, **updates)
             
         except Exception as e:
             logger.error(f"Failed to refresh WHOIS data for domain {domain_id}: {str(e)}")
             # Try to at least update the last_checked timestamp
             try:
-                await self.update_domain(domain_id, last_checked=datetime.utcnow())
+                domain = self.get_domain(domain_id)
+                await self.update_domain(
+                    domain_id,
+                    **self.build_whois_updates(domain.name, domain.expiration_date, None)
+                )
             except:
                 pass
             raise e
     
+    def build_whois_updates(
+        self,
+        domain_name: str,
+        expiration_date: Optional[datetime],
+        whois_data: Optional[Dict[str, Any]],
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Work out the column updates for a domain after a WHOIS check
+        
+        Args:
+            domain_name: Domain name that was checked
+            expiration_date: Expiration date currently stored for the domain
+            whois_data: Lookup result, None or an error dict if the check failed
+            now: Time of the check, defaults to the current UTC time
+            
+        Returns:
+            Column values to write, always including last_checked and next_check_at
+        """
+        now = now or datetime.utcnow()
+        updates = {'last_checked': now}
+        
+        if not whois_data or 'error' in whois_data:
+            error_msg = whois_data.get('error', 'Unknown WHOIS error') if whois_data else 'No WHOIS data returned'
+            logger.warning(f"Failed to fetch WHOIS data for {domain_name}: {error_msg}")
+        else:
+            for field in ('expiration_date', 'registrar', 'registration_date', 'admin_email'):
+                if whois_data.get(field):
+                    updates[field] = whois_data[field]
+            updates['whois_last_updated'] = now
+        
+        updates['next_check_at'] = refresh_planner.next_check_at(
+            domain_name, updates.get('expiration_date', expiration_date), now
+        )
+        return updates
+    
+    def apply_whois_updates(self, updates: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Write the results of many WHOIS checks in one transaction
+        
+        Args:
+            updates: Column updates keyed by domain ID, as built by build_whois_updates
+            
+        Returns:
+            Number of domains updated
+        """
+        if not updates:
+            return 0
+        try:
+            now = datetime.utcnow()
+            self.db.bulk_update_mappings(Domain, [
+                {'id': domain_id, 'updated_at': now, **values}
+                for domain_id, values in updates.items()
+            ])
+            self.db.commit()
+            # Bulk writes don't carry the old dates the snapshot would need
+            if any('expiration_date' in values for values in updates.values()):
+                domain_stats.invalidate()
+            return len(updates)
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to write WHOIS results for {len(updates)} domains: {str(e)}")
+            raise e
+    
     def get_expiring_domains(self, days_ahead: int = 90) -> List[Domain]:
         """Get domains expiring within specified days"""
-        cutoff_date = datetime.utcnow() + timedelta(days=days_ahead)
+        cutoff_date = current_time() + timedelta(days=days_ahead)
         return self.db.query(Domain).filter(
             and_(
                 Domain.is_active == True,
@@ -210,44 +383,59 @@ class DomainService:
     
     def get_domain_statistics(self) -> Dict[str, Any]:
         """Get domain statistics"""
-        now = datetime.utcnow()
-        
-        total_domains = self.db.query(Domain).filter(Domain.is_active == True).count()
-        expired_domains = self.db.query(Domain).filter(
-            and_(Domain.is_active == True, Domain.expiration_date < now)
-        ).count()
-        critical_domains = self.db.query(Domain).filter(
-            and_(
-                Domain.is_active == True,
-                Domain.expiration_date >= now,
-                Domain.expiration_date <= now + timedelta(days=7)
-            )
-        ).count()
-        warning_domains = self.db.query(Domain).filter(
-            and_(
-                Domain.is_active == True,
-                Domain.expiration_date > now + timedelta(days=7),
-                Domain.expiration_date <= now + timedelta(days=30)
-            )
-        ).count()
-        
-        return {
-            'total_domains': total_domains,
-            'expired_domains': expired_domains,
-            'critical_domains': critical_domains,
-            'warning_domains': warning_domains,
-            'active_domains': total_domains - expired_domains
-        }
-    
-    def get_domains_needing_check(self, hours_since_last_check: int = 24) -> List[Domain]:
-        """Get domains that need WHOIS checking"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours_since_last_check)
-        return self.db.query(Domain).filter(
+        return domain_stats.get(self.db)
+    
+    def get_domains_needing_check(self, limit: Optional[int] = None) -> List[Domain]:
+        """
+        Get domains whose planned WHOIS check is due, most overdue first
+
+        Args:
+            limit: Maximum number of domains to return
+
+        Returns:
+            Due domains ordered by next_check_at
+        """
+        query = self.db.query(Domain).filter(
             and_(
                 Domain.is_active == True,
-                or_(
-                    Domain.last_checked < cutoff_time,
-                    Domain.last_checked.is_(None)
-                )
+                Domain.next_check_at <= datetime.utcnow()
             )
-        ).all() 
\ No newline at end of file
+        ).order_by(Domain.next_check_at)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    
+    def plan_unscheduled_domains(self) -> int:
+        """
+        Give every domain without a planned check a next_check_at
+
+        Domains are spread across their first refresh interval rather than
+        all coming due at once.
+
+        Returns:
+            Number of domains planned
+        """
+        try:
+            now = datetime.utcnow()
+            rows = self.db.query(Domain.id, Domain.name, Domain.expiration_date).filter(
+                Domain.next_check_at.is_(None)
+            ).all()
+            if not rows:
+                return 0
+            
+            self.db.bulk_update_mappings(Domain, [
+                {
+                    'id': row.id,
+                    'next_check_at': refresh_planner.next_check_at(row.name, row.expiration_date, now, initial=True)
+                }
+                for row in rows
+            ])
+            self.db.commit()
+            
+            logger.info(f"Planned first WHOIS check for {len(rows)} domains")
+            return len(rows)
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to plan WHOIS checks: {str(e)}")
+            raise e
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+
+from ..models.domain import CRITICAL_WITHIN, EXPIRED_WITHIN, WARNING_WITHIN, Domain, current_time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Each bucket holds the active domains expiring before now plus its boundary,
+# the same boundaries Domain.status uses
+BOUNDARIES = (('expired', EXPIRED_WITHIN), ('critical', CRITICAL_WITHIN), ('warning', WARNING_WITHIN))
+
+# (is_active, expiration_date) of a domain, or None if it doesn't exist
+DomainState = Optional[Tuple[bool, Optional[datetime]]]
+
+def bucket_at(state: DomainState, at: datetime) -> Optional[str]:
+    """Which statistics bucket a domain falls in at a given time, None if it isn't counted"""
+    if state is None or not state[0] or state[1] is None:
+        return None
+    for bucket, within in BOUNDARIES:
+        if state[1] < at + within:
+            return bucket
+    return 'later'
+
+def next_crossing(expiration_date: datetime, at: datetime) -> Optional[datetime]:
+    """When a domain next moves to a more urgent bucket, None if it never will"""
+    candidates = [expiration_date - within for _, within in reversed(BOUNDARIES)]
+    return next((moment for moment in candidates if moment >= at), None)
+
+class DomainStatistics:
+    """
+    Dashboard statistics, counted in one query or kept as a running snapshot.
+
+    With DOMAIN_STATS_SNAPSHOT enabled the counts are computed once and then
+    maintained: domain writes move a domain between buckets as they commit,
+    and as time passes only the domains that crossed a bucket boundary since
+    the last read are counted, via range scans on expiration_date. Until the
+    next such crossing a read costs no query at all. The snapshot lives in
+    this process, so it is rebuilt after DOMAIN_STATS_MAX_AGE_SECONDS to pick
+    up writes made by other processes.
+    """
+
+    def __init__(self):
+        self.snapshot_enabled = os.getenv("DOMAIN_STATS_SNAPSHOT", "true").lower() == "true"
+        self.max_age = timedelta(seconds=int(os.getenv("DOMAIN_STATS_MAX_AGE_SECONDS", 300)))
+
+        self._lock = threading.Lock()
+        self._counts: Optional[Dict[str, int]] = None
+        self._as_of: Optional[datetime] = None
+        self._built_at: Optional[datetime] = None
+        self._next_crossing: Optional[datetime] = None
+        self.rebuilds = 0
+        self.advances = 0
+
+    def get(self, db: Session) -> Dict[str, Any]:
+        """
+        Get the statistics shown on the dashboard
+
+        Returns:
+            Counts of active domains in total, expired, critical and warning
+            (as Domain.status classifies them), and active ones not yet expired
+        """
+        now = current_time()
+        if not self.snapshot_enabled:
+            return self._format(self.count(db, now))
+
+        with self._lock:
+            if self._counts is None or now - self._built_at >= self.max_age:
+                self._rebuild(db, now)
+            elif self._next_crossing is not None and now >= self._next_crossing:
+                self._advance(db, now)
+            return self._format(self._counts)
+
+    def count(self, db: Session, now: datetime) -> Dict[str, int]:
+        """Count every bucket in a single pass over the active domains"""
+        expires = Domain.expiration_date
+        row = db.query(
+            func.count(Domain.id).label('total'),
+            func.sum(case((expires < now + EXPIRED_WITHIN, 1), else_=0)).label('expired'),
+            func.sum(case((and_(expires >= now + EXPIRED_WITHIN, expires < now + CRITICAL_WITHIN), 1), else_=0)).label('critical'),
+            func.sum(case((and_(expires >= now + CRITICAL_WITHIN, expires < now + WARNING_WITHIN), 1), else_=0)).label('warning')
+        ).filter(Domain.is_active == True).one()
+        return {
+            'total': row.total or 0,
+            'expired': row.expired or 0,
+            'critical': row.critical or 0,
+            'warning': row.warning or 0
+        }
+
+    def record_change(self, before: DomainState, after: DomainState):
+        """
+        Move a domain between buckets after a committed write
+
+        Args:
+            before: The domain's state before the write, None if it was created
+            after: Its state after the write, None if it was deleted
+        """
+        if not self.snapshot_enabled:
+            return
+        with self._lock:
+            if self._counts is None:
+                return
+            for state, delta in ((before, -1), (after, 1)):
+                bucket = bucket_at(state, self._as_of)
+                if bucket is None:
+                    continue
+                self._counts['total'] += delta
+                if bucket != 'later':
+                    self._counts[bucket] += delta
+            # A new date may cross a boundary before anything already counted
+            if after is not None and after[0] and after[1] is not None:
+                crossing = next_crossing(after[1], self._as_of)
+                if crossing is not None and (self._next_crossing is None or crossing < self._next_crossing):
+                    self._next_crossing = crossing
+
+    def invalidate(self):
+        """Drop the snapshot after bulk writes; the next read recounts"""
+        with self._lock:
+            self._counts = None
+
+    def _rebuild(self, db: Session, now: datetime):
+        self._counts = self.count(db, now)
+        self._as_of = now
+        self._built_at = now
+        self._next_crossing = self._find_next_crossing(db, now)
+        self.rebuilds += 1
+
+    def _advance(self, db: Session, now: datetime):
+        """Move the snapshot forward to now, counting only domains that changed bucket"""
+        since = self._as_of
+        if now - since >= CRITICAL_WITHIN - EXPIRED_WITHIN:
+            # Domains could have skipped a bucket; the ranges below assume they didn't
+            self._rebuild(db, now)
+            return
+
+        expires = Domain.expiration_date
+        became_expired = and_(expires >= since + EXPIRED_WITHIN, expires < now + EXPIRED_WITHIN)
+        became_critical = and_(expires >= since + CRITICAL_WITHIN, expires < now + CRITICAL_WITHIN)
+        became_warning = and_(expires >= since + WARNING_WITHIN, expires < now + WARNING_WITHIN)
+        row = db.query(
+            func.sum(case((became_expired, 1), else_=0)).label('expired'),
+            func.sum(case((became_critical, 1), else_=0)).label('critical'),
+            func.sum(case((became_warning, 1), else_=0)).label('warning')
+        ).filter(Domain.is_active == True, (became_expired | became_critical | became_warning)).one()
+        expired, critical, warning = row.expired or 0, row.critical or 0, row.warning or 0
+
+        # Each domain moves one bucket towards expired
+        self._counts['expired'] += expired
+        self._counts['critical'] += critical - expired
+        self._counts['warning'] += warning - critical
+        self._as_of = now
+        self._next_crossing = self._find_next_crossing(db, now)
+        self.advances += 1
+
+    def _find_next_crossing(self, db: Session, now: datetime) -> Optional[datetime]:
+        """The earliest moment any active domain enters a more urgent bucket"""
+        def earliest(condition):
+            return select(func.min(Domain.expiration_date)).where(
+                Domain.is_active == True, condition
+            ).scalar_subquery()
+
+        expires = Domain.expiration_date
+        row = db.query(*[
+            earliest(expires >= now + within).label(bucket) for bucket, within in BOUNDARIES
+        ]).one()
+        candidates = [
+            getattr(row, bucket) - within
+            for bucket, within in BOUNDARIES
+            if getattr(row, bucket) is not None
+        ]
+        return min(candidates) if candidates else None
+
+    def _format(self, counts: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            'total_domains': counts['total'],
+            'expired_domains': counts['expired'],
+            'critical_domains': counts['critical'],
+            'warning_domains': counts['warning'],
+            'active_domains': counts['total'] - counts['expired']
+        }
+
+# Global statistics instance
+domain_stats = DomainStatistics()
@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+
+from ..models.database import SessionLocal
+from ..models.domain import DOMAIN_STATUSES, Domain, current_time
+from .domain_search import MATCH_MODES
+from .domain_service import DomainService
+from .tag_service import TAG_MODES
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Stored columns written for every domain, in CSV column order
+EXPORT_COLUMNS = (
+    'id', 'name', 'registrar', 'registration_date', 'expiration_date', 'auto_renew',
+    'renewal_cost', 'renewal_period_years', 'admin_email', 'admin_phone', 'is_active',
+    'last_checked', 'whois_last_updated', 'notes', 'tags', 'email_notifications',
+    'sms_notifications', 'desktop_notifications', 'custom_reminder_days', 'created_at',
+    'updated_at'
+)
+# Followed by the values the API derives from them
+EXPORT_FIELDS = EXPORT_COLUMNS + ('days_until_expiration', 'is_expired', 'status')
+
+def export_row(row: Any, now: datetime) -> Dict[str, Any]:
+    """The exported fields of one domain row, dates as ISO 8601 strings"""
+    values = {
+        field: value.isoformat() if isinstance(value, datetime) else value
+        for field, value in zip(EXPORT_COLUMNS, row)
+    }
+    expiration_date = row.expiration_date
+    values['days_until_expiration'] = (expiration_date - now).days if expiration_date else None
+    values['is_expired'] = bool(expiration_date) and now > expiration_date
+    values['status'] = Domain.status_at(row.is_active, expiration_date, now)
+    return values
+
+class ExportService:
+    """
+    Streams the whole portfolio as NDJSON or CSV.
+
+    Domains are read as plain rows (no ORM objects) through a streaming
+    cursor, EXPORT_BATCH_SIZE rows at a time, and each batch is written out
+    before the next is fetched, so memory stays flat however many domains
+    there are and the first rows go out as soon as the first batch is read.
+    Output can be gzipped on the fly.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+    def stream(
+        self,
+        fmt: str = "ndjson",
+        compress: bool = False,
+        status_filter: Optional[str] = None,
+        search: Optional[str] = None,
+        match: str = "contains",
+        tags: Optional[List[str]] = None,
+        tag_mode: str = "any"
+    ) -> Iterator[bytes]:
+        """
+        Generate the export in chunks
+
+        Runs on its own session, since the response outlives the request's.
+
+        Args:
+            fmt: "ndjson" or "csv"
+            compress: Gzip the output
+            status_filter: Same filter as the domain list
+            search: Same name search as the domain list
+            match: How search matches, as in the domain list
+            tags: Only domains with these tags
+            tag_mode: "any" or "all" of the tags
+
+        Raises:
+            ValueError: On an unknown format, status, match or tag mode
+        """
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported export format: {fmt}")
+        if status_filter and status_filter not in DOMAIN_STATUSES:
+            raise ValueError(f"Unsupported status: {status_filter}")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unsupported match mode: {match}")
+        if tag_mode not in TAG_MODES:
+            raise ValueError(f"Unsupported tag mode: {tag_mode}")
+        # One time for the whole file, for the status filter and every row, so
+        # they agree however long it takes to stream
+        now = current_time()
+        return self._generate(fmt, compress, now, status_filter, search, match, tags, tag_mode)
+
+    def _generate(
+        self,
+        fmt: str,
+        compress: bool,
+        now: datetime,
+        status_filter: Optional[str],
+        search: Optional[str],
+        match: str,
+        tags: Optional[List[str]],
+        tag_mode: str
+    ) -> Iterator[bytes]:
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(wbits=31) if compress else None
+
+        def emit(text: str) -> bytes:
+            data = text.encode("utf-8")
+            return compressor.compress(data) if compressor else data
+
+        db = SessionLocal()
+        exported = 0
+        try:
+            if fmt == "csv":
+                # Flushed so the header reaches the client before any query runs
+                header = emit(self._csv_lines([list(EXPORT_FIELDS)]))
+                yield header + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else header
+
+            columns = [getattr(Domain, column) for column in EXPORT_COLUMNS]
+            query = DomainService(db).filter_domains(
+                db.query(*columns), status_filter, search, match, tags, tag_mode, now
+            )
+            query = query.order_by(Domain.id).execution_options(stream_results=True).yield_per(self.batch_size)
+
+            batch: List[Dict[str, Any]] = []
+            for row in query:
+                batch.append(export_row(row, now))
+                if len(batch) >= self.batch_size:
+                    chunk = emit(self._format(fmt, batch))
+                    exported += len(batch)
+                    batch = []
+                    if compressor:
+                        chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+                    yield chunk
+            if batch:
+                exported += len(batch)
+                chunk = emit(self._format(fmt, batch))
+                if chunk:
+                    yield chunk
+            if compressor:
+                yield compressor.flush()
+            logger.info(f"Exported {exported} domains as {fmt}")
+        finally:
+            db.close()
+
+    def _format(self, fmt: str, rows: List[Dict[str, Any]]) -> str:
+        if fmt == "csv":
+            return self._csv_lines([[row[field] for field in EXPORT_FIELDS] for row in rows])
+        return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+
+    def _csv_lines(self, rows: List[List[Any]]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        return buffer.getvalue()
+
+# Global export service instance
+export_service = ExportService()
@@ -0,0 +1,38 @@
+import logging
+import os
+from typing import Optional
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client
+
+    One pooled client is kept for the whole process so outbound calls reuse
+    keep-alive connections instead of paying a TCP/TLS handshake each time.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", 10))),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+                max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+            ),
+            headers={"User-Agent": "DomainPing/1.0"},
+            follow_redirects=True
+        )
+    return _client
+
+async def close_http_client():
+    """Close the shared HTTP client"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
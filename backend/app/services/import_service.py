@@ -0,0 +1,290 @@
+import codecs
+import csv
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.domain import Domain
+from .domain_stats import domain_stats
+from .refresh_planner import refresh_planner
+from .reminder_service import ReminderService
+from .tag_service import TagService
+from .whois_service import normalize_domain_name
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DOMAIN_NAME_PATTERN = re.compile(r"^(?=.{1,253}$)([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z0-9-]{2,63}$")
+
+# Columns an import may set, with the value used when a row leaves them out
+IMPORT_DEFAULTS: Dict[str, Any] = {
+    'registrar': None,
+    'registration_date': None,
+    'auto_renew': False,
+    'renewal_cost': None,
+    'renewal_period_years': 1,
+    'admin_email': None,
+    'admin_phone': None,
+    'notes': None,
+    'tags': None,
+    'email_notifications': True,
+    'sms_notifications': False,
+    'desktop_notifications': True,
+    'custom_reminder_days': None,
+    'is_active': True
+}
+BOOLEAN_FIELDS = {'auto_renew', 'email_notifications', 'sms_notifications', 'desktop_notifications', 'is_active'}
+DATE_FIELDS = {'expiration_date', 'registration_date'}
+
+class ImportRowError(ValueError):
+    """Raised when a single import row can't be used"""
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of UTF-8 bytes into lines without reading it all first"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+def parse_datetime(value: Any) -> datetime:
+    """Parse an ISO 8601 date or datetime into naive UTC"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        if text.endswith(("Z", "z")):
+            text = text[:-1] + "+00:00"
+        parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "1", "yes", "y"):
+        return True
+    if text in ("false", "0", "no", "n"):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+class ImportService:
+    """
+    Imports domains in bulk from a CSV or NDJSON stream.
+
+    Rows are parsed and validated as they arrive and written in chunks of
+    IMPORT_CHUNK_SIZE: one query finds which names of a chunk already exist,
+    the rest go in as one multi-row INSERT. Reminders for everything imported
+    and tag rows are materialized together at the end. Names repeated within the import are caught in
+    memory. Every rejected row is reported with its row number (up to
+    IMPORT_MAX_ERRORS of them).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.chunk_size = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+        self.max_errors = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+        self.reminder_service = ReminderService(db)
+        self.tag_service = TagService(db)
+
+    async def import_stream(self, lines: AsyncIterator[str], fmt: str, enrich: bool = False) -> Dict[str, Any]:
+        """
+        Import domains from lines of CSV (with a header row) or NDJSON
+
+        Args:
+            lines: The upload, line by line
+            fmt: "csv" or "ndjson"
+            enrich: Queue every imported domain for a WHOIS check right away
+
+        Returns:
+            Report with the rows received, domains imported, rows skipped
+            because the domain already existed, and per-row errors
+
+        Raises:
+            ValueError: On an unknown format or a CSV without a usable header
+        """
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+        report = {'received': 0, 'imported': 0, 'existing': 0, 'error_count': 0, 'errors': []}
+        seen: Dict[str, int] = {}
+        imported_ids: List[int] = []
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        records = self._csv_records(lines) if fmt == "csv" else self._ndjson_records(lines)
+
+        async for row_number, record in records:
+            report['received'] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                values = self._validate(record)
+                first_row = seen.get(values['name'])
+                if first_row is not None:
+                    raise ImportRowError(f"duplicate of row {first_row}")
+                seen[values['name']] = row_number
+                chunk.append((row_number, values))
+            except (ValueError, TypeError) as e:
+                self._add_error(report, row_number, record, str(e))
+
+            if len(chunk) >= self.chunk_size:
+                imported_ids.extend(self._write_chunk(chunk, enrich, report))
+                chunk = []
+
+        if chunk:
+            imported_ids.extend(self._write_chunk(chunk, enrich, report))
+        if imported_ids:
+            self.reminder_service.sync_domains(imported_ids)
+            self.tag_service.sync_domains(imported_ids)
+            domain_stats.invalidate()
+        logger.info(
+            f"Imported {report['imported']} of {report['received']} domains "
+            f"({report['existing']} already existed, {report['error_count']} errors)"
+        )
+        return report
+
+    async def _csv_records(self, lines: AsyncIterator[str]):
+        """Yield (row number, dict) per CSV record; quoted fields may span lines"""
+        header: Optional[List[str]] = None
+        row_number = 0
+        pending = ""
+        async for line in lines:
+            pending += line
+            # A record is complete once its quotes are balanced
+            if pending.count('"') % 2:
+                continue
+            record, pending = pending, ""
+            if not record.strip():
+                continue
+            fields = next(csv.reader([record]))
+            if header is None:
+                header = [field.strip().lower() for field in fields]
+                if 'name' not in header:
+                    raise ValueError("CSV header must include a 'name' column")
+                continue
+            row_number += 1
+            yield row_number, dict(zip(header, fields))
+        if pending.strip():
+            row_number += 1
+            yield row_number, ImportRowError("unterminated quoted field")
+
+    async def _ndjson_records(self, lines: AsyncIterator[str]):
+        """Yield (row number, dict) per non-blank NDJSON line"""
+        row_number = 0
+        async for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, ImportRowError(f"invalid JSON: {str(e)}")
+                continue
+            if not isinstance(record, dict):
+                yield row_number, ImportRowError("expected a JSON object")
+                continue
+            yield row_number, record
+
+    def _validate(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize one row into column values, raising ImportRowError if it is unusable"""
+        name = normalize_domain_name(str(record.get('name') or ""))
+        if not name:
+            raise ImportRowError("missing name")
+        if not DOMAIN_NAME_PATTERN.match(name):
+            raise ImportRowError(f"invalid domain name: {name}")
+
+        values: Dict[str, Any] = {'name': name}
+        for field, default in IMPORT_DEFAULTS.items():
+            raw = record.get(field)
+            if raw is None or (isinstance(raw, str) and not raw.strip()):
+                values[field] = default
+                continue
+            try:
+                if field in BOOLEAN_FIELDS:
+                    values[field] = parse_boolean(raw)
+                elif field in DATE_FIELDS:
+                    values[field] = parse_datetime(raw)
+                elif field == 'renewal_cost':
+                    values[field] = float(raw)
+                elif field == 'renewal_period_years':
+                    values[field] = int(raw)
+                else:
+                    values[field] = str(raw).strip()
+            except (ValueError, TypeError) as e:
+                raise ImportRowError(f"invalid {field}: {str(e)}")
+
+        raw_expiration = record.get('expiration_date')
+        if raw_expiration is None or (isinstance(raw_expiration, str) and not raw_expiration.strip()):
+            raise ImportRowError("missing expiration_date")
+        try:
+            values['expiration_date'] = parse_datetime(raw_expiration)
+        except (ValueError, TypeError) as e:
+            raise ImportRowError(f"invalid expiration_date: {str(e)}")
+        return values
+
+    def _write_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]], enrich: bool, report: Dict[str, Any]) -> List[int]:
+        """
+        Insert a chunk's new domains in one statement
+
+        Returns:
+            IDs of the domains inserted
+        """
+        names = [values['name'] for _, values in chunk]
+        existing = {
+            row.name for row in self.db.query(Domain.name).filter(Domain.name.in_(names))
+        }
+        now = datetime.utcnow()
+        rows = []
+        for _, values in chunk:
+            if values['name'] in existing:
+                continue
+            rows.append({
+                **values,
+                'last_checked': now,
+                # The refresh queue is where WHOIS checks wait; enriching puts these at its head
+                'next_check_at': now if enrich else refresh_planner.next_check_at(
+                    values['name'], values['expiration_date'], now, initial=True
+                ),
+                'created_at': now,
+                'updated_at': now
+            })
+        report['existing'] += len(chunk) - len(rows)
+        if not rows:
+            return []
+
+        try:
+            self.db.execute(Domain.__table__.insert(), rows)
+            self.db.commit()
+        except IntegrityError:
+            # Another writer added some of these names since the lookup; skip them and retry once
+            self.db.rollback()
+            taken = {
+                row.name for row in self.db.query(Domain.name).filter(Domain.name.in_([r['name'] for r in rows]))
+            }
+            report['existing'] += len(taken)
+            rows = [row for row in rows if row['name'] not in taken]
+            if not rows:
+                return []
+            self.db.execute(Domain.__table__.insert(), rows)
+            self.db.commit()
+
+        report['imported'] += len(rows)
+        return [row.id for row in self.db.query(Domain.id).filter(Domain.name.in_([r['name'] for r in rows]))]
+
+    def _add_error(self, report: Dict[str, Any], row_number: int, record: Any, error: str):
+        report['error_count'] += 1
+        if len(report['errors']) < self.max_errors:
+            name = record.get('name') if isinstance(record, dict) else None
+            report['errors'].append({'row': row_number, 'name': name, 'error': error})
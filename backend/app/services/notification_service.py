@@ -1,14 +1,16 @@
-import smtplib
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-from twilio.rest import Client
 from plyer import notification
 import jinja2
+from collections import OrderedDict
+
+from .sms_providers import sms_sender
+from .smtp_pool import smtp_pool
 
 load_dotenv()
 
@@ -25,23 +27,57 @@ class NotificationService:
         self.from_email = os.getenv("FROM_EMAIL", self.smtp_username)
         self.from_name = os.getenv("FROM_NAME", "DomainPing")
         
-        # Twilio configuration
-        self.twilio_account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-        self.twilio_auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-        self.twilio_phone_number = os.getenv("TWILIO_PHONE_NUMBER")
-        
-        # Initialize Twilio client if credentials are provided
-        self.twilio_client = None
-        if self.twilio_account_sid and self.twilio_auth_token:
-            try:
-                self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
-            except Exception as e:
-                logger.warning(f"Failed to initialize Twilio client: {str(e)}")
+        # SMS goes through the shared provider-backed sender
+        self.sms_sender = sms_sender
         
-        # Template environment
+        # Template environment, with every template compiled once up front
         self.template_env = jinja2.Environment(
-            loader=jinja2.DictLoader(self._get_templates())
+            loader=jinja2.DictLoader(self._get_templates()),
+            auto_reload=False
         )
+        self.templates = {
+            name: self.template_env.get_template(name)
+            for name in self.template_env.list_templates()
+        }
+        
+        # Rendered output keyed by template and context, e.g. (template, domain, days)
+        self.render_cache_size = int(os.getenv("TEMPLATE_CACHE_SIZE", 1024))
+        self._render_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self.render_cache_hits = 0
+        self.render_cache_misses = 0
+    
+    def render(self, template_name: str, **context) -> str:
+        """
+        Render a precompiled template, reusing earlier output for the same context
+        
+        Args:
+            template_name: Name of the template
+            **context: Template variables; output is only memoized when they are hashable
+            
+        Returns:
+            Rendered text
+        """
+        try:
+            key = (template_name, tuple(sorted(context.items())))
+            hash(key)
+        except TypeError:
+            key = None
+        
+        if key is not None:
+            cached = self._render_cache.get(key)
+            if cached is not None:
+                self._render_cache.move_to_end(key)
+                self.render_cache_hits += 1
+                return cached
+        
+        output = self.templates[template_name].render(**context)
+        
+        if key is not None:
+            self.render_cache_misses += 1
+            self._render_cache[key] = output
+            if len(self._render_cache) > self.render_cache_size:
+                self._render_cache.popitem(last=False)
+        return output
     
     def _get_templates(self) -> dict:
         """Get email and SMS templates"""
@@ -113,6 +149,64 @@ class NotificationService:
         </div>
     </div>
 </body>
+</html>
+            ''',
+            'email_digest': '''
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 700px; margin: 0 auto; padding: 20px; }
+        .header { background: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 20px; }
+        table { width: 100%; border-collapse: collapse; margin: 15px 0; }
+        th, td { text-align: left; padding: 8px; border-bottom: 1px solid #dee2e6; }
+        th { background: #e9ecef; }
+        .expired, .critical { color: #721c24; font-weight: bold; }
+        .warning { color: #856404; }
+        .footer { margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6; font-size: 12px; color: #6c757d; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🚨 DomainPing Alert</h1>
+            <p><strong>{{ domains|length }}</strong> of your domains need attention.</p>
+        </div>
+        
+        <table>
+            <tr>
+                <th>Domain</th>
+                <th>Expires</th>
+                <th>Days Left</th>
+                <th>Registrar</th>
+                <th>Renewal Cost</th>
+            </tr>
+            {% for domain in domains %}
+            <tr>
+                <td>{{ domain.domain_name }}</td>
+                <td>{{ domain.expiration_date.strftime('%B %d, %Y') }}</td>
+                {% if domain.days_until_expiration <= 0 %}
+                <td class="expired">EXPIRED</td>
+                {% elif domain.days_until_expiration <= 7 %}
+                <td class="critical">{{ domain.days_until_expiration }}</td>
+                {% else %}
+                <td class="warning">{{ domain.days_until_expiration }}</td>
+                {% endif %}
+                <td>{{ domain.registrar or '' }}</td>
+                <td>{% if domain.renewal_cost %}${{ domain.renewal_cost }}{% endif %}</td>
+            </tr>
+            {% endfor %}
+        </table>
+        
+        <p>Renew these domains with their registrars, then update the expiration dates in your DomainPing system.</p>
+        
+        <div class="footer">
+            <p>This is an automated reminder from your DomainPing system.</p>
+            <p>Never lose a domain again! 🛡️</p>
+        </div>
+    </div>
+</body>
 </html>
             ''',
             'sms_reminder': '''
@@ -131,7 +225,8 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
         days_until_expiration: int,
         registrar: Optional[str] = None,
         renewal_cost: Optional[float] = None,
-        notes: Optional[str] = None
+        notes: Optional[str] = None,
+        message_id: Optional[str] = None
     ) -> bool:
         """
         Send email notification about domain expiration
@@ -144,12 +239,13 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             registrar: Domain registrar
             renewal_cost: Estimated renewal cost
             notes: Additional notes
+            message_id: Stable ID for the Message-ID header, so resends can be deduplicated
             
         Returns:
             True if email sent successfully, False otherwise
         """
         try:
-            if not all([self.smtp_server, self.smtp_username, self.smtp_password]):
+            if not smtp_pool.configured:
                 logger.error("Email configuration is incomplete")
                 return False
             
@@ -164,25 +260,18 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             }
             
             # Render email content
-            template = self.template_env.get_template('email_reminder')
-            html_content = template.render(**template_data)
+            html_content = self.render('email_reminder', **template_data)
             
             # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"🚨 Domain Renewal Alert: {domain_name} expires in {days_until_expiration} day(s)"
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-            msg['To'] = to_email
-            
-            # Add HTML content
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
+            msg = self._build_email(
+                to_email,
+                f"🚨 Domain Renewal Alert: {domain_name} expires in {days_until_expiration} day(s)",
+                html_content,
+                message_id
+            )
             
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if self.smtp_use_tls:
-                    server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(msg)
+            # Send over a pooled session, off the event loop
+            await smtp_pool.send(msg)
             
             logger.info(f"Email notification sent successfully to {to_email} for domain {domain_name}")
             return True
@@ -191,12 +280,76 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             logger.error(f"Failed to send email notification: {str(e)}")
             return False
     
+    async def send_email_digest(
+        self,
+        to_email: str,
+        domains: List[Dict[str, Any]],
+        message_id: Optional[str] = None
+    ) -> bool:
+        """
+        Send one email covering several domain reminders
+        
+        Args:
+            to_email: Recipient email address
+            domains: One dict per reminder with domain_name, expiration_date,
+                days_until_expiration, registrar and renewal_cost
+            message_id: Stable ID for the Message-ID header, so resends can be deduplicated
+            
+        Returns:
+            True if email sent successfully, False otherwise
+        """
+        try:
+            if not smtp_pool.configured:
+                logger.error("Email configuration is incomplete")
+                return False
+            
+            # Most urgent first
+            domains = sorted(domains, key=lambda d: (d['days_until_expiration'], d['domain_name']))
+            
+            html_content = self.render('email_digest', domains=domains)
+            
+            most_urgent = domains[0]['days_until_expiration']
+            msg = self._build_email(
+                to_email,
+                f"🚨 Domain Renewal Alert: {len(domains)} domains expiring, the first in {most_urgent} day(s)",
+                html_content,
+                message_id
+            )
+            
+            await smtp_pool.send(msg)
+            
+            logger.info(f"Digest email with {len(domains)} domains sent successfully to {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to send digest email: {str(e)}")
+            return False
+    
+    def _build_email(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        message_id: Optional[str] = None
+    ) -> MIMEMultipart:
+        """Build an HTML email from the configured sender"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = f"{self.from_name} <{self.from_email}>"
+        msg['To'] = to_email
+        if message_id:
+            sender_domain = (self.from_email or "").rpartition("@")[2] or "domainping"
+            msg['Message-ID'] = f"<{message_id}@{sender_domain}>"
+        msg.attach(MIMEText(html_content, 'html'))
+        return msg
+    
     async def send_sms_notification(
         self,
         to_phone: str,
         domain_name: str,
         expiration_date: datetime,
-        days_until_expiration: int
+        days_until_expiration: int,
+        idempotency_key: Optional[str] = None
     ) -> bool:
         """
         Send SMS notification about domain expiration
@@ -206,13 +359,14 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             domain_name: Domain name
             expiration_date: Domain expiration date
             days_until_expiration: Days until expiration
+            idempotency_key: Stable ID passed to providers that deduplicate resends
             
         Returns:
             True if SMS sent successfully, False otherwise
         """
         try:
-            if not self.twilio_client:
-                logger.error("Twilio client not initialized")
+            if not self.sms_sender.configured:
+                logger.error("SMS provider is not configured")
                 return False
             
             # Prepare template data
@@ -223,15 +377,10 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             }
             
             # Render SMS content
-            template = self.template_env.get_template('sms_reminder')
-            message_content = template.render(**template_data)
+            message_content = self.render('sms_reminder', **template_data)
             
-            # Send SMS
-            message = self.twilio_client.messages.create(
-                body=message_content,
-                from_=self.twilio_phone_number,
-                to=to_phone
-            )
+            # Send SMS (rate limited, without blocking the event loop)
+            await self.sms_sender.send(to_phone, message_content.strip(), idempotency_key)
             
             logger.info(f"SMS notification sent successfully to {to_phone} for domain {domain_name}")
             return True
@@ -263,8 +412,7 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             }
             
             # Render notification content
-            template = self.template_env.get_template('desktop_reminder')
-            message_content = template.render(**template_data)
+            message_content = self.render('desktop_reminder', **template_data)
             
             # Determine urgency and icon
             if days_until_expiration <= 0:
@@ -335,4 +483,13 @@ Domain {{ domain_name }} expires in {{ days_until_expiration }} day(s)!
             )
         except Exception as e:
             logger.error(f"SMS configuration test failed: {str(e)}")
-            return False 
\ No newline at end of file
+            return False 
+
+_notification_service: Optional[NotificationService] = None
+
+def get_notification_service() -> NotificationService:
+    """Get the process-wide NotificationService, creating it on first use"""
+    global _notification_service
+    if _notification_service is None:
+        _notification_service = NotificationService()
+    return _notification_service
@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_, tuple_
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or belongs to another sort order"""
+
+def encode_cursor(sort: str, order: str, value: Any, row_id: int) -> str:
+    """
+    Build an opaque cursor pointing just past a row
+
+    Args:
+        sort: Sort key the page was ordered by
+        order: "asc" or "desc"
+        value: The row's value for the sort key
+        row_id: The row's ID, which breaks ties between equal values
+
+    Returns:
+        URL-safe cursor string
+    """
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    payload = json.dumps({"s": sort, "o": order, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple[Any, int]:
+    """
+    Read a cursor made by encode_cursor
+
+    Returns:
+        The sort value and row ID the next page starts after
+
+    Raises:
+        InvalidCursorError: If the cursor can't be read or was made for a different sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["v"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        row_id = int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {str(e)}")
+    if payload.get("s") != sort or payload.get("o") != order:
+        raise InvalidCursorError("Cursor was created for a different sort order")
+    return value, row_id
+
+def keyset_filter(column, id_column, order: str, value: Optional[Any], row_id: int):
+    """
+    Filter for the rows after (value, row_id) in ORDER BY column, id
+
+    NULLs sort first ascending and last descending, as keyset_order emits.
+    """
+    if order == "desc":
+        if value is None:
+            return and_(column.is_(None), id_column < row_id)
+        return or_(tuple_(column, id_column) < tuple_(value, row_id), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), id_column > row_id), column.isnot(None))
+    return tuple_(column, id_column) > tuple_(value, row_id)
+
+def keyset_order(column, id_column, order: str):
+    """ORDER BY clauses matching keyset_filter"""
+    if order == "desc":
+        return column.desc().nulls_last(), id_column.desc()
+    return column.asc().nulls_first(), id_column.asc()
+
+def page_result(items, limit: int, sort: str, order: str, key, total: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Trim a query fetched with limit + 1 rows into a page and its next cursor
+
+    Args:
+        items: Rows fetched, up to limit + 1
+        limit: Page size
+        sort: Sort key
+        order: "asc" or "desc"
+        key: Function returning a row's sort value
+        total: Total matching rows, if counted
+    """
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(sort, order, key(last), last.id)
+    return {'items': items, 'next_cursor': next_cursor, 'total': total}
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open"""
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for use from a single event loop.
+
+    Allows `rate` calls per second on average with bursts of up to `burst`.
+    A rate of zero or less disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the bucket's current state"""
+        if self.rate > 0:
+            self._refill()
+        return {
+            'rate': self.rate,
+            'burst': self.capacity,
+            'tokens': round(self.tokens, 2)
+        }
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the breaker opens and refuses
+    calls for `cooldown` seconds. It then lets a single trial call through
+    (half-open): success closes it again, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_progress = False
+
+    def allow(self) -> bool:
+        """Check if a call may go ahead, moving to half-open once the cooldown is over"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self.trial_in_progress = False
+        if self.state == self.HALF_OPEN and not self.trial_in_progress:
+            self.trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self):
+        """Record a successful call"""
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+
+    def record_failure(self):
+        """Record a failed call"""
+        self.failures += 1
+        self.trial_in_progress = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the breaker's current state"""
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, round(self.cooldown - (time.monotonic() - self.opened_at), 1))
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'retry_in_seconds': retry_in
+        }
@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from .http_client import get_http_client
+from .whois_engine import whois_engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOOTSTRAP_FILE = os.path.join(os.path.dirname(__file__), "data", "rdap_dns.json")
+
+class RdapNotFoundError(Exception):
+    """Raised when the registry has no record of the domain"""
+
+@lru_cache(maxsize=None)
+def load_bootstrap(path: str) -> Dict[str, str]:
+    """
+    Load an IANA RDAP bootstrap file into a TLD -> base URL map
+
+    Args:
+        path: Path to a file in the https://data.iana.org/rdap/dns.json format
+
+    Returns:
+        Base URL (with trailing slash) for every TLD listed
+    """
+    with open(path, encoding="utf-8") as f:
+        bootstrap = json.load(f)
+
+    base_urls = {}
+    for tlds, urls in bootstrap.get("services", []):
+        # Prefer HTTPS when a registry lists several endpoints
+        url = next((u for u in urls if u.startswith("https://")), urls[0] if urls else None)
+        if not url:
+            continue
+        if not url.endswith("/"):
+            url += "/"
+        for tld in tlds:
+            base_urls[tld.lower()] = url
+    return base_urls
+
+class RdapService:
+    """
+    Domain lookups over RDAP (RFC 9082/9083).
+
+    RDAP answers are structured JSON, so no text parsing is involved, and all
+    requests share the process-wide pooled HTTP client.
+    """
+
+    def __init__(self, base_urls: Optional[Dict[str, str]] = None):
+        self.timeout = int(os.getenv("WHOIS_TIMEOUT", 10))
+        if base_urls is None:
+            base_urls = load_bootstrap(os.getenv("RDAP_BOOTSTRAP_FILE", DEFAULT_BOOTSTRAP_FILE))
+        self.base_urls = base_urls
+
+    def get_base_url(self, domain_name: str) -> Optional[str]:
+        """Get the RDAP base URL for a domain's TLD, or None if it has no RDAP service"""
+        return self.base_urls.get(domain_name.rsplit('.', 1)[-1])
+
+    async def get_domain_info(self, domain_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch domain information using RDAP
+
+        Args:
+            domain_name: Normalized domain name
+
+        Returns:
+            Domain information in the same shape WhoisService returns,
+            or None if the TLD has no RDAP service
+
+        Raises:
+            RdapNotFoundError: If the registry has no record of the domain
+            httpx.HTTPError: On network or server errors
+        """
+        base_url = self.get_base_url(domain_name)
+        if not base_url:
+            return None
+
+        server = base_url.split("/")[2]
+        async with whois_engine.slot(server):
+            response = await get_http_client().get(
+                f"{base_url}domain/{domain_name}",
+                headers={"Accept": "application/rdap+json"},
+                timeout=self.timeout
+            )
+            # Throttling and server errors count against the server's breaker
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+
+        if response.status_code == 404:
+            raise RdapNotFoundError(domain_name)
+        response.raise_for_status()
+
+        return self._parse_rdap_data(response.json(), domain_name)
+
+    def _parse_rdap_data(self, data: Dict[str, Any], domain_name: str) -> Dict[str, Any]:
+        """
+        Map an RDAP domain object to the standard domain information format
+
+        Args:
+            data: RDAP domain object
+            domain_name: Domain name being queried
+
+        Returns:
+            Parsed domain information
+        """
+        events = {}
+        for event in data.get("events", []):
+            action = event.get("eventAction")
+            if action and action not in events:
+                events[action] = self._parse_date(event.get("eventDate"))
+
+        registrar = None
+        admin_email = None
+        for entity in data.get("entities", []):
+            roles = entity.get("roles", [])
+            if "registrar" in roles and not registrar:
+                registrar = self._vcard_field(entity, "fn")
+            if ("administrative" in roles or "registrant" in roles) and not admin_email:
+                admin_email = self._vcard_field(entity, "email")
+
+        name_servers = [
+            ns["ldhName"].lower()
+            for ns in data.get("nameservers", [])
+            if ns.get("ldhName")
+        ]
+
+        return {
+            'domain_name': domain_name,
+            'expiration_date': events.get("expiration"),
+            'registration_date': events.get("registration"),
+            'registrar': registrar,
+            'name_servers': name_servers,
+            'status': data.get("status", []),
+            'admin_email': admin_email,
+            'last_updated': datetime.utcnow()
+        }
+
+    def _parse_date(self, value: Optional[str]) -> Optional[datetime]:
+        """Parse an RFC 3339 timestamp into a naive UTC datetime"""
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+        return parsed
+
+    def _vcard_field(self, entity: Dict[str, Any], field: str) -> Optional[str]:
+        """Get a property from an entity's jCard"""
+        vcard = entity.get("vcardArray")
+        if not vcard or len(vcard) < 2:
+            return None
+        properties: List[list] = vcard[1]
+        for prop in properties:
+            if len(prop) >= 4 and prop[0] == field and prop[3]:
+                return prop[3]
+        return None
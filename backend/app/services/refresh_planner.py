@@ -0,0 +1,97 @@
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class RefreshPlanner:
+    """
+    Decides when each domain's WHOIS data should next be refreshed.
+
+    Inside the window around expiry (REFRESH_WINDOW_DAYS either side) domains
+    are checked every REFRESH_DENSE_INTERVAL_HOURS so renewals and drops show
+    up quickly. Further out the interval grows with the distance to expiry
+    (REFRESH_INTERVAL_FRACTION of it), up to REFRESH_MAX_INTERVAL_DAYS, and
+    never runs past the start of the window.
+
+    Each domain gets a fixed phase derived from its name. First checks are
+    spread across a whole interval by that phase and later ones get a small
+    phase-based jitter, so a portfolio imported in one go doesn't come due in
+    one go.
+    """
+
+    def __init__(self):
+        self.window = timedelta(days=int(os.getenv("REFRESH_WINDOW_DAYS", 14)))
+        self.dense_interval = timedelta(hours=float(os.getenv("REFRESH_DENSE_INTERVAL_HOURS", 12)))
+        self.max_interval = timedelta(days=float(os.getenv("REFRESH_MAX_INTERVAL_DAYS", 30)))
+        self.interval_fraction = float(os.getenv("REFRESH_INTERVAL_FRACTION", 0.1))
+        self.jitter = float(os.getenv("REFRESH_JITTER", 0.1))
+        # Interval used when the expiry date is unknown
+        self.unknown_interval = timedelta(days=1)
+
+    def phase(self, domain_name: str) -> float:
+        """Stable position in [0, 1) used to spread a domain's checks"""
+        return zlib.crc32(domain_name.encode("utf-8")) / 2 ** 32
+
+    def interval(self, expiration_date: Optional[datetime], now: Optional[datetime] = None) -> timedelta:
+        """
+        Get the refresh interval for a domain
+
+        Args:
+            expiration_date: Domain expiration date, if known
+            now: Reference time, defaults to the current UTC time
+
+        Returns:
+            Time to wait between checks
+        """
+        if expiration_date is None:
+            return self.unknown_interval
+        now = now or datetime.utcnow()
+
+        distance = abs(expiration_date - now)
+        if distance <= self.window:
+            return self.dense_interval
+
+        interval = min(self.max_interval, distance * self.interval_fraction)
+        return max(self.dense_interval, interval)
+
+    def next_check_at(
+        self,
+        domain_name: str,
+        expiration_date: Optional[datetime],
+        now: Optional[datetime] = None,
+        initial: bool = False
+    ) -> datetime:
+        """
+        Plan a domain's next WHOIS check
+
+        Args:
+            domain_name: Normalized domain name
+            expiration_date: Domain expiration date, if known
+            now: Reference time, defaults to the current UTC time
+            initial: Spread the check anywhere across the first interval,
+                for domains that have never been planned
+
+        Returns:
+            When the domain should next be checked
+        """
+        now = now or datetime.utcnow()
+        interval = self.interval(expiration_date, now)
+        phase = self.phase(domain_name)
+
+        if initial:
+            next_check = now + interval * phase
+        else:
+            next_check = now + interval * (1 - self.jitter + 2 * self.jitter * phase)
+
+        # Don't jump over the start of the dense window
+        if expiration_date is not None:
+            window_start = expiration_date - self.window
+            if now < window_start < next_check:
+                next_check = window_start + self.dense_interval * phase
+        return next_check
+
+# Global planner instance
+refresh_planner = RefreshPlanner()
@@ -0,0 +1,253 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+import logging
+import os
+from dotenv import load_dotenv
+
+from ..models.domain import Domain
+from ..models.notification import Notification, NotificationType, NotificationStatus
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Domain columns that decide which reminders a domain gets
+REMINDER_FIELDS = (
+    'expiration_date', 'is_active', 'admin_email', 'admin_phone', 'custom_reminder_days',
+    'email_notifications', 'sms_notifications', 'desktop_notifications',
+)
+
+# (domain_id, type, days_before_expiration, scheduled_at)
+ReminderKey = Tuple[int, NotificationType, int, datetime]
+
+# Called with the earliest new scheduled_at after reminders are committed
+_listeners: List[Callable[[datetime], None]] = []
+
+def add_reminder_listener(callback: Callable[[datetime], None]):
+    """Register a callback for newly scheduled reminders (may be called from any thread)"""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+def remove_reminder_listener(callback: Callable[[datetime], None]):
+    """Unregister a callback added with add_reminder_listener"""
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+class ReminderService:
+    """
+    Materializes reminder Notification rows from domain settings.
+
+    Each active domain gets one pending row per reminder day (its
+    custom_reminder_days, or DEFAULT_REMINDER_DAYS) and enabled channel,
+    scheduled at NOTIFICATION_TIME_HOUR:NOTIFICATION_TIME_MINUTE UTC that many
+    days before expiry. Pending rows are disposable: syncing a domain deletes
+    and regenerates them with set-based statements. Reminders already sent,
+    failed or cancelled for the same expiry are never recreated, and
+    reminders whose time has passed are skipped. Pending rows the outbox has
+    started delivering (stamped attempted_at) may already have gone out, so
+    they are left alone and not recreated.
+
+    Rows are only materialized for the next REMINDER_HORIZON_DAYS, so the
+    table holds what is actually coming up rather than years of reminders
+    for long-lived registrations.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.default_reminder_days = [
+            int(day.strip())
+            for day in os.getenv("DEFAULT_REMINDER_DAYS", "90,30,14,7,3,1").split(",")
+            if day.strip().isdigit()
+        ]
+        self.notification_hour = int(os.getenv("NOTIFICATION_TIME_HOUR", 9))
+        self.notification_minute = int(os.getenv("NOTIFICATION_TIME_MINUTE", 0))
+        # Used for email reminders when a domain has no admin email
+        self.default_email = os.getenv("DEFAULT_NOTIFICATION_EMAIL")
+        # Only reminders due within this many days are materialized; the
+        # nightly rebuild rolls the window forward
+        self.horizon = timedelta(days=int(os.getenv("REMINDER_HORIZON_DAYS", 45)))
+        self.chunk_size = int(os.getenv("REMINDER_CHUNK_SIZE", 5000))
+        self._earliest: Optional[datetime] = None
+
+    def sync_domains(self, domain_ids: Iterable[int]) -> int:
+        """
+        Recompute the pending reminders of some domains
+
+        Args:
+            domain_ids: Domains whose expiry or notification settings changed
+
+        Returns:
+            Number of reminders created
+        """
+        domain_ids = list(set(domain_ids))
+        if not domain_ids:
+            return 0
+        try:
+            created = 0
+            max_days = self._max_reminder_days()
+            for start in range(0, len(domain_ids), self.chunk_size):
+                created += self._sync_chunk(domain_ids[start:start + self.chunk_size], max_days)
+            self.db.commit()
+            self._notify_listeners()
+            return created
+
+        except Exception as e:
+            self.db.rollback()
+            self._earliest = None
+            logger.error(f"Failed to sync reminders for {len(domain_ids)} domains: {str(e)}")
+            raise e
+
+    def rebuild_all(self) -> Dict[str, int]:
+        """
+        Regenerate pending reminders for every domain
+
+        Returns:
+            Counts of domains processed, stale reminders removed and reminders created
+        """
+        try:
+            # One time for the whole rebuild, so every chunk skips the same past reminders
+            now = datetime.utcnow()
+            removed = self.db.query(Notification).filter(
+                self._unattempted_pending()
+            ).delete(synchronize_session=False)
+
+            domain_ids = [row.id for row in self.db.query(Domain.id).filter(Domain.is_active == True)]
+            created = 0
+            max_days = self._max_reminder_days()
+            for start in range(0, len(domain_ids), self.chunk_size):
+                created += self._sync_chunk(domain_ids[start:start + self.chunk_size], max_days, delete_pending=False, now=now)
+            self.db.commit()
+            self._notify_listeners()
+
+            logger.info(f"Rebuilt reminders for {len(domain_ids)} domains: {created} scheduled")
+            return {'domains': len(domain_ids), 'removed': removed, 'created': created}
+
+        except Exception as e:
+            self.db.rollback()
+            self._earliest = None
+            logger.error(f"Failed to rebuild reminders: {str(e)}")
+            raise e
+
+    def _unattempted_pending(self):
+        """Pending rows the outbox hasn't started delivering"""
+        return (Notification.status == NotificationStatus.PENDING) & Notification.attempted_at.is_(None)
+
+    def _sync_chunk(
+        self, domain_ids: List[int], max_days: int, delete_pending: bool = True, now: Optional[datetime] = None
+    ) -> int:
+        now = now or datetime.utcnow()
+        if delete_pending:
+            self.db.query(Notification).filter(
+                Notification.domain_id.in_(domain_ids),
+                self._unattempted_pending()
+            ).delete(synchronize_session=False)
+
+        # Reminders that already went out (or were given up on) for these
+        # expiries, and pending ones whose delivery has started
+        handled: Set[ReminderKey] = set(
+            self.db.query(
+                Notification.domain_id, Notification.type,
+                Notification.days_before_expiration, Notification.scheduled_at
+            ).filter(
+                Notification.domain_id.in_(domain_ids),
+                or_(Notification.status != NotificationStatus.PENDING, Notification.attempted_at.isnot(None))
+            )
+        )
+
+        domains = self.db.query(
+            Domain.id, Domain.name, Domain.expiration_date, Domain.admin_email, Domain.admin_phone,
+            Domain.custom_reminder_days, Domain.email_notifications, Domain.sms_notifications,
+            Domain.desktop_notifications
+        ).filter(
+            Domain.id.in_(domain_ids),
+            Domain.is_active == True,
+            # Nothing to schedule for domains past expiry or too far out for any reminder
+            Domain.expiration_date >= now - timedelta(days=1),
+            Domain.expiration_date <= now + self.horizon + timedelta(days=max_days + 1)
+        )
+
+        rows = []
+        for domain in domains:
+            rows.extend(self._build_reminders(domain, now, handled))
+
+        if rows:
+            self.db.execute(Notification.__table__.insert(), rows)
+            earliest = min(row['scheduled_at'] for row in rows)
+            if self._earliest is None or earliest < self._earliest:
+                self._earliest = earliest
+        return len(rows)
+
+    def _notify_listeners(self):
+        earliest, self._earliest = self._earliest, None
+        if earliest is None:
+            return
+        for callback in list(_listeners):
+            try:
+                callback(earliest)
+            except Exception as e:
+                logger.warning(f"Reminder listener failed: {str(e)}")
+
+    def _build_reminders(self, domain: Any, now: datetime, handled: Set[ReminderKey]) -> List[Dict[str, Any]]:
+        if not domain.expiration_date:
+            return []
+
+        channels: List[Tuple[NotificationType, Optional[str]]] = []
+        if domain.email_notifications and (domain.admin_email or self.default_email):
+            channels.append((NotificationType.EMAIL, domain.admin_email or self.default_email))
+        if domain.sms_notifications and domain.admin_phone:
+            channels.append((NotificationType.SMS, domain.admin_phone))
+        if domain.desktop_notifications:
+            channels.append((NotificationType.DESKTOP, "desktop"))
+        if not channels:
+            return []
+
+        reminder_days = self._reminder_days(domain.custom_reminder_days)
+        send_date = domain.expiration_date.replace(
+            hour=self.notification_hour, minute=self.notification_minute, second=0, microsecond=0
+        )
+        expiry_text = domain.expiration_date.strftime('%Y-%m-%d')
+
+        rows = []
+        for days in reminder_days:
+            scheduled_at = send_date - timedelta(days=days)
+            if scheduled_at < now or scheduled_at > now + self.horizon:
+                continue
+            message = f"{domain.name} expires in {days} day(s) on {expiry_text}"
+            for notification_type, recipient in channels:
+                if (domain.id, notification_type, days, scheduled_at) in handled:
+                    continue
+                rows.append({
+                    'domain_id': domain.id,
+                    'type': notification_type,
+                    'status': NotificationStatus.PENDING,
+                    'days_before_expiration': days,
+                    'subject': f"Domain Renewal Alert: {domain.name}" if notification_type == NotificationType.EMAIL else None,
+                    'message': message,
+                    'recipient': recipient,
+                    'scheduled_at': scheduled_at,
+                    'idempotency_key': (
+                        f"reminder-{domain.id}-{notification_type.value}-{days}-{scheduled_at:%Y%m%d%H%M}"
+                    ),
+                    'created_at': now,
+                    'updated_at': now
+                })
+        return rows
+
+    def _max_reminder_days(self) -> int:
+        """Largest reminder day in use, so the domain query can skip far-off expiries"""
+        custom_days = [
+            int(day.strip())
+            for (value,) in self.db.query(Domain.custom_reminder_days).filter(
+                Domain.custom_reminder_days.isnot(None)
+            ).distinct()
+            for day in value.split(",") if day.strip().isdigit()
+        ]
+        return max(custom_days + self.default_reminder_days + [0])
+
+    def _reminder_days(self, custom_reminder_days: Optional[str]) -> List[int]:
+        if custom_reminder_days:
+            days = {int(day.strip()) for day in custom_reminder_days.split(",") if day.strip().isdigit()}
+            if days:
+                return sorted(days, reverse=True)
+        return sorted(set(self.default_reminder_days), reverse=True)
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from .http_client import get_http_client
+from .rate_limit import TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class SmsError(Exception):
+    """Raised when a provider does not accept a message"""
+
+class SmsProvider:
+    """Interface for SMS providers"""
+
+    name = "none"
+
+    @property
+    def configured(self) -> bool:
+        """Whether the provider has what it needs to send"""
+        return False
+
+    async def send(self, to_phone: str, body: str, idempotency_key: Optional[str] = None) -> str:
+        """
+        Send one message
+
+        Args:
+            to_phone: Recipient phone number
+            body: Message text
+            idempotency_key: Stable ID for this message, passed on where the provider supports it
+
+        Returns:
+            The provider's message ID
+
+        Raises:
+            SmsError: If the provider refused the message
+        """
+        raise SmsError("No SMS provider configured")
+
+class TwilioSmsProvider(SmsProvider):
+    """
+    Twilio's Messages REST API, called through the shared async HTTP client.
+
+    The Messages API has no documented idempotency mechanism, so the key is
+    not sent; the outbox's attempt marker is what stops resends.
+    """
+
+    name = "twilio"
+    API_URL = "https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+
+    def __init__(self, account_sid: Optional[str], auth_token: Optional[str], from_number: Optional[str]):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.account_sid and self.auth_token and self.from_number)
+
+    async def send(self, to_phone: str, body: str, idempotency_key: Optional[str] = None) -> str:
+        response = await get_http_client().post(
+            self.API_URL.format(account_sid=self.account_sid),
+            data={"To": to_phone, "From": self.from_number, "Body": body},
+            auth=(self.account_sid, self.auth_token)
+        )
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("message", response.text)
+            except ValueError:
+                detail = response.text
+            raise SmsError(f"Twilio returned {response.status_code}: {detail}")
+        return response.json().get("sid", "")
+
+class HttpStubSmsProvider(SmsProvider):
+    """
+    Posts messages as JSON to a local endpoint instead of a real gateway.
+
+    Meant for development and load tests: point SMS_STUB_URL at any HTTP
+    server that accepts {"to", "from", "body"} and answers 2xx, optionally
+    with an "id".
+    """
+
+    name = "http"
+
+    def __init__(self, url: Optional[str], from_number: Optional[str] = None):
+        self.url = url
+        self.from_number = from_number
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url)
+
+    async def send(self, to_phone: str, body: str, idempotency_key: Optional[str] = None) -> str:
+        response = await get_http_client().post(
+            self.url,
+            json={"to": to_phone, "from": self.from_number, "body": body},
+            headers={"Idempotency-Key": idempotency_key} if idempotency_key else None
+        )
+        if response.status_code >= 400:
+            raise SmsError(f"SMS stub returned {response.status_code}: {response.text}")
+        try:
+            return str(response.json().get("id", ""))
+        except ValueError:
+            return ""
+
+def create_sms_provider() -> SmsProvider:
+    """Build the provider selected by SMS_PROVIDER ("twilio", "http" or "none")"""
+    provider = os.getenv("SMS_PROVIDER", "twilio").lower()
+    from_number = os.getenv("TWILIO_PHONE_NUMBER")
+    if provider == "twilio":
+        return TwilioSmsProvider(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"), from_number)
+    if provider == "http":
+        return HttpStubSmsProvider(os.getenv("SMS_STUB_URL"), from_number)
+    return SmsProvider()
+
+class SmsSender:
+    """
+    Sends SMS through a provider with bounded concurrency and a rate limit.
+
+    At most SMS_MAX_CONCURRENCY requests are in flight, and a token bucket
+    keeps the send rate at SMS_RATE_LIMIT messages per second (bursting to
+    SMS_RATE_BURST), matching the per-number caps gateways enforce.
+    """
+
+    def __init__(self, provider: Optional[SmsProvider] = None):
+        self.provider = provider or create_sms_provider()
+        self.max_concurrency = int(os.getenv("SMS_MAX_CONCURRENCY", 10))
+        self.bucket = TokenBucket(
+            float(os.getenv("SMS_RATE_LIMIT", 1)),
+            int(os.getenv("SMS_RATE_BURST", 1))
+        )
+        # Bound to the loop that created it, so built lazily like the WHOIS engine's
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def configured(self) -> bool:
+        return self.provider.configured
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def send(self, to_phone: str, body: str, idempotency_key: Optional[str] = None) -> str:
+        """
+        Send one message within the concurrency and rate limits
+
+        Returns:
+            The provider's message ID
+
+        Raises:
+            SmsError: If no provider is configured or it refused the message
+            httpx.HTTPError: On network errors
+        """
+        if not self.provider.configured:
+            raise SmsError(f"SMS provider '{self.provider.name}' is not configured")
+        self._ensure_loop()
+        async with self._semaphore:
+            await self.bucket.acquire()
+            try:
+                message_id = await self.provider.send(to_phone, body, idempotency_key)
+            except Exception:
+                self.failed += 1
+                raise
+        self.sent += 1
+        return message_id
+
+    async def send_many(self, messages: List[Tuple[str, str]]) -> List[Optional[Exception]]:
+        """
+        Send many messages concurrently
+
+        Args:
+            messages: (phone number, body) pairs
+
+        Returns:
+            For each message, None if it was sent or the exception that stopped it
+        """
+        results = await asyncio.gather(
+            *[self.send(to_phone, body) for to_phone, body in messages],
+            return_exceptions=True
+        )
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get provider, limits and counters"""
+        return {
+            'provider': self.provider.name,
+            'configured': self.provider.configured,
+            'max_concurrency': self.max_concurrency,
+            'rate_limit': self.bucket.to_dict(),
+            'sent': self.sent,
+            'failed': self.failed
+        }
+
+# Global sender instance
+sms_sender = SmsSender()
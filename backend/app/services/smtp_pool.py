@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def is_rejection(error: Exception) -> bool:
+    """Whether the server refused one message for good (5xx) but the session is still usable"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+def is_dropped(error: Exception) -> bool:
+    """Whether the session went away: a disconnect, a socket error or a 421 (server closing)"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(code == 421 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+class SmtpSession:
+    """An authenticated SMTP connection and how much it has been used"""
+
+    def __init__(self, connection: smtplib.SMTP):
+        self.connection = connection
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.connection.quit()
+        except Exception:
+            self.connection.close()
+
+class SmtpPool:
+    """
+    Small pool of persistent SMTP sessions.
+
+    Sessions are opened (connect, STARTTLS, login) on first use and then
+    reused for up to SMTP_MAX_MESSAGES_PER_SESSION messages, so a batch of
+    reminders pays the handshake once per session instead of once per email.
+    All socket work happens on SMTP_POOL_SIZE dedicated threads, never on the
+    event loop. A session that drops (or gets a 421) is replaced and the
+    message retried once. A permanent 5xx refusal of one message keeps the
+    session after RSET; any other error, including a temporary 4xx, discards
+    it. Sessions idle longer than SMTP_IDLE_SECONDS are reopened rather than
+    trusted.
+    """
+
+    def __init__(self):
+        self.smtp_server = os.getenv("SMTP_SERVER")
+        self.smtp_port = int(os.getenv("SMTP_PORT", 587))
+        self.smtp_username = os.getenv("SMTP_USERNAME")
+        self.smtp_password = os.getenv("SMTP_PASSWORD")
+        self.smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+        self.timeout = float(os.getenv("SMTP_TIMEOUT", 30))
+        self.pool_size = int(os.getenv("SMTP_POOL_SIZE", 2))
+        self.max_messages_per_session = int(os.getenv("SMTP_MAX_MESSAGES_PER_SESSION", 100))
+        self.idle_timeout = float(os.getenv("SMTP_IDLE_SECONDS", 60))
+
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="smtp")
+        self._idle: "queue.LifoQueue[SmtpSession]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+
+    @property
+    def configured(self) -> bool:
+        """Whether an SMTP server is set up"""
+        return bool(self.smtp_server)
+
+    def _connect(self) -> SmtpSession:
+        connection = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.smtp_use_tls:
+                connection.starttls()
+            if self.smtp_username and self.smtp_password:
+                connection.login(self.smtp_username, self.smtp_password)
+        except Exception:
+            connection.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return SmtpSession(connection)
+
+    def _checkout(self) -> SmtpSession:
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - session.last_used < self.idle_timeout:
+                return session
+            # Servers drop idle connections; don't find out mid-send
+            session.close()
+
+    def _checkin(self, session: SmtpSession):
+        if session.messages_sent >= self.max_messages_per_session:
+            session.close()
+        else:
+            session.last_used = time.monotonic()
+            self._idle.put(session)
+
+    def _deliver(self, session: SmtpSession, message: Message):
+        session.connection.send_message(message)
+        session.messages_sent += 1
+        with self._lock:
+            self.messages_sent += 1
+
+    def _send_batch(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """Send messages one after another over one session, on a pool thread"""
+        results: List[Optional[Exception]] = []
+        session: Optional[SmtpSession] = None
+        for message in messages:
+            try:
+                if session is None:
+                    session = self._checkout()
+                try:
+                    self._deliver(session, message)
+                except Exception as e:
+                    if not is_dropped(e):
+                        raise
+                    # The session died under us: replace it and try once more
+                    session.connection.close()
+                    with self._lock:
+                        self.reconnects += 1
+                    session = None  # Stays unset if reconnecting fails
+                    session = self._connect()
+                    self._deliver(session, message)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+                if session is not None and is_rejection(e):
+                    # Refused for good; the session itself is fine after RSET
+                    try:
+                        session.connection.rset()
+                    except Exception:
+                        session.connection.close()
+                        session = None
+                elif session is not None:
+                    session.connection.close()
+                    session = None
+
+            if session is not None and session.messages_sent >= self.max_messages_per_session:
+                session.close()
+                session = None
+        if session is not None:
+            self._checkin(session)
+        return results
+
+    async def send(self, message: Message):
+        """
+        Send one message
+
+        Raises:
+            smtplib.SMTPException or OSError: If the message could not be sent
+        """
+        [error] = await self.send_many([message])
+        if error is not None:
+            raise error
+
+    async def send_many(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """
+        Send many messages, spread over the pool's sessions
+
+        Args:
+            messages: Messages to send
+
+        Returns:
+            For each message, None if it was sent or the exception that stopped it
+        """
+        if not messages:
+            return []
+        loop = asyncio.get_running_loop()
+        # Contiguous slices so each session sends its share back to back
+        workers = min(self.pool_size, len(messages))
+        size = -(-len(messages) // workers)
+        slices = [messages[start:start + size] for start in range(0, len(messages), size)]
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, self._send_batch, batch)
+            for batch in slices
+        ])
+        return [error for batch in batches for error in batch]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool configuration and counters"""
+        return {
+            'pool_size': self.pool_size,
+            'idle_sessions': self._idle.qsize(),
+            'connections_opened': self.connections_opened,
+            'messages_sent': self.messages_sent,
+            'reconnects': self.reconnects
+        }
+
+    def close(self):
+        """Close idle sessions and stop the worker threads"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._executor.shutdown(wait=False)
+
+# Global pool instance
+smtp_pool = SmtpPool()
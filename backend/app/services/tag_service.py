@@ -0,0 +1,164 @@
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.database import SessionLocal
+from ..models.domain import Domain
+from ..models.domain_tag import DomainTag
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TAG_MODES = ("any", "all")
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> List[str]:
+    """Trim, lowercase and dedupe tags, dropping empty ones; comma-separated entries are split"""
+    normalized: List[str] = []
+    for entry in tags or []:
+        for tag in entry.split(","):
+            tag = tag.strip().lower()
+            if tag and tag not in normalized:
+                normalized.append(tag)
+    return normalized
+
+class TagService:
+    """
+    Keeps the domain_tags table in step with Domain.tags and queries it.
+
+    Domain.tags stays the comma-separated string the API reads and writes;
+    domain_tags holds one indexed row per (domain, normalized tag) so that
+    filtering and counting by tag never has to load or parse the strings.
+    Whatever writes Domain.tags syncs the domains it wrote, the same way
+    reminders are synced.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.chunk_size = int(os.getenv("TAG_SYNC_CHUNK_SIZE", 5000))
+
+    def sync_domains(self, domain_ids: Iterable[int]) -> int:
+        """
+        Rewrite the tag rows of some domains from their tags column
+
+        Args:
+            domain_ids: Domains whose tags were written
+
+        Returns:
+            Number of tag rows written
+        """
+        domain_ids = list(set(domain_ids))
+        if not domain_ids:
+            return 0
+        try:
+            written = 0
+            for start in range(0, len(domain_ids), self.chunk_size):
+                written += self._sync_chunk(domain_ids[start:start + self.chunk_size])
+            self.db.commit()
+            return written
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to sync tags for {len(domain_ids)} domains: {str(e)}")
+            raise e
+
+    def rebuild_all(self) -> int:
+        """
+        Regenerate the tag rows of every domain
+
+        Returns:
+            Number of tag rows written
+        """
+        try:
+            self.db.query(DomainTag).delete(synchronize_session=False)
+            domain_ids = [row.id for row in self.db.query(Domain.id).filter(Domain.tags.isnot(None))]
+            written = 0
+            for start in range(0, len(domain_ids), self.chunk_size):
+                written += self._sync_chunk(domain_ids[start:start + self.chunk_size], delete_existing=False)
+            self.db.commit()
+            logger.info(f"Rebuilt {written} tag rows for {len(domain_ids)} domains")
+            return written
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to rebuild domain tags: {str(e)}")
+            raise e
+
+    def delete_domain_tags(self, domain_id: int):
+        """Remove a domain's tag rows, in the caller's transaction"""
+        self.db.query(DomainTag).filter(DomainTag.domain_id == domain_id).delete(synchronize_session=False)
+
+    def _sync_chunk(self, domain_ids: List[int], delete_existing: bool = True) -> int:
+        if delete_existing:
+            self.db.query(DomainTag).filter(DomainTag.domain_id.in_(domain_ids)).delete(synchronize_session=False)
+        rows = [
+            {'domain_id': row.id, 'tag': tag}
+            for row in self.db.query(Domain.id, Domain.tags).filter(Domain.id.in_(domain_ids), Domain.tags.isnot(None))
+            for tag in normalize_tags([row.tags])
+        ]
+        if rows:
+            self.db.execute(DomainTag.__table__.insert(), rows)
+        return len(rows)
+
+    def filter(self, query, tags: Optional[Iterable[str]], mode: str = "any"):
+        """
+        Filter a Domain query to domains carrying some tags
+
+        Args:
+            query: Query over Domain (or its columns)
+            tags: Tags to look for; ignored if empty
+            mode: "any" for domains with at least one of the tags, "all" for
+                domains with every one
+
+        Raises:
+            ValueError: On an unknown mode
+        """
+        if mode not in TAG_MODES:
+            raise ValueError(f"Unsupported tag mode: {mode}")
+        tags = normalize_tags(tags)
+        if not tags:
+            return query
+
+        tagged = select(DomainTag.domain_id).where(DomainTag.tag.in_(tags))
+        if mode == "all" and len(tags) > 1:
+            # A domain has each tag at most once, so n rows means all n tags
+            tagged = tagged.group_by(DomainTag.domain_id).having(func.count() == len(tags))
+        return query.filter(Domain.id.in_(tagged))
+
+    def facets(self, domain_query=None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Count domains per tag in one GROUP BY
+
+        Args:
+            domain_query: Only count these domains (a filtered Domain query);
+                None counts every domain straight from the tag index
+            limit: Most tags to return
+
+        Returns:
+            List of {'tag', 'count'}, most used first
+        """
+        count = func.count().label('count')
+        query = self.db.query(DomainTag.tag, count)
+        if domain_query is not None:
+            query = query.filter(DomainTag.domain_id.in_(domain_query.with_entities(Domain.id).statement))
+        rows = query.group_by(DomainTag.tag).order_by(count.desc(), DomainTag.tag).limit(limit)
+        return [{'tag': row.tag, 'count': row.count} for row in rows]
+
+def migrate_domain_tags():
+    """
+    Fill domain_tags from the tags column if it hasn't been yet
+
+    Runs on startup. Only rebuilds when the table is empty while some domain
+    has tags, which is the case right after the table is first created.
+    """
+    db = SessionLocal()
+    try:
+        if db.query(DomainTag.domain_id).first() is not None:
+            return
+        if db.query(Domain.id).filter(Domain.tags.isnot(None), Domain.tags != "").first() is None:
+            return
+        TagService(db).rebuild_all()
+    finally:
+        db.close()
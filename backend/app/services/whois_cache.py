@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from ..models.database import SessionLocal
+from ..models.whois_cache import WhoisCacheEntry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DATE_FIELDS = ('expiration_date', 'registration_date', 'last_updated')
+
+class WhoisCache:
+    """
+    Two-level cache for lookup results.
+
+    A bounded in-memory LRU sits in front of the whois_cache table, so hot
+    names never leave the process and everything else survives restarts.
+    Positive results live for a fraction of the time left until the domain
+    expires (clamped to WHOIS_CACHE_MIN_TTL_MINUTES..WHOIS_CACHE_MAX_TTL_HOURS),
+    which keeps far-off expiries cached for days and near-expiry ones fresh.
+    Names the registry doesn't know get WHOIS_CACHE_NEGATIVE_TTL_MINUTES.
+    Transient failures are never cached.
+
+    The in-memory level is read on the event loop; table reads and writes
+    run on worker threads, so a lookup never blocks the loop on the
+    database.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("WHOIS_CACHE_ENABLED", "true").lower() == "true"
+        self.max_entries = int(os.getenv("WHOIS_CACHE_SIZE", 10000))
+        self.min_ttl = timedelta(minutes=int(os.getenv("WHOIS_CACHE_MIN_TTL_MINUTES", 60)))
+        self.max_ttl = timedelta(hours=int(os.getenv("WHOIS_CACHE_MAX_TTL_HOURS", 168)))
+        self.negative_ttl = timedelta(minutes=int(os.getenv("WHOIS_CACHE_NEGATIVE_TTL_MINUTES", 30)))
+        # Share of the remaining time to expiry a positive result is trusted for
+        self.ttl_fraction = float(os.getenv("WHOIS_CACHE_TTL_FRACTION", 0.05))
+
+        self._entries: "OrderedDict[str, Tuple[datetime, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, domain_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached lookup result
+
+        Args:
+            domain_name: Normalized domain name
+
+        Returns:
+            The cached result or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        now = datetime.utcnow()
+        cached = self._entries.get(domain_name)
+        if cached:
+            expires_at, data = cached
+            if expires_at > now:
+                self._entries.move_to_end(domain_name)
+                self.hits += 1
+                return dict(data)
+            del self._entries[domain_name]
+
+        entry = await asyncio.to_thread(self._load, domain_name)
+        if entry and entry.expires_at > now:
+            data = self._decode(entry.data)
+            self._remember(domain_name, entry.expires_at, data)
+            self.persistent_hits += 1
+            return dict(data)
+
+        self.misses += 1
+        return None
+
+    async def set(self, domain_name: str, data: Dict[str, Any]):
+        """
+        Cache a lookup result if it is cacheable
+
+        Args:
+            domain_name: Normalized domain name
+            data: Result returned by WhoisService
+        """
+        if not self.enabled or not data:
+            return
+
+        is_negative = data.get('error_type') == 'not_found'
+        if 'error' in data and not is_negative:
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + self.get_ttl(data, now)
+        self._remember(domain_name, expires_at, data)
+        await asyncio.to_thread(self._store, domain_name, expires_at, data, is_negative)
+
+    def get_ttl(self, data: Dict[str, Any], now: Optional[datetime] = None) -> timedelta:
+        """Work out how long a result may be served from cache"""
+        if data.get('error_type') == 'not_found':
+            return self.negative_ttl
+
+        expiration_date = data.get('expiration_date')
+        if not isinstance(expiration_date, datetime):
+            return self.min_ttl
+
+        now = now or datetime.utcnow()
+        ttl = (expiration_date - now) * self.ttl_fraction
+        return max(self.min_ttl, min(self.max_ttl, ttl))
+
+    async def invalidate(self, domain_name: str):
+        """Drop a name from both cache levels"""
+        self._entries.pop(domain_name, None)
+        await asyncio.to_thread(self._delete, domain_name)
+
+    def purge_expired(self) -> int:
+        """Delete stale rows from the persistent cache (blocking; run it off the event loop)"""
+        db = SessionLocal()
+        try:
+            deleted = db.query(WhoisCacheEntry).filter(
+                WhoisCacheEntry.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to purge WHOIS cache: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def _delete(self, domain_name: str):
+        db = SessionLocal()
+        try:
+            db.query(WhoisCacheEntry).filter(WhoisCacheEntry.domain_name == domain_name).delete()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to invalidate WHOIS cache for {domain_name}: {str(e)}")
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0
+        }
+
+    def _remember(self, domain_name: str, expires_at: datetime, data: Dict[str, Any]):
+        self._entries[domain_name] = (expires_at, dict(data))
+        self._entries.move_to_end(domain_name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, domain_name: str) -> Optional[WhoisCacheEntry]:
+        db = SessionLocal()
+        try:
+            return db.query(WhoisCacheEntry).filter(WhoisCacheEntry.domain_name == domain_name).first()
+        except Exception as e:
+            logger.warning(f"Failed to read WHOIS cache for {domain_name}: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def _store(self, domain_name: str, expires_at: datetime, data: Dict[str, Any], is_negative: bool):
+        db = SessionLocal()
+        try:
+            db.merge(WhoisCacheEntry(
+                domain_name=domain_name,
+                data=self._encode(data),
+                is_negative=is_negative,
+                expires_at=expires_at,
+                created_at=datetime.utcnow()
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to write WHOIS cache for {domain_name}: {str(e)}")
+        finally:
+            db.close()
+
+    def _encode(self, data: Dict[str, Any]) -> str:
+        return json.dumps(data, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+    def _decode(self, payload: str) -> Dict[str, Any]:
+        data = json.loads(payload)
+        for field in DATE_FIELDS:
+            if isinstance(data.get(field), str):
+                try:
+                    data[field] = datetime.fromisoformat(data[field])
+                except ValueError:
+                    data[field] = None
+        return data
+
+# Global cache instance
+whois_cache = WhoisCache()
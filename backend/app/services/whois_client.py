@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import re
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from .rate_limit import CircuitOpenError
+from .whois_engine import whois_engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IANA_WHOIS_SERVER = "whois.iana.org"
+
+# Registry WHOIS servers for the TLDs we see most. Anything missing is
+# discovered through IANA on first use and remembered for the process.
+WHOIS_SERVERS = {
+    'com': 'whois.verisign-grs.com',
+    'net': 'whois.verisign-grs.com',
+    'org': 'whois.publicinterestregistry.org',
+    'info': 'whois.nic.info',
+    'biz': 'whois.nic.biz',
+    'name': 'whois.nic.name',
+    'edu': 'whois.educause.edu',
+    'gov': 'whois.dotgov.gov',
+    'io': 'whois.nic.io',
+    'co': 'whois.registry.co',
+    'me': 'whois.nic.me',
+    'tv': 'whois.nic.tv',
+    'cc': 'ccwhois.verisign-grs.com',
+    'ai': 'whois.nic.ai',
+    'app': 'whois.nic.google',
+    'dev': 'whois.nic.google',
+    'page': 'whois.nic.google',
+    'xyz': 'whois.nic.xyz',
+    'online': 'whois.nic.online',
+    'site': 'whois.nic.site',
+    'store': 'whois.nic.store',
+    'tech': 'whois.nic.tech',
+    'us': 'whois.nic.us',
+    'ca': 'whois.cira.ca',
+    'uk': 'whois.nic.uk',
+    'ie': 'whois.weare.ie',
+    'de': 'whois.denic.de',
+    'fr': 'whois.nic.fr',
+    'nl': 'whois.domain-registry.nl',
+    'be': 'whois.dns.be',
+    'eu': 'whois.eu',
+    'ch': 'whois.nic.ch',
+    'it': 'whois.nic.it',
+    'es': 'whois.nic.es',
+    'se': 'whois.iis.se',
+    'pl': 'whois.dns.pl',
+    'ru': 'whois.tcinet.ru',
+    'au': 'whois.auda.org.au',
+    'nz': 'whois.irs.net.nz',
+    'jp': 'whois.jprs.jp',
+    'in': 'whois.nixiregistry.in',
+    'br': 'whois.registro.br',
+    'za': 'whois.registry.net.za',
+    'ng': 'whois.nic.net.ng',
+    'ke': 'whois.kenic.or.ke',
+}
+
+# Servers that need something other than the bare domain name as the query
+QUERY_FORMATS = {
+    'whois.verisign-grs.com': 'domain {}',
+    'ccwhois.verisign-grs.com': 'domain {}',
+    'whois.denic.de': '-T dn,ace {}',
+    'whois.jprs.jp': '{}/e',
+}
+
+REFERRAL_PATTERN = re.compile(
+    r'^[ \t]*(?:Registrar WHOIS Server|ReferralServer|refer|whois):[ \t]*(?:r?whois://)?([\w.-]+)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+class WhoisProtocolError(Exception):
+    """Raised when a WHOIS server cannot be reached or misbehaves"""
+
+class WhoisClient:
+    """
+    Native WHOIS (RFC 3912) client built on asyncio streams.
+
+    Resolves the registry server from WHOIS_SERVERS (falling back to IANA),
+    follows thin-registry referrals to the registrar's server and caps every
+    response in both bytes and time. The protocol closes the connection after
+    each answer, so what gets reused across lookups is the server resolution:
+    IANA referrals and DNS answers are cached for the life of the process.
+    """
+
+    def __init__(
+        self,
+        server_map: Optional[Dict[str, str]] = None,
+        port: int = 43,
+        timeout: Optional[float] = None
+    ):
+        self.server_map = dict(WHOIS_SERVERS if server_map is None else server_map)
+        self.port = port
+        self.timeout = timeout if timeout is not None else int(os.getenv("WHOIS_TIMEOUT", 10))
+        self.max_response_bytes = int(os.getenv("WHOIS_MAX_RESPONSE_BYTES", 256 * 1024))
+        self.max_referrals = int(os.getenv("WHOIS_MAX_REFERRALS", 1))
+        self.dns_ttl = int(os.getenv("WHOIS_DNS_TTL", 3600))
+
+        self._addresses: Dict[str, Tuple[float, List[tuple]]] = {}
+
+    async def query(self, domain_name: str) -> str:
+        """
+        Fetch the raw WHOIS response for a domain, following referrals
+
+        Args:
+            domain_name: Normalized domain name
+
+        Returns:
+            Response text, most specific server first
+
+        Raises:
+            WhoisProtocolError: If the registry cannot be queried
+            asyncio.TimeoutError: If a server misses its deadline
+        """
+        server = await self.resolve_server(domain_name)
+        responses = [await self.query_server(server, domain_name)]
+        visited = {server}
+
+        for _ in range(self.max_referrals):
+            referral = self._find_referral(responses[-1])
+            if not referral or referral in visited:
+                break
+            visited.add(referral)
+            try:
+                responses.append(await self.query_server(referral, domain_name))
+            except (WhoisProtocolError, CircuitOpenError, asyncio.TimeoutError, OSError) as e:
+                # The registry answer is still usable on its own
+                logger.warning(f"WHOIS referral to {referral} failed for {domain_name}: {str(e) or 'timed out'}")
+                break
+
+        return "\n".join(reversed(responses))
+
+    async def resolve_server(self, domain_name: str) -> str:
+        """Get the registry WHOIS server for a domain's TLD"""
+        tld = domain_name.rsplit('.', 1)[-1]
+        server = self.server_map.get(tld)
+        if server:
+            return server
+
+        response = await self.query_server(IANA_WHOIS_SERVER, tld)
+        server = self._find_referral(response)
+        if not server:
+            raise WhoisProtocolError(f"No WHOIS server is known for .{tld}")
+
+        logger.info(f"Discovered WHOIS server {server} for .{tld}")
+        self.server_map[tld] = server
+        return server
+
+    async def query_server(self, server: str, query: str) -> str:
+        """
+        Send a single query to a WHOIS server
+
+        Args:
+            server: WHOIS server hostname
+            query: Domain or TLD to ask about
+
+        Returns:
+            Decoded response, truncated to WHOIS_MAX_RESPONSE_BYTES
+        """
+        try:
+            query = query.encode('idna').decode('ascii')
+        except UnicodeError:
+            pass
+        request = QUERY_FORMATS.get(server, '{}').format(query)
+        async with whois_engine.slot(server):
+            return await asyncio.wait_for(self._exchange(server, request), self.timeout)
+
+    async def _exchange(self, server: str, request: str) -> str:
+        host, port = await self._address(server)
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(request.encode('utf-8') + b"\r\n")
+            await writer.drain()
+
+            chunks = []
+            received = 0
+            while received < self.max_response_bytes:
+                chunk = await reader.read(min(65536, self.max_response_bytes - received))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+            else:
+                logger.warning(f"WHOIS response from {server} truncated at {received} bytes")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+        data = b"".join(chunks)
+        if not data:
+            raise WhoisProtocolError(f"Empty response from {server}")
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return data.decode('latin-1')
+
+    async def _address(self, server: str) -> Tuple[str, int]:
+        cached = self._addresses.get(server)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            infos = cached[1]
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                infos = await loop.getaddrinfo(server, self.port, type=socket.SOCK_STREAM)
+            except OSError as e:
+                raise WhoisProtocolError(f"Cannot resolve {server}: {str(e)}")
+            self._addresses[server] = (now + self.dns_ttl, infos)
+
+        address = infos[0][4]
+        return address[0], address[1]
+
+    def _find_referral(self, response: str) -> Optional[str]:
+        match = REFERRAL_PATTERN.search(response)
+        if match:
+            server = match.group(1).lower().rstrip('.')
+            if '.' in server:
+                return server
+        return None
+
+# Global client instance
+whois_client = WhoisClient()
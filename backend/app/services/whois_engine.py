@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from .rate_limit import CircuitBreaker, CircuitOpenError, TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class WhoisEngine:
+    """
+    Process-wide limiter for WHOIS lookups.
+
+    Every lookup holds one global slot plus one slot for the server (or TLD)
+    it talks to, so a slow registry can only tie up its own share of the
+    capacity. Each server also gets a token bucket and a circuit breaker, so
+    a registry that starts throttling us is slowed down and then skipped for
+    a cooling-off period instead of stalling a refresh run. Blocking work
+    runs on a dedicated thread pool with a deadline enforced from the event
+    loop, which works on any thread.
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("WHOIS_MAX_CONCURRENCY", 32))
+        self.per_server_concurrency = int(os.getenv("WHOIS_PER_SERVER_CONCURRENCY", 4))
+        self.timeout = int(os.getenv("WHOIS_TIMEOUT", 10))
+        
+        # Per-server request rate, overridable as "server=rate:burst,..."
+        self.rate_limit = float(os.getenv("WHOIS_RATE_LIMIT", 5))
+        self.rate_burst = int(os.getenv("WHOIS_RATE_BURST", 10))
+        self.rate_overrides = self._parse_rate_overrides(os.getenv("WHOIS_RATE_LIMITS", ""))
+        self.breaker_threshold = int(os.getenv("WHOIS_BREAKER_THRESHOLD", 5))
+        self.breaker_cooldown = float(os.getenv("WHOIS_BREAKER_COOLDOWN", 60))
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+        # Timed-out calls keep their thread until the socket gives up, so the
+        # pool is larger than the number of slots handed out.
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency * 2,
+            thread_name_prefix="whois"
+        )
+
+        # Semaphores are bound to the loop that created them, so they are
+        # built lazily and rebuilt if the running loop changes.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._per_server: Dict[str, asyncio.Semaphore] = {}
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(self.max_concurrency)
+            self._per_server = {}
+
+    def _server_semaphore(self, server: str) -> asyncio.Semaphore:
+        semaphore = self._per_server.get(server)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_server_concurrency)
+            self._per_server[server] = semaphore
+        return semaphore
+
+    def _parse_rate_overrides(self, value: str) -> Dict[str, Tuple[float, int]]:
+        overrides = {}
+        for item in value.split(","):
+            if "=" not in item:
+                continue
+            server, limits = item.split("=", 1)
+            rate, _, burst = limits.partition(":")
+            try:
+                overrides[server.strip().lower()] = (float(rate), int(burst or self.rate_burst))
+            except ValueError:
+                logger.warning(f"Ignoring invalid WHOIS rate limit override: {item}")
+        return overrides
+
+    def _bucket(self, server: str) -> TokenBucket:
+        bucket = self._buckets.get(server)
+        if bucket is None:
+            rate, burst = self.rate_overrides.get(server, (self.rate_limit, self.rate_burst))
+            bucket = TokenBucket(rate, burst)
+            self._buckets[server] = bucket
+        return bucket
+
+    def _breaker(self, server: str) -> CircuitBreaker:
+        breaker = self._breakers.get(server)
+        if breaker is None:
+            breaker = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+            self._breakers[server] = breaker
+        return breaker
+
+    @asynccontextmanager
+    async def slot(self, server: str):
+        """
+        Hold a per-server slot, a rate-limit token and a global slot for the
+        duration of a lookup
+
+        Any exception raised inside the block counts as a failure against the
+        server's circuit breaker.
+
+        Raises:
+            CircuitOpenError: If the server's breaker is open
+        """
+        self._ensure_loop()
+        breaker = self._breaker(server)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {server}, failing fast")
+
+        try:
+            # The global slot is taken last so calls waiting on a throttled
+            # server don't hold capacity other servers could use
+            async with self._server_semaphore(server):
+                await self._bucket(server).acquire()
+                async with self._global:
+                    yield
+        except Exception:
+            breaker.record_failure()
+            if breaker.state == CircuitBreaker.OPEN:
+                logger.warning(f"Circuit opened for WHOIS server {server}")
+            raise
+        except BaseException:
+            # Cancelled while waiting or running, release a half-open trial
+            breaker.trial_in_progress = False
+            raise
+        else:
+            breaker.record_success()
+
+    async def run_blocking(
+        self,
+        server: str,
+        func: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Run a blocking callable off the event loop within the server's limits
+
+        Args:
+            server: WHOIS server or TLD the call talks to
+            func: Blocking callable
+            timeout: Deadline in seconds, defaults to WHOIS_TIMEOUT
+
+        Returns:
+            The callable's return value
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passes first
+        """
+        deadline = timeout if timeout is not None else self.timeout
+        async with self.slot(server):
+            loop = asyncio.get_running_loop()
+            call = functools.partial(func, *args, **kwargs)
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, call), deadline)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get slot usage, rate limiter and circuit breaker state per server"""
+        servers = {}
+        for server in sorted(set(self._buckets) | set(self._breakers)):
+            semaphore = self._per_server.get(server)
+            servers[server] = {
+                'in_use': self.per_server_concurrency - semaphore._value if semaphore else 0,
+                'rate_limit': self._bucket(server).to_dict(),
+                'circuit_breaker': self._breaker(server).to_dict()
+            }
+        return {
+            'max_concurrency': self.max_concurrency,
+            'per_server_concurrency': self.per_server_concurrency,
+            'available_slots': self._global._value if self._global else self.max_concurrency,
+            'servers': servers
+        }
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False)
+
+# Global engine instance
+whois_engine = WhoisEngine()
@@ -0,0 +1,282 @@
+import re
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+class WhoisNotFoundError(Exception):
+    """Raised when a WHOIS response says the domain is not registered"""
+
+# Field labels in priority order: when a response has several of a field's
+# labels, the value under the earliest label in the list wins, wherever it
+# sits in the text. ICANN-format labels come first since gTLD registries and
+# nearly every registrar use them, with the registry's own label ahead of the
+# registrar's; the rest cover the ccTLD and legacy registrar formats we have
+# seen in the wild.
+FIELD_LABELS = {
+    'expiration_date': [
+        'Registry Expiry Date', 'Registrar Registration Expiration Date',
+        'Expiration Date', 'Expiry Date', 'Expire Date', 'Expires On', 'Expires',
+        'Expiration Time', 'Domain Expiration Date', 'paid-till', 'Valid Until',
+        'Renewal Date', 'expire', 'Date of expiry', 'free-date',
+    ],
+    'registration_date': [
+        'Creation Date', 'Created On', 'Created', 'Registered on', 'Registration Time',
+        'Domain Registration Date', 'Registration Date', 'Registered', 'Domain Create Date',
+        'Date of registration',
+    ],
+    'registrar': [
+        'Registrar', 'Sponsoring Registrar', 'Registrar Name', 'Registrar Organization',
+        'Registrar of Record', 'registrar-name',
+    ],
+    'name_servers': [
+        'Name Server', 'Nameservers', 'Name Servers', 'nserver', 'Nserver', 'Host Name',
+        'Hostname', 'DNS',
+    ],
+    'status': ['Domain Status', 'Status', 'state'],
+    'admin_email': [
+        'Admin Email', 'Administrative Contact Email', 'Registrant Email', 'Tech Email', 'e-mail',
+    ],
+}
+
+# Labels whose value sits on the following indented line(s) instead of
+# after the colon, e.g. Nominet's "Registrar:\n        Example Ltd".
+BLOCK_LABELS = {
+    'registrar': ['Registrar', 'Registrar Organization'],
+    'name_servers': [
+        'Name servers', 'Nameservers', 'Domain nameservers', 'Domain servers in listed order', 'DNS',
+    ],
+    'status': ['Registration status'],
+}
+
+# (inline pattern, block pattern, label -> priority) for one field
+FieldPatterns = Tuple[Pattern, Optional[Pattern], Dict[str, int]]
+
+# TLD-specific labels, ranked ahead of the generic table
+TLD_LABELS = {
+    'jp': {
+        'expiration_date': ['[Expires on]', '[有効期限]'],
+        'registration_date': ['[Created on]', '[Registered Date]', '[登録年月日]'],
+        'name_servers': ['[Name Server]', '[ネームサーバ]'],
+        'status': ['[Status]', '[状態]'],
+    },
+}
+
+NOT_FOUND_PATTERN = re.compile(
+    r'^\s*(?:No match for|NOT FOUND|No Data Found|No entries found|Domain not found|'
+    r'No matching record|Status:\s*(?:free|AVAILABLE)|The queried object does not exist|'
+    r'This domain name has not been registered|%% No entries found|No information available|'
+    r'Object does not exist|No Object Found|The domain has not been registered)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+# Date cleanup: drop fractions, comments and trailing zone names
+DATE_NOISE = re.compile(r'(?<=:\d\d)\.\d+|\s*\(.*\)$|\s+#.*$|\s+(?:UTC|GMT|JST|CET|CEST|MSK)$', re.IGNORECASE)
+DATE_TZ = re.compile(r'(?<=:\d\d)\s*(?:Z|[+-]\d{2}:?\d{2})$')
+
+DATE_FORMATS = [
+    '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y.%m.%d', '%Y.%m.%d %H:%M:%S',
+    '%Y/%m/%d', '%Y/%m/%d %H:%M:%S', '%Y%m%d', '%d-%b-%Y', '%d-%B-%Y', '%d-%b-%Y %H:%M:%S',
+    '%d.%m.%Y', '%d.%m.%Y %H:%M:%S', '%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y',
+    '%b %d %Y', '%B %d %Y', '%d %b %Y', '%d %B %Y', '%a %b %d %H:%M:%S %Y', '%Y-%b-%d',
+    '%Y. %m. %d.', '%d %b %Y %H:%M:%S', '%Y-%m-%dT%H:%M', '%a %b %d %Y', '%a %b %d %H:%M:%S %Z %Y',
+]
+
+def _inline_pattern(labels: List[str]) -> Pattern:
+    alternatives = '|'.join(re.escape(label) for label in labels)
+    # "Label: value" or "Label.....: value"; bracketed labels ("[Expires on]  value") need
+    # no colon and may carry JPRS-style item letters ("p. [Name Server]")
+    return re.compile(
+        rf'^[ \t]*(?:[a-z]\.[ \t]+)?(?P<label>{alternatives})(?:(?<=\])|[ \t]*\.*[ \t]*:)[ \t]*(?P<value>\S.*?)[ \t]*$',
+        re.IGNORECASE | re.MULTILINE
+    )
+
+def _block_pattern(labels: List[str]) -> Pattern:
+    alternatives = '|'.join(re.escape(label) for label in labels)
+    return re.compile(
+        rf'^[ \t]*(?:{alternatives})[ \t]*:?[ \t]*\r?\n((?:[ \t]+\S.*(?:\r?\n|$))+)',
+        re.IGNORECASE | re.MULTILINE
+    )
+
+class WhoisParser:
+    """
+    Table-driven parser for raw WHOIS responses.
+
+    Field patterns are built from FIELD_LABELS/BLOCK_LABELS plus any TLD
+    overrides, compiled once per TLD and reused for every response. Each
+    field is found in one pass over the text; when several of its labels
+    match, the highest-priority label wins and ties go to the earlier line
+    (the registrar's part of a referral response comes first). Dates go
+    through parse_date, which tries ISO 8601 first and then a list of
+    strptime formats, starting with whichever format matched last.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[str, Dict[str, FieldPatterns]] = {}
+        self._date_formats = list(DATE_FORMATS)
+
+    def _patterns(self, tld: str) -> Dict[str, FieldPatterns]:
+        patterns = self._compiled.get(tld)
+        if patterns is None:
+            overrides = TLD_LABELS.get(tld, {})
+            patterns = {}
+            for field, labels in FIELD_LABELS.items():
+                inline = overrides.get(field, []) + labels
+                block = BLOCK_LABELS.get(field)
+                ranks: Dict[str, int] = {}
+                for rank, label in enumerate(inline):
+                    ranks.setdefault(label.lower(), rank)
+                patterns[field] = (
+                    _inline_pattern(inline),
+                    _block_pattern(block) if block else None,
+                    ranks
+                )
+            self._compiled[tld] = patterns
+        return patterns
+
+    def parse(self, domain_name: str, text: str) -> Dict[str, Any]:
+        """
+        Parse a raw WHOIS response into the standard domain information format
+
+        Args:
+            domain_name: Domain name being queried
+            text: Raw response, most specific server first
+
+        Returns:
+            Parsed domain information
+
+        Raises:
+            WhoisNotFoundError: If the response says the domain is not registered
+        """
+        patterns = self._patterns(domain_name.rsplit('.', 1)[-1])
+
+        expiration_date = self._first_date(patterns['expiration_date'], text)
+        registration_date = self._first_date(patterns['registration_date'], text)
+
+        registrar = self._first_value(patterns['registrar'], text)
+        if not (expiration_date or registrar) and (not text.strip() or NOT_FOUND_PATTERN.search(text)):
+            raise WhoisNotFoundError(domain_name)
+        if registrar:
+            # Nominet and others append a tag, e.g. "Example Ltd [Tag = EXAMPLE]"
+            registrar = re.sub(r'\s*\[Tag = [^\]]*\]$', '', registrar).strip() or None
+
+        name_servers = []
+        for value in self._all_values(patterns['name_servers'], text):
+            server = value.split()[0].lower().rstrip('.')
+            if '.' in server and server not in name_servers:
+                name_servers.append(server)
+
+        status = []
+        for value in self._all_values(patterns['status'], text):
+            if value not in status:
+                status.append(value)
+
+        admin_email = None
+        email = self._first_value(patterns['admin_email'], text)
+        if email:
+            match = EMAIL_PATTERN.search(email)
+            admin_email = match.group(0).lower() if match else None
+
+        return {
+            'domain_name': domain_name,
+            'expiration_date': expiration_date,
+            'registration_date': registration_date,
+            'registrar': registrar,
+            'name_servers': name_servers,
+            'status': status,
+            'admin_email': admin_email,
+            'last_updated': datetime.utcnow()
+        }
+
+    def parse_date(self, value: str) -> Optional[datetime]:
+        """
+        Parse a WHOIS date in any of the formats registries use
+
+        Args:
+            value: Raw date string
+
+        Returns:
+            Naive UTC datetime, or None if the value isn't a recognisable date
+        """
+        value = DATE_NOISE.sub('', value.strip())
+        if not value:
+            return None
+
+        # ISO 8601, by far the most common shape
+        if len(value) >= 10 and value[4] == '-' and value[7] == '-':
+            iso = value.replace('Z', '+00:00')
+            if iso[-5] in '+-' and iso[-3] != ':' and iso[-5:].lstrip('+-').isdigit():
+                iso = iso[:-2] + ':' + iso[-2:]
+            try:
+                parsed = datetime.fromisoformat(iso)
+            except ValueError:
+                parsed = None
+            if parsed is not None:
+                if parsed.tzinfo is not None:
+                    parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+                return parsed
+
+        value = DATE_TZ.sub('', value).strip()
+        for index, date_format in enumerate(self._date_formats):
+            try:
+                parsed = datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+            if index:
+                # Responses arrive in runs from the same registry, keep the winner first
+                self._date_formats.insert(0, self._date_formats.pop(index))
+            return parsed
+        return None
+
+    def _ranked_values(self, patterns: FieldPatterns, text: str) -> Iterator[str]:
+        """Inline values of a field, highest-priority label first, then in text order"""
+        inline, _, ranks = patterns
+        deferred = []
+        for match in inline.finditer(text):
+            rank = ranks.get(match.group('label').lower(), len(ranks))
+            if rank == 0:
+                # Nothing outranks the top label, so callers can stop here without scanning on
+                yield match.group('value')
+            else:
+                deferred.append((rank, match.group('value')))
+        # Stable, so lines under the same label keep their order
+        deferred.sort(key=lambda item: item[0])
+        for _, value in deferred:
+            yield value
+
+    def _first_value(self, patterns: FieldPatterns, text: str) -> Optional[str]:
+        value = next(self._ranked_values(patterns, text), None)
+        if value is not None:
+            return value
+        block = patterns[1]
+        if block:
+            match = block.search(text)
+            if match:
+                lines = [line.strip() for line in match.group(1).splitlines() if line.strip()]
+                if lines:
+                    # Some registries label the first line, e.g. "Name: Example Ltd"
+                    label, _, value = lines[0].partition(':')
+                    return value.strip() if value and label.lower() in ('name', 'organization') else lines[0]
+        return None
+
+    def _all_values(self, patterns: FieldPatterns, text: str) -> List[str]:
+        inline, block, _ = patterns
+        values = [match.group('value') for match in inline.finditer(text)]
+        if not values and block:
+            match = block.search(text)
+            if match:
+                values = [line.strip() for line in match.group(1).splitlines() if line.strip()]
+        return values
+
+    def _first_date(self, patterns: FieldPatterns, text: str) -> Optional[datetime]:
+        for value in self._ranked_values(patterns, text):
+            parsed = self.parse_date(value)
+            if parsed:
+                return parsed
+        return None
+
+# Global parser instance
+whois_parser = WhoisParser()
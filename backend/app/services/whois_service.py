@@ -1,74 +1,135 @@
-import whois
+import asyncio
+import httpx
 import logging
+import random
 from datetime import datetime
 from typing import Optional, Dict, Any
 import os
 from dotenv import load_dotenv
 
+from whois.whois import NICClient
+
+from .rate_limit import CircuitOpenError
+from .rdap_service import RdapService, RdapNotFoundError
+from .whois_cache import whois_cache
+from .whois_client import whois_client, WhoisProtocolError
+from .whois_engine import whois_engine
+from .whois_parser import whois_parser, WhoisNotFoundError
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# In-flight lookups keyed by normalized domain name
+_inflight: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+_inflight_stats = {'lookups': 0, 'coalesced': 0}
+
+def get_inflight_stats() -> Dict[str, int]:
+    """Get counters for lookups started and callers that joined one already running"""
+    return {'in_flight': len(_inflight), **_inflight_stats}
+
+def normalize_domain_name(domain_name: str) -> str:
+    """Reduce user input such as 'https://Example.com/path' to 'example.com'"""
+    domain_name = domain_name.lower().strip()
+    if domain_name.startswith(('http://', 'https://')):
+        domain_name = domain_name.split('://')[1]
+    if '/' in domain_name:
+        domain_name = domain_name.split('/')[0]
+    return domain_name
+
 class WhoisService:
     def __init__(self):
         self.timeout = int(os.getenv("WHOIS_TIMEOUT", 10))
         self.retry_count = int(os.getenv("WHOIS_RETRY_COUNT", 3))
+        self.retry_backoff = float(os.getenv("WHOIS_RETRY_BACKOFF", 1))
+        self.retry_backoff_max = float(os.getenv("WHOIS_RETRY_BACKOFF_MAX", 30))
+        self.backend = os.getenv("WHOIS_BACKEND", "rdap").lower()
+        self.rdap_service = RdapService()
     
-    async def get_domain_info(self, domain_name: str) -> Optional[Dict[str, Any]]:
+    async def get_domain_info(self, domain_name: str, force: bool = False) -> Optional[Dict[str, Any]]:
         """
-        Fetch domain information using WHOIS
+        Fetch domain information, served from the WHOIS cache when fresh
         
         Args:
             domain_name: The domain name to query
+            force: Skip the cache and look the name up again (the result still replaces the cached entry)
             
         Returns:
             Dictionary with domain information or None if failed
         """
-        try:
-            # Clean domain name
-            domain_name = domain_name.lower().strip()
-            if domain_name.startswith(('http://', 'https://')):
-                domain_name = domain_name.split('://')[1]
-            if '/' in domain_name:
-                domain_name = domain_name.split('/')[0]
+        domain_name = normalize_domain_name(domain_name)
+        
+        cached = None if force else await whois_cache.get(domain_name)
+        if cached is not None:
+            logger.debug(f"WHOIS cache hit for domain: {domain_name}")
+            return cached
+        
+        # Callers asking for the same name while a lookup is running share it
+        task = _inflight.get(domain_name)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_cache(domain_name))
+            _inflight[domain_name] = task
+            task.add_done_callback(lambda _: _inflight.pop(domain_name, None))
+        else:
+            _inflight_stats['coalesced'] += 1
+            logger.debug(f"Joining in-flight WHOIS lookup for domain: {domain_name}")
+        
+        # Shield the shared lookup so one caller going away doesn't cancel it for the rest
+        domain_info = await asyncio.shield(task)
+        return dict(domain_info) if domain_info else domain_info
+    
+    async def _fetch_and_cache(self, domain_name: str) -> Optional[Dict[str, Any]]:
+        """Run the shared lookup and cache its result"""
+        _inflight_stats['lookups'] += 1
+        domain_info = await self._fetch_domain_info(domain_name)
+        if domain_info:
+            await whois_cache.set(domain_name, domain_info)
+        return domain_info
+    
+    async def _fetch_domain_info(self, domain_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch domain information using RDAP or WHOIS
+        
+        Args:
+            domain_name: Normalized domain name
             
+        Returns:
+            Dictionary with domain information or None if failed
+        """
+        try:
             logger.info(f"Fetching WHOIS data for domain: {domain_name}")
             
             # Perform WHOIS lookup with retries
             for attempt in range(self.retry_count):
                 try:
-                    # Add timeout to prevent hanging
-                    import signal
-                    
-                    def timeout_handler(signum, frame):
-                        raise TimeoutError("WHOIS lookup timed out")
+                    domain_info = await self._lookup(domain_name)
                     
-                    # Set timeout signal (only works on Unix systems)
-                    try:
-                        signal.signal(signal.SIGALRM, timeout_handler)
-                        signal.alarm(self.timeout)
-                        
-                        w = whois.whois(domain_name)
-                        
-                        signal.alarm(0)  # Cancel timeout
-                        
-                        if w:
-                            return self._parse_whois_data(w, domain_name)
-                        else:
-                            logger.warning(f"WHOIS returned empty data for {domain_name}")
-                            
-                    except (AttributeError, OSError):
-                        # signal.alarm not available on Windows or in some containers
-                        logger.info("Using fallback WHOIS method without timeout")
-                        w = whois.whois(domain_name)
-                        
-                        if w:
-                            return self._parse_whois_data(w, domain_name)
-                        else:
-                            logger.warning(f"WHOIS returned empty data for {domain_name}")
+                    if domain_info:
+                        return domain_info
+                    else:
+                        logger.warning(f"WHOIS returned empty data for {domain_name}")
                     
-                except (TimeoutError, ConnectionError, OSError) as e:
-                    logger.warning(f"WHOIS attempt {attempt + 1} failed for {domain_name}: Network error - {str(e)}")
+                except (WhoisNotFoundError, RdapNotFoundError):
+                    # The registry answered, the name just isn't registered
+                    logger.info(f"No WHOIS record for {domain_name}")
+                    return {
+                        'domain_name': domain_name,
+                        'error': 'Domain not found in WHOIS',
+                        'error_type': 'not_found',
+                        'last_updated': datetime.utcnow()
+                    }
+                except CircuitOpenError as e:
+                    # The server keeps failing, don't add to its load
+                    logger.warning(f"WHOIS lookup skipped for {domain_name}: {str(e)}")
+                    return {
+                        'domain_name': domain_name,
+                        'error': 'WHOIS server is temporarily unavailable. Try again later.',
+                        'error_type': 'circuit_open',
+                        'last_updated': datetime.utcnow()
+                    }
+                except (asyncio.TimeoutError, WhoisProtocolError, httpx.TransportError, ConnectionError, OSError) as e:
+                    error = str(e) or "WHOIS lookup timed out"
+                    logger.warning(f"WHOIS attempt {attempt + 1} failed for {domain_name}: Network error - {error}")
                     if attempt == self.retry_count - 1:
                         logger.error(f"All WHOIS attempts failed for {domain_name}. Network connectivity issues.")
                         return {
@@ -87,6 +148,9 @@ class WhoisService:
                             'error_type': 'whois_error',
                             'last_updated': datetime.utcnow()
                         }
+                
+                if attempt < self.retry_count - 1:
+                    await asyncio.sleep(self._backoff_delay(attempt))
                     
         except Exception as e:
             logger.error(f"Failed to fetch WHOIS data for {domain_name}: {str(e)}")
@@ -97,100 +161,31 @@ class WhoisService:
                 'last_updated': datetime.utcnow()
             }
     
-    def _parse_whois_data(self, whois_data: Any, domain_name: str) -> Dict[str, Any]:
-        """
-        Parse WHOIS data into a standardized format
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter before the next attempt"""
+        ceiling = min(self.retry_backoff_max, self.retry_backoff * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    async def _lookup(self, domain_name: str) -> Optional[Dict[str, Any]]:
+        """Run one lookup against the configured backend"""
+        if self.backend == "rdap":
+            # WHOIS is only used for TLDs without an RDAP service
+            rdap_data = await self.rdap_service.get_domain_info(domain_name)
+            if rdap_data is not None:
+                return rdap_data
         
-        Args:
-            whois_data: Raw WHOIS data
-            domain_name: Domain name being queried
-            
-        Returns:
-            Parsed domain information
-        """
-        try:
-            # Extract expiration date
-            expiration_date = None
-            if hasattr(whois_data, 'expiration_date'):
-                exp_date = whois_data.expiration_date
-                if isinstance(exp_date, list) and exp_date:
-                    expiration_date = exp_date[0]
-                elif isinstance(exp_date, datetime):
-                    expiration_date = exp_date
-                elif isinstance(exp_date, str):
-                    try:
-                        expiration_date = datetime.strptime(exp_date, "%Y-%m-%d")
-                    except ValueError:
-                        pass
-            
-            # Extract registration date
-            registration_date = None
-            if hasattr(whois_data, 'creation_date'):
-                reg_date = whois_data.creation_date
-                if isinstance(reg_date, list) and reg_date:
-                    registration_date = reg_date[0]
-                elif isinstance(reg_date, datetime):
-                    registration_date = reg_date
-                elif isinstance(reg_date, str):
-                    try:
-                        registration_date = datetime.strptime(reg_date, "%Y-%m-%d")
-                    except ValueError:
-                        pass
-            
-            # Extract registrar
-            registrar = None
-            if hasattr(whois_data, 'registrar'):
-                reg = whois_data.registrar
-                if isinstance(reg, list) and reg:
-                    registrar = reg[0]
-                elif isinstance(reg, str):
-                    registrar = reg
-            
-            # Extract name servers
-            name_servers = []
-            if hasattr(whois_data, 'name_servers'):
-                ns = whois_data.name_servers
-                if isinstance(ns, list):
-                    name_servers = [server.lower() for server in ns if server]
-                elif isinstance(ns, str):
-                    name_servers = [ns.lower()]
-            
-            # Extract status
-            status = []
-            if hasattr(whois_data, 'status'):
-                stat = whois_data.status
-                if isinstance(stat, list):
-                    status = stat
-                elif isinstance(stat, str):
-                    status = [stat]
-            
-            # Extract admin email
-            admin_email = None
-            if hasattr(whois_data, 'emails'):
-                emails = whois_data.emails
-                if isinstance(emails, list) and emails:
-                    admin_email = emails[0]
-                elif isinstance(emails, str):
-                    admin_email = emails
-            
-            return {
-                'domain_name': domain_name,
-                'expiration_date': expiration_date,
-                'registration_date': registration_date,
-                'registrar': registrar,
-                'name_servers': name_servers,
-                'status': status,
-                'admin_email': admin_email,
-                'last_updated': datetime.utcnow()
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to parse WHOIS data for {domain_name}: {str(e)}")
-            return {
-                'domain_name': domain_name,
-                'error': str(e),
-                'last_updated': datetime.utcnow()
-            }
+        if self.backend == "python-whois":
+            # Blocking library call, run on the engine's thread pool so the
+            # event loop stays free and the deadline works off the main thread
+            tld = domain_name.rsplit('.', 1)[-1]
+            text = await whois_engine.run_blocking(
+                tld, NICClient().whois_lookup, None, domain_name.encode('idna'), 0,
+                timeout=self.timeout
+            )
+        else:
+            text = await whois_client.query(domain_name)
+        
+        return whois_parser.parse(domain_name, text)
     
     async def verify_domain_exists(self, domain_name: str) -> bool:
         """
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from ..models.database import SessionLocal
+from ..services.domain_service import DomainService
+from ..services.whois_service import WhoisService
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# (domain ID, name, stored expiration date)
+DomainRef = Tuple[int, str, Optional[datetime]]
+
+class DomainCheckPipeline:
+    """
+    Checks a batch of domains with bounded concurrency.
+
+    CHECK_WORKERS lookups run at once (the WHOIS engine still applies its own
+    per-server limits underneath). Results go through a queue to a single
+    writer, which applies them CHECK_WRITE_BATCH_SIZE at a time (or whatever
+    arrived within CHECK_WRITE_INTERVAL_SECONDS) in one transaction on a
+    worker thread, so domain rows cost no per-row queries or commits. The
+    lookups' WHOIS cache reads and writes (one row per result) also run on
+    worker threads, so the event loop never waits on the database. A batch
+    that fails to write is retried once; if it fails again its domains count
+    as failed and the run carries on. Progress is logged every
+    CHECK_PROGRESS_SECONDS.
+    """
+
+    def __init__(self, workers: Optional[int] = None, write_batch_size: Optional[int] = None):
+        self.workers = workers or int(os.getenv("CHECK_WORKERS", 16))
+        self.write_batch_size = write_batch_size or int(os.getenv("CHECK_WRITE_BATCH_SIZE", 200))
+        self.write_interval = float(os.getenv("CHECK_WRITE_INTERVAL_SECONDS", 5))
+        self.progress_interval = float(os.getenv("CHECK_PROGRESS_SECONDS", 30))
+        self.whois_service = WhoisService()
+        self._reset([])
+
+    def _reset(self, domains: List[DomainRef]):
+        self.total = len(domains)
+        self.done = 0
+        self.failed = 0
+        self.written = 0
+        self.write_failed = 0
+        self.started_at = time.monotonic()
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Get counters and throughput for the current (or last) run"""
+        elapsed = time.monotonic() - self.started_at
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - finished
+        return {
+            'total': self.total,
+            'done': self.done,
+            'failed': self.failed,
+            'remaining': remaining,
+            'written': self.written,
+            'write_failed': self.write_failed,
+            'elapsed_seconds': round(elapsed, 1),
+            'rate_per_second': round(rate, 2),
+            'eta_seconds': round(remaining / rate, 1) if rate > 0 else None
+        }
+
+    def _log_progress(self, prefix: str = "Domain check progress"):
+        progress = self.get_progress()
+        logger.info(
+            f"{prefix}: {progress['done']} done, {progress['failed']} failed, "
+            f"{progress['remaining']} remaining, {progress['rate_per_second']}/s"
+        )
+
+    async def run(self, domains: List[DomainRef]) -> Dict[str, Any]:
+        """
+        Check every domain and write the results
+
+        Args:
+            domains: Domains to check as (id, name, expiration_date) tuples
+
+        Returns:
+            Final progress counters
+        """
+        self._reset(domains)
+        if not domains:
+            return self.get_progress()
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for domain in domains:
+            pending.put_nowait(domain)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.write_batch_size * 2)
+
+        writer = asyncio.ensure_future(self._writer(results))
+        workers = [
+            asyncio.ensure_future(self._worker(pending, results))
+            for _ in range(min(self.workers, len(domains)))
+        ]
+        reporter = asyncio.ensure_future(self._reporter())
+        try:
+            await asyncio.gather(*workers)
+            # Tell the writer no more results are coming and let it flush
+            await results.put(None)
+            await writer
+        finally:
+            reporter.cancel()
+            for task in workers + [writer]:
+                task.cancel()
+
+        self._log_progress("Domain check finished")
+        return self.get_progress()
+
+    async def _worker(self, pending: asyncio.Queue, results: asyncio.Queue):
+        while True:
+            try:
+                domain_id, name, expiration_date = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            try:
+                whois_data = await self.whois_service.get_domain_info(name)
+            except Exception as e:
+                logger.error(f"Failed to check domain {name}: {str(e)}")
+                whois_data = None
+
+            if not whois_data or 'error' in whois_data:
+                self.failed += 1
+            else:
+                self.done += 1
+            await results.put((domain_id, name, expiration_date, whois_data))
+
+    async def _writer(self, results: asyncio.Queue):
+        batch: Dict[int, Tuple[str, Optional[datetime], Optional[Dict[str, Any]]]] = {}
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = await asyncio.wait_for(results.get(), self.write_interval)
+            except asyncio.TimeoutError:
+                item = False
+            if item:
+                domain_id, name, expiration_date, whois_data = item
+                batch[domain_id] = (name, expiration_date, whois_data)
+
+            # Write when the batch is full, at the end, or when results trickle in slowly
+            finished = item is None
+            if batch and (finished or len(batch) >= self.write_batch_size
+                          or time.monotonic() - last_flush >= self.write_interval):
+                try:
+                    self.written += await asyncio.to_thread(self._write_batch, batch)
+                except Exception:
+                    self._count_unwritten(batch)
+                batch = {}
+                last_flush = time.monotonic()
+            if finished:
+                return
+
+    def _count_unwritten(self, batch: Dict[int, Tuple[str, Optional[datetime], Optional[Dict[str, Any]]]]):
+        """Move a batch that couldn't be written from done to failed"""
+        for name, expiration_date, whois_data in batch.values():
+            if whois_data and 'error' not in whois_data:
+                self.done -= 1
+                self.failed += 1
+        self.write_failed += len(batch)
+
+    def _write_batch(self, batch: Dict[int, Tuple[str, Optional[datetime], Optional[Dict[str, Any]]]]) -> int:
+        """
+        Write a batch of results, retrying once on a fresh session
+
+        Raises:
+            Exception: The second failure, once the retry has failed too
+        """
+        try:
+            return self._write_batch_once(batch)
+        except Exception as e:
+            logger.warning(f"Failed to write domain check batch of {len(batch)}, retrying: {str(e)}")
+        try:
+            return self._write_batch_once(batch)
+        except Exception as e:
+            logger.error(f"Failed to write domain check batch of {len(batch)}: {str(e)}")
+            raise e
+
+    def _write_batch_once(self, batch: Dict[int, Tuple[str, Optional[datetime], Optional[Dict[str, Any]]]]) -> int:
+        db = SessionLocal()
+        try:
+            domain_service = DomainService(db)
+            now = datetime.utcnow()
+            updates = {
+                domain_id: domain_service.build_whois_updates(name, expiration_date, whois_data, now)
+                for domain_id, (name, expiration_date, whois_data) in batch.items()
+            }
+            written = domain_service.apply_whois_updates(updates)
+
+            # Renewed or changed expiries move their domains' reminders
+            moved = [
+                domain_id for domain_id, values in updates.items()
+                if 'expiration_date' in values and values['expiration_date'] != batch[domain_id][1]
+            ]
+            domain_service.reminder_service.sync_domains(moved)
+            return written
+        finally:
+            db.close()
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._log_progress()
@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import union_all
+from dotenv import load_dotenv
+
+from ..models.database import SessionLocal
+from ..models.notification import Notification, NotificationStatus
+from ..services.reminder_service import add_reminder_listener, remove_reminder_listener
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+class NotificationDispatcher:
+    """
+    Sends pending notifications when they fall due.
+
+    The notifications table stays the source of truth. Every
+    DISPATCH_RECONCILE_SECONDS (and whenever reminders are scheduled) the
+    dispatcher loads the ids of pending rows due within
+    DISPATCH_LOOKAHEAD_MINUTES into a min-heap keyed by scheduled_at, using the
+    (status, scheduled_at) index, along with failed rows whose next attempt
+    falls in the same window. Between reconciliations it sleeps until the
+    earliest entry is due, so a reminder goes out within seconds of its time
+    and an idle dispatcher costs one small query per reconciliation.
+
+    The heap only decides when to wake up; delivery itself goes through the
+    outbox, which claims whatever is due at that moment.
+    """
+
+    def __init__(self, deliver: Callable[[], Awaitable[Dict[str, int]]]):
+        """
+        Args:
+            deliver: Coroutine function that delivers every due notification
+                and returns counts of those 'sent' and 'failed'
+        """
+        self.deliver = deliver
+        self.reconcile_interval = float(os.getenv("DISPATCH_RECONCILE_SECONDS", 300))
+        self.lookahead = timedelta(minutes=int(os.getenv("DISPATCH_LOOKAHEAD_MINUTES", 60)))
+
+        self._heap: List[Tuple[datetime, int]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._reconcile_requested = True
+        self.last_reconciled: Optional[datetime] = None
+        self.dispatched = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start dispatching on the running event loop"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._reconcile_requested = True
+        add_reminder_listener(self.notify)
+        self._task = self._loop.create_task(self._run())
+        logger.info("Notification dispatcher started")
+
+    async def stop(self):
+        """Stop dispatching and wait for the loop to exit"""
+        remove_reminder_listener(self.notify)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Notification dispatcher stopped")
+
+    def notify(self, scheduled_at: Optional[datetime] = None):
+        """
+        Tell the dispatcher that notifications were scheduled
+
+        Safe to call from any thread. Rows beyond the lookahead window are
+        picked up by a later reconciliation, so they don't cause a wakeup.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        if scheduled_at is not None and scheduled_at > datetime.utcnow() + self.lookahead:
+            return
+        self._loop.call_soon_threadsafe(self._request_reconcile)
+
+    def _request_reconcile(self):
+        self._reconcile_requested = True
+        if self._wakeup:
+            self._wakeup.set()
+
+    def reconcile(self):
+        """Reload the heap from the pending rows and retries due within the lookahead window"""
+        now = datetime.utcnow()
+        horizon = now + self.lookahead
+        db = SessionLocal()
+        try:
+            pending = db.query(Notification.scheduled_at.label("due_at"), Notification.id).filter(
+                Notification.status == NotificationStatus.PENDING,
+                Notification.scheduled_at <= horizon
+            )
+            retries = db.query(Notification.next_attempt_at.label("due_at"), Notification.id).filter(
+                Notification.status == NotificationStatus.FAILED,
+                Notification.next_attempt_at <= horizon,
+                Notification.retry_count < Notification.max_retries
+            )
+            rows = db.execute(union_all(pending.statement, retries.statement)).all()
+        finally:
+            db.close()
+
+        self._heap = [(row.due_at, row.id) for row in rows]
+        heapq.heapify(self._heap)
+        self.last_reconciled = now
+        self._reconcile_requested = False
+
+    async def _run(self):
+        next_reconcile = datetime.utcnow()
+        while True:
+            try:
+                now = datetime.utcnow()
+                if self._reconcile_requested or now >= next_reconcile:
+                    self.reconcile()
+                    next_reconcile = now + timedelta(seconds=self.reconcile_interval)
+
+                due = False
+                while self._heap and self._heap[0][0] <= now:
+                    heapq.heappop(self._heap)
+                    due = True
+                if due:
+                    await self._dispatch()
+                    continue
+
+                # Sleep until the next row is due, the next reconciliation, or a wakeup
+                wake_at = min(self._heap[0][0], next_reconcile) if self._heap else next_reconcile
+                self._wakeup.clear()
+                if self._reconcile_requested:
+                    continue
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(),
+                        max(0.0, (wake_at - datetime.utcnow()).total_seconds())
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {str(e)}")
+                await asyncio.sleep(min(self.reconcile_interval, 30))
+                self._reconcile_requested = True
+
+    async def _dispatch(self):
+        # The outbox re-reads what is due, so rows sent, cancelled or
+        # rescheduled since they were queued are left alone
+        totals = await self.deliver()
+        self.dispatched += totals['sent']
+        self.failed += totals['failed']
+        if totals['failed']:
+            # Pick up the retries those failures were just scheduled for
+            self._reconcile_requested = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the dispatcher's queue and counters"""
+        return {
+            'running': self.running,
+            'queued': len(self._heap),
+            'next_due_at': self._heap[0][0] if self._heap else None,
+            'last_reconciled': self.last_reconciled,
+            'dispatched': self.dispatched,
+            'failed': self.failed
+        }
@@ -0,0 +1,492 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import socket
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import and_, bindparam, func, or_, update
+from sqlalchemy.orm import selectinload
+
+from ..models.database import SessionLocal
+from ..models.notification import Notification, NotificationStatus, NotificationType
+from ..services.notification_service import NotificationService
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# (notification ID, error message or None if it was delivered)
+Outcome = Tuple[int, Optional[str]]
+
+def migrate_dead_letters() -> int:
+    """
+    Dead-letter failures that used up their retries before DEAD_LETTER existed
+
+    Runs on startup. Such rows used to sit in FAILED for good, invisible to
+    the dead-letter list and requeue. The outbox dead-letters exhausted
+    failures itself, so after the first run this finds nothing.
+
+    Returns:
+        Number of notifications moved
+    """
+    db = SessionLocal()
+    try:
+        count = db.query(Notification).filter(
+            Notification.status == NotificationStatus.FAILED,
+            Notification.retry_count >= Notification.max_retries
+        ).update({
+            'status': NotificationStatus.DEAD_LETTER,
+            'next_attempt_at': None,
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        if count:
+            logger.info(f"Moved {count} exhausted failed notifications to the dead-letter queue")
+        return count
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to dead-letter exhausted notifications: {str(e)}")
+        raise e
+    finally:
+        db.close()
+
+class NotificationOutbox:
+    """
+    Delivers due notifications from the notifications table, used as an outbox.
+
+    OUTBOX_WORKERS workers each claim up to OUTBOX_BATCH_SIZE due rows by
+    stamping them with a lease (owner and expiry) in one conditional UPDATE,
+    so two workers or two processes never deliver the same row. With digests
+    on, a batch also takes every other due email for the recipients it
+    contains, so each recipient gets one digest rather than one per batch. A
+    claimed batch is loaded together with its domains in a fixed number of
+    queries and delivered concurrently, domain by domain and channel by
+    channel; the worker then records every outcome in one transaction and
+    releases the lease. The lease is renewed while a batch is being
+    delivered, so a slow (rate-limited) batch isn't claimed again mid-send;
+    rows whose lease expired because a worker crashed become claimable
+    again after OUTBOX_LEASE_SECONDS.
+
+    A failed notification is retried at its own next_attempt_at, backing off
+    exponentially from NOTIFICATION_RETRY_BASE_SECONDS up to
+    NOTIFICATION_RETRY_MAX_SECONDS with NOTIFICATION_RETRY_JITTER spread, so
+    an outage's failures come back gradually rather than all at once. Once a
+    notification has failed max_retries times it is moved to DEAD_LETTER and
+    stays there until requeued.
+
+    Claiming a row also stamps attempted_at, in the same UPDATE, just before
+    the batch goes to the providers; recording a failure clears it. A due
+    row that still carries the stamp was being delivered when its worker
+    died, after the provider may already have accepted it, so it is never
+    sent again automatically: it is dead-lettered as possibly sent, and
+    requeueing it is an explicit decision to risk a duplicate. Delivery is
+    therefore at most once across crashes. Every reminder also carries an
+    idempotency key, unique in the table, which goes out as the email
+    Message-ID and the HTTP SMS provider's Idempotency-Key so a requeued
+    resend can still be recognised downstream.
+    """
+
+    def __init__(self, notification_service: NotificationService):
+        self.notification_service = notification_service
+        self.workers = int(os.getenv("OUTBOX_WORKERS", 4))
+        self.batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+        self.lease = timedelta(seconds=int(os.getenv("OUTBOX_LEASE_SECONDS", 300)))
+        self.digest_enabled = os.getenv("EMAIL_DIGEST_ENABLED", "true").lower() == "true"
+        self.retry_base = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", 300))
+        self.retry_max = float(os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", 6 * 3600))
+        self.retry_jitter = float(os.getenv("NOTIFICATION_RETRY_JITTER", 0.2))
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.sent = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    async def run_once(self) -> Dict[str, int]:
+        """
+        Deliver everything that is due, including due retries, with all
+        workers, until nothing is left
+
+        Returns:
+            Counts of notifications sent and failed in this run
+        """
+        totals = {'sent': 0, 'failed': 0}
+        await asyncio.gather(*[
+            self._worker(f"{self.owner_prefix}:{index}", totals)
+            for index in range(self.workers)
+        ])
+        self.sent += totals['sent']
+        self.failed += totals['failed']
+        if totals['sent'] or totals['failed']:
+            logger.info(f"Outbox run: {totals['sent']} sent, {totals['failed']} failed")
+        return totals
+
+    async def _worker(self, owner: str, totals: Dict[str, int]):
+        while True:
+            db = SessionLocal()
+            try:
+                notifications = self.claim(db, owner)
+                if not notifications:
+                    return
+                renewal = asyncio.ensure_future(self._renew_lease(owner, [n.id for n in notifications]))
+                try:
+                    outcomes = await self.deliver(notifications)
+                finally:
+                    renewal.cancel()
+                self.record(db, owner, notifications, outcomes)
+                for _, error in outcomes:
+                    totals['failed' if error else 'sent'] += 1
+            except Exception as e:
+                # Claimed rows keep their attempt stamp and are dead-lettered, not resent, once the lease runs out
+                logger.error(f"Outbox worker {owner} failed: {str(e)}")
+                db.rollback()
+                return
+            finally:
+                db.close()
+
+    def claim(self, db, owner: str) -> List[Notification]:
+        """
+        Lease a batch of due notifications and due retries to a worker
+
+        The lease UPDATE also stamps attempted_at, since the batch goes to the
+        providers straight after. Due rows that still carry a stamp from an
+        earlier claim are dead-lettered instead of being claimed.
+
+        With digests on, the batch is widened to every claimable email for
+        the recipients in it, so it may hold more than OUTBOX_BATCH_SIZE rows.
+
+        Returns:
+            The notifications this worker now owns
+        """
+        while True:
+            now = datetime.utcnow()
+            due = or_(
+                and_(Notification.status == NotificationStatus.PENDING, Notification.scheduled_at <= now),
+                and_(
+                    Notification.status == NotificationStatus.FAILED,
+                    Notification.retry_count < Notification.max_retries,
+                    # Failures from before retries were scheduled have no attempt time
+                    or_(Notification.next_attempt_at.is_(None), Notification.next_attempt_at <= now)
+                )
+            )
+            claimable = and_(due, or_(Notification.lease_expires_at.is_(None), Notification.lease_expires_at < now))
+
+            locking = db.bind.dialect.name == "postgresql"
+            query = db.query(
+                Notification.id, Notification.type, Notification.recipient, Notification.attempted_at
+            ).filter(claimable).order_by(Notification.scheduled_at).limit(self.batch_size)
+            if locking:
+                query = query.with_for_update(skip_locked=True)
+            rows = query.all()
+            if not rows:
+                db.rollback()
+                return []
+
+            interrupted = [row.id for row in rows if row.attempted_at is not None]
+            if interrupted:
+                self._dead_letter_interrupted(db, interrupted, claimable, now)
+                rows = [row for row in rows if row.attempted_at is None]
+                if not rows:
+                    db.commit()
+                    continue
+            ids = {row.id for row in rows}
+
+            # A recipient's due emails all go in this batch, so they become one digest
+            recipients = {row.recipient.strip().lower() for row in rows if row.type == NotificationType.EMAIL}
+            if self.digest_enabled and recipients:
+                query = db.query(Notification.id).filter(
+                    claimable,
+                    Notification.attempted_at.is_(None),
+                    Notification.type == NotificationType.EMAIL,
+                    func.lower(func.trim(Notification.recipient)).in_(recipients)
+                )
+                if locking:
+                    query = query.with_for_update(skip_locked=True)
+                ids.update(row.id for row in query)
+            ids = list(ids)
+
+            # Only rows nobody else leased in the meantime are taken
+            lease_expires_at = now + self.lease
+            db.query(Notification).filter(
+                Notification.id.in_(ids), claimable, Notification.attempted_at.is_(None)
+            ).update(
+                {'lease_owner': owner, 'lease_expires_at': lease_expires_at, 'attempted_at': now},
+                synchronize_session=False
+            )
+            db.commit()
+
+            # Domains come in one extra SELECT for the whole batch, not one per row
+            return db.query(Notification).options(selectinload(Notification.domain)).filter(
+                Notification.id.in_(ids),
+                Notification.lease_owner == owner,
+                Notification.lease_expires_at == lease_expires_at
+            ).all()
+
+    def _dead_letter_interrupted(self, db, notification_ids: List[int], claimable, now: datetime):
+        """Dead-letter rows whose last delivery attempt never recorded an outcome"""
+        count = db.query(Notification).filter(Notification.id.in_(notification_ids), claimable).update({
+            'status': NotificationStatus.DEAD_LETTER,
+            'error_message': "Delivery was interrupted after it started and may have gone out; requeue to send it again",
+            'next_attempt_at': None,
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'updated_at': now
+        }, synchronize_session=False)
+        self.dead_lettered += count
+        logger.warning(f"Dead-lettered {count} notifications whose delivery was interrupted")
+
+    async def _renew_lease(self, owner: str, notification_ids: List[int]):
+        """Keep extending a batch's lease while it is being delivered"""
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            db = SessionLocal()
+            try:
+                db.query(Notification).filter(
+                    Notification.id.in_(notification_ids), Notification.lease_owner == owner
+                ).update({'lease_expires_at': datetime.utcnow() + self.lease}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Failed to renew outbox lease for {owner}: {str(e)}")
+            finally:
+                db.close()
+
+    def record(self, db, owner: str, notifications: List[Notification], outcomes: List[Outcome]):
+        """
+        Write a batch's outcomes and release its lease in one transaction
+
+        Failures are scheduled for their next attempt, or dead-lettered when
+        they have used up their retries. Sent rows are marked sent even if
+        the lease ran out and another worker has dead-lettered them as
+        interrupted, since the message has gone out either way; failures are
+        only written by the lease holder.
+        """
+        now = datetime.utcnow()
+        table = Notification.__table__
+        by_id = {notification.id: notification for notification in notifications}
+        sent_ids = [notification_id for notification_id, error in outcomes if error is None]
+        failures = []
+        for notification_id, error in outcomes:
+            if error is None:
+                continue
+            notification = by_id[notification_id]
+            retry_count = (notification.retry_count or 0) + 1
+            exhausted = retry_count >= (notification.max_retries or 0)
+            failures.append({
+                '_id': notification_id,
+                '_error': error,
+                '_status': NotificationStatus.DEAD_LETTER if exhausted else NotificationStatus.FAILED,
+                '_retry_count': retry_count,
+                '_next_attempt_at': None if exhausted else now + self.retry_delay(retry_count)
+            })
+            if exhausted:
+                self.dead_lettered += 1
+                logger.warning(f"Notification {notification_id} dead-lettered after {retry_count} attempts: {error}")
+        released = {'lease_owner': None, 'lease_expires_at': None, 'updated_at': now}
+
+        if sent_ids:
+            result = db.execute(
+                update(table)
+                .where(table.c.id.in_(sent_ids))
+                .values(
+                    status=NotificationStatus.SENT, sent_at=now, error_message=None,
+                    next_attempt_at=None, **released
+                )
+            )
+            if result.rowcount < len(sent_ids):
+                logger.warning(f"{len(sent_ids) - result.rowcount} sent notifications were gone before they could be recorded")
+        if failures:
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam('_id'), table.c.lease_owner == owner)
+                .values(
+                    status=bindparam('_status'),
+                    error_message=bindparam('_error'),
+                    retry_count=bindparam('_retry_count'),
+                    next_attempt_at=bindparam('_next_attempt_at'),
+                    # The outcome is known, so the next attempt starts clean
+                    attempted_at=None,
+                    **released
+                ),
+                failures
+            )
+        db.commit()
+
+    def retry_delay(self, retry_count: int) -> timedelta:
+        """
+        How long to wait before a notification's next attempt
+
+        Args:
+            retry_count: Failed attempts so far, including the one just made
+
+        Returns:
+            The base delay doubled for every earlier failure, capped, with jitter
+        """
+        delay = min(self.retry_max, self.retry_base * 2 ** max(0, retry_count - 1))
+        delay *= random.uniform(1 - self.retry_jitter, 1 + self.retry_jitter)
+        return timedelta(seconds=delay)
+
+    def dead_letters(self, db, skip: int = 0, limit: int = 100) -> List[Notification]:
+        """Get dead-lettered notifications, most recently failed first"""
+        return db.query(Notification).filter(
+            Notification.status == NotificationStatus.DEAD_LETTER
+        ).order_by(Notification.updated_at.desc(), Notification.id.desc()).offset(skip).limit(limit).all()
+
+    def requeue(self, db, notification_ids: Optional[List[int]] = None) -> int:
+        """
+        Send dead-lettered notifications again, with a fresh set of retries
+
+        Args:
+            notification_ids: Notifications to requeue; all dead letters if None
+
+        Returns:
+            Number of notifications requeued
+        """
+        query = db.query(Notification).filter(Notification.status == NotificationStatus.DEAD_LETTER)
+        if notification_ids is not None:
+            query = query.filter(Notification.id.in_(notification_ids))
+        # Kept FAILED with no retries used, so they are due straight away
+        count = query.update({
+            'status': NotificationStatus.FAILED,
+            'retry_count': 0,
+            'attempted_at': None,
+            'next_attempt_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        logger.info(f"Requeued {count} dead-lettered notifications")
+        return count
+
+    async def deliver(self, notifications: List[Notification]) -> List[Outcome]:
+        """
+        Deliver a batch concurrently
+
+        Digests and each domain's remaining notifications run side by side.
+        Domains must already be loaded on the notifications.
+        """
+        units = []
+        singles = notifications
+        if self.digest_enabled:
+            singles = []
+            by_recipient = defaultdict(list)
+            for notification in notifications:
+                if notification.type == NotificationType.EMAIL and notification.domain:
+                    by_recipient[notification.recipient.strip().lower()].append(notification)
+                else:
+                    singles.append(notification)
+            for group in by_recipient.values():
+                if len(group) == 1:
+                    singles.extend(group)
+                else:
+                    units.append(self._deliver_digest(group))
+
+        by_domain = defaultdict(list)
+        for notification in singles:
+            by_domain[notification.domain_id].append(notification)
+        units.extend(self._deliver_domain(group) for group in by_domain.values())
+
+        results = await asyncio.gather(*units)
+        return [outcome for outcomes in results for outcome in outcomes]
+
+    async def _deliver_domain(self, notifications: List[Notification]) -> List[Outcome]:
+        """Send one domain's notifications on all of their channels at once"""
+        results = await asyncio.gather(*[self._deliver_single(notification) for notification in notifications])
+        return [outcome for outcomes in results for outcome in outcomes]
+
+    async def _deliver_digest(self, notifications: List[Notification]) -> List[Outcome]:
+        """Send one email for several notifications; they all share its outcome"""
+        # One row per domain, at its most urgent reminder
+        domains = {}
+        for notification in notifications:
+            domain = notification.domain
+            entry = domains.get(domain.id)
+            if entry is None or notification.days_before_expiration < entry['days_until_expiration']:
+                domains[domain.id] = {
+                    'domain_name': domain.name,
+                    'expiration_date': domain.expiration_date,
+                    'days_until_expiration': notification.days_before_expiration,
+                    'registrar': domain.registrar,
+                    'renewal_cost': domain.renewal_cost
+                }
+
+        # The digest's key is derived from its members', so a redelivery reuses it
+        keys = sorted(self._idempotency_key(notification) for notification in notifications)
+        digest_key = "digest-" + hashlib.sha256("|".join(keys).encode()).hexdigest()[:32]
+
+        try:
+            success = await self.notification_service.send_email_digest(
+                to_email=notifications[0].recipient,
+                domains=list(domains.values()),
+                message_id=digest_key
+            )
+            error = None if success else "Digest email failed"
+        except Exception as e:
+            error = str(e)
+
+        if error is None:
+            logger.info(f"Sent digest of {len(notifications)} notifications to {notifications[0].recipient}")
+        return [(notification.id, error) for notification in notifications]
+
+    async def _deliver_single(self, notification: Notification) -> List[Outcome]:
+        """Send one notification on its channel"""
+        try:
+            domain = notification.domain
+            if not domain:
+                return [(notification.id, "Domain not found")]
+
+            key = self._idempotency_key(notification)
+            success = False
+
+            if notification.type == NotificationType.EMAIL:
+                success = await self.notification_service.send_email_notification(
+                    to_email=notification.recipient,
+                    domain_name=domain.name,
+                    expiration_date=domain.expiration_date,
+                    days_until_expiration=notification.days_before_expiration,
+                    registrar=domain.registrar,
+                    renewal_cost=domain.renewal_cost,
+                    notes=domain.notes,
+                    message_id=key
+                )
+
+            elif notification.type == NotificationType.SMS:
+                success = await self.notification_service.send_sms_notification(
+                    to_phone=notification.recipient,
+                    domain_name=domain.name,
+                    expiration_date=domain.expiration_date,
+                    days_until_expiration=notification.days_before_expiration,
+                    idempotency_key=key
+                )
+
+            elif notification.type == NotificationType.DESKTOP:
+                success = await self.notification_service.send_desktop_notification(
+                    domain_name=domain.name,
+                    days_until_expiration=notification.days_before_expiration
+                )
+
+            if not success:
+                return [(notification.id, "Notification service returned failure")]
+            logger.info(f"Sent {notification.type.value} notification for domain {domain.name}")
+            return [(notification.id, None)]
+
+        except Exception as e:
+            logger.error(f"Failed to send notification {notification.id}: {str(e)}")
+            return [(notification.id, str(e))]
+
+    def _idempotency_key(self, notification: Notification) -> str:
+        # Rows created before keys existed fall back to their primary key
+        return notification.idempotency_key or f"notification-{notification.id}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get outbox configuration and counters"""
+        return {
+            'workers': self.workers,
+            'batch_size': self.batch_size,
+            'lease_seconds': int(self.lease.total_seconds()),
+            'retry_base_seconds': self.retry_base,
+            'retry_max_seconds': self.retry_max,
+            'sent': self.sent,
+            'failed': self.failed,
+            'dead_lettered': self.dead_lettered
+        }
@@ -2,15 +2,20 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime, timedelta
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
 
 from ..models.database import engine
 from ..models.domain import Domain
-from ..models.notification import Notification, NotificationStatus, NotificationType
 from ..services.domain_service import DomainService
-from ..services.notification_service import NotificationService
+from ..services.notification_service import get_notification_service
+from ..services.reminder_service import ReminderService
+from ..services.whois_cache import whois_cache
+from .check_pipeline import DomainCheckPipeline
+from .notification_dispatcher import NotificationDispatcher
+from .outbox import NotificationOutbox
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -19,27 +24,36 @@ class DomainScheduler:
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        self.notification_service = NotificationService()
+        self.notification_service = get_notification_service()
+        self.check_pipeline = DomainCheckPipeline()
+        self.outbox = NotificationOutbox(self.notification_service)
+        self.dispatcher = NotificationDispatcher(deliver=self.outbox.run_once)
+        self.dispatcher_enabled = os.getenv("NOTIFICATION_DISPATCHER_ENABLED", "true").lower() == "true"
         
         # Configuration
-        self.check_interval_hours = int(os.getenv("CHECK_INTERVAL_HOURS", 24))
+        # How often the refresh queue is polled and how many due domains one run takes
+        self.refresh_poll_minutes = int(os.getenv("REFRESH_POLL_MINUTES", 15))
+        self.refresh_batch_size = int(os.getenv("REFRESH_BATCH_SIZE", 5000))
         self.notification_time_hour = int(os.getenv("NOTIFICATION_TIME_HOUR", 9))
         self.notification_time_minute = int(os.getenv("NOTIFICATION_TIME_MINUTE", 0))
     
     def start(self):
         """Start the scheduler"""
         try:
-            # Schedule domain checks (every X hours)
+            # Poll the refresh queue; each domain's own next_check_at decides when it is checked
             self.scheduler.add_job(
                 self.check_domains_task,
                 'interval',
-                hours=self.check_interval_hours,
+                minutes=self.refresh_poll_minutes,
                 id='check_domains',
                 name='Check Domain Status',
                 replace_existing=True
             )
             
-            # Schedule notification processing (every hour)
+            # Due notifications and retries are sent by the dispatcher as they fall
+            # due; the hourly job is a backstop (and sends everything if it is disabled)
+            if self.dispatcher_enabled:
+                self.dispatcher.start()
             self.scheduler.add_job(
                 self.process_notifications_task,
                 'interval',
@@ -49,6 +63,15 @@ class DomainScheduler:
                 replace_existing=True
             )
             
+            # Rebuild reminders nightly so default-day changes and missed syncs catch up
+            self.scheduler.add_job(
+                self.rebuild_reminders_task,
+                CronTrigger(hour=0, minute=30),
+                id='rebuild_reminders',
+                name='Rebuild Domain Reminders',
+                replace_existing=True
+            )
+            
             # Schedule daily summary (at configured time)
             self.scheduler.add_job(
                 self.daily_summary_task,
@@ -71,11 +94,17 @@ class DomainScheduler:
     def stop(self):
         """Stop the scheduler"""
         try:
-            self.scheduler.shutdown()
+            if self.scheduler.running:
+                self.scheduler.shutdown()
             logger.info("Domain scheduler stopped")
         except Exception as e:
             logger.error(f"Failed to stop scheduler: {str(e)}")
     
+    def run_check_now(self):
+        """Bring the next domain check run forward to now, e.g. after an import queued domains"""
+        if self.scheduler.running and self.scheduler.get_job('check_domains'):
+            self.scheduler.modify_job('check_domains', next_run_time=datetime.now(self.scheduler.timezone))
+    
     async def check_domains_task(self):
         """Background task to check domain status and update WHOIS data"""
         logger.info("Starting domain check task...")
@@ -84,21 +113,24 @@ class DomainScheduler:
         try:
             domain_service = DomainService(db)
             
-            # Get domains that need checking
+            # Plan domains added before scheduling existed, then take the due ones
+            domain_service.plan_unscheduled_domains()
             domains_to_check = domain_service.get_domains_needing_check(
-                hours_since_last_check=self.check_interval_hours
+                limit=self.refresh_batch_size
             )
             
             logger.info(f"Found {len(domains_to_check)} domains to check")
             
-            for domain in domains_to_check:
-                try:
-                    logger.info(f"Checking domain: {domain.name}")
-                    await domain_service.refresh_whois_data(domain.id)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to check domain {domain.name}: {str(e)}")
-                    continue
+            # The pipeline writes through its own sessions, so only plain values go in
+            await self.check_pipeline.run([
+                (domain.id, domain.name, domain.expiration_date)
+                for domain in domains_to_check
+            ])
+            
+            # Keep the persistent WHOIS cache from growing with stale names
+            purged = await asyncio.to_thread(whois_cache.purge_expired)
+            if purged:
+                logger.info(f"Purged {purged} expired WHOIS cache entries")
             
             logger.info("Domain check task completed")
             
@@ -107,51 +139,33 @@ class DomainScheduler:
         finally:
             db.close()
     
+    async def rebuild_reminders_task(self):
+        """Background task to regenerate pending reminders for all domains"""
+        logger.info("Starting reminder rebuild task...")
+        
+        db = self.SessionLocal()
+        try:
+            ReminderService(db).rebuild_all()
+            logger.info("Reminder rebuild task completed")
+            
+        except Exception as e:
+            logger.error(f"Reminder rebuild task failed: {str(e)}")
+        finally:
+            db.close()
+    
     async def process_notifications_task(self):
         """Background task to process pending notifications"""
         logger.info("Starting notification processing task...")
         
-        db = self.SessionLocal()
         try:
-            # Get pending notifications that are due
-            now = datetime.utcnow()
-            pending_notifications = db.query(Notification).filter(
-                Notification.status == NotificationStatus.PENDING,
-                Notification.scheduled_at <= now
-            ).all()
-            
-            logger.info(f"Found {len(pending_notifications)} pending notifications")
-            
-            for notification in pending_notifications:
-                try:
-                    await self._send_notification(notification, db)
-                except Exception as e:
-                    logger.error(f"Failed to send notification {notification.id}: {str(e)}")
-                    notification.mark_failed(str(e))
-                    db.commit()
-            
-            # Retry failed notifications
-            failed_notifications = db.query(Notification).filter(
-                Notification.status == NotificationStatus.FAILED,
-                Notification.retry_count < Notification.max_retries
-            ).all()
-            
-            logger.info(f"Found {len(failed_notifications)} failed notifications to retry")
-            
-            for notification in failed_notifications:
-                try:
-                    await self._send_notification(notification, db)
-                except Exception as e:
-                    logger.error(f"Failed to retry notification {notification.id}: {str(e)}")
-                    notification.mark_failed(str(e))
-                    db.commit()
-            
-            logger.info("Notification processing task completed")
+            # Sends whatever is due, including retries whose backoff has run
+            # out; rows the dispatcher is delivering right now are leased, so
+            # nothing goes out twice
+            totals = await self.outbox.run_once()
+            logger.info(f"Notification processing task completed: {totals['sent']} sent, {totals['failed']} failed")
             
         except Exception as e:
             logger.error(f"Notification processing task failed: {str(e)}")
-        finally:
-            db.close()
     
     async def daily_summary_task(self):
         """Background task to send daily domain summary"""
@@ -179,54 +193,6 @@ class DomainScheduler:
             logger.error(f"Daily summary task failed: {str(e)}")
         finally:
             db.close()
-    
-    async def _send_notification(self, notification: Notification, db):
-        """Send a single notification"""
-        try:
-            domain = notification.domain
-            if not domain:
-                notification.mark_failed("Domain not found")
-                db.commit()
-                return
-            
-            success = False
-            
-            if notification.type == NotificationType.EMAIL:
-                success = await self.notification_service.send_email_notification(
-                    to_email=notification.recipient,
-                    domain_name=domain.name,
-                    expiration_date=domain.expiration_date,
-                    days_until_expiration=notification.days_before_expiration,
-                    registrar=domain.registrar,
-                    renewal_cost=domain.renewal_cost,
-                    notes=domain.notes
-                )
-            
-            elif notification.type == NotificationType.SMS:
-                success = await self.notification_service.send_sms_notification(
-                    to_phone=notification.recipient,
-                    domain_name=domain.name,
-                    expiration_date=domain.expiration_date,
-                    days_until_expiration=notification.days_before_expiration
-                )
-            
-            elif notification.type == NotificationType.DESKTOP:
-                success = await self.notification_service.send_desktop_notification(
-                    domain_name=domain.name,
-                    days_until_expiration=notification.days_before_expiration
-                )
-            
-            if success:
-                notification.mark_sent()
-                logger.info(f"Sent {notification.type.value} notification for domain {domain.name}")
-            else:
-                notification.mark_failed("Notification service returned failure")
-            
-            db.commit()
-            
-        except Exception as e:
-            logger.error(f"Failed to send notification {notification.id}: {str(e)}")
-            raise e
 
 # Global scheduler instance
 scheduler = DomainScheduler() 
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Notification template rendering benchmark
+
+Renders the email, SMS and desktop reminder templates for a set of domains
+the way the code used to (a new NotificationService and get_template call per
+send) and through the shared service with precompiled, memoized templates.
+Each domain is rendered several times, as it is when reminders are retried or
+go out on more than one channel.
+
+Usage (from the backend directory):
+    python benchmarks/bench_templates.py [--domains 200] [--repeats 5]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.notification_service import NotificationService  # noqa: E402
+
+TEMPLATES = ('email_reminder', 'sms_reminder', 'desktop_reminder')
+
+def build_contexts(domains):
+    now = datetime(2026, 1, 1)
+    contexts = []
+    for i in range(domains):
+        days = (7, 14, 30, 90)[i % 4]
+        contexts.append({
+            'domain_name': f"example-{i}.com",
+            'expiration_date': now + timedelta(days=days),
+            'days_until_expiration': days,
+            'registrar': "Example Registrar",
+            'renewal_cost': 12.5,
+            'notes': None
+        })
+    return contexts
+
+def context_for(template_name, context):
+    if template_name == 'desktop_reminder':
+        return {k: context[k] for k in ('domain_name', 'days_until_expiration')}
+    if template_name == 'sms_reminder':
+        return {k: context[k] for k in ('domain_name', 'expiration_date', 'days_until_expiration')}
+    return context
+
+def render_per_call(contexts, repeats):
+    # What every send used to do: build the service, look up the template, render
+    for _ in range(repeats):
+        for context in contexts:
+            for name in TEMPLATES:
+                service = NotificationService()
+                service.template_env.get_template(name).render(**context_for(name, context))
+
+def render_shared(service, contexts, repeats):
+    for _ in range(repeats):
+        for context in contexts:
+            for name in TEMPLATES:
+                service.render(name, **context_for(name, context))
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--domains", type=int, default=200)
+    arg_parser.add_argument("--repeats", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    contexts = build_contexts(args.domains)
+    renders = args.domains * args.repeats * len(TEMPLATES)
+
+    start = time.perf_counter()
+    render_per_call(contexts, args.repeats)
+    before = renders / (time.perf_counter() - start)
+
+    service = NotificationService()
+    start = time.perf_counter()
+    render_shared(service, contexts, args.repeats)
+    after = renders / (time.perf_counter() - start)
+
+    print(f"{renders} renders ({args.domains} domains x {len(TEMPLATES)} templates x {args.repeats})")
+    print(f"  per-call service: {before:12,.0f} renders/sec")
+    print(f"  shared service:   {after:12,.0f} renders/sec   "
+          f"(cache hits {service.render_cache_hits}, misses {service.render_cache_misses})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+WHOIS parser benchmark
+
+Parses every response in benchmarks/whois_corpus with the table-driven
+WhoisParser and with python-whois's parser, checks the extracted fields
+against expected.json and reports accuracy and parses/sec for both.
+
+Usage (from the backend directory):
+    python benchmarks/bench_whois_parser.py [--iterations 200] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.whois_parser import WhoisParser, WhoisNotFoundError  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "whois_corpus")
+FIELDS = ('expiration_date', 'registration_date', 'registrar', 'name_server')
+
+def load_corpus():
+    with open(os.path.join(CORPUS_DIR, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    corpus = []
+    for filename, fields in expected.items():
+        with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+            corpus.append((filename, f.read(), fields))
+    return corpus
+
+def table_parser(parser):
+    def parse(domain_name, text):
+        try:
+            return parser.parse(domain_name, text)
+        except WhoisNotFoundError:
+            return None
+    return parse
+
+def python_whois_parser():
+    from whois.parser import WhoisEntry, PywhoisError
+
+    def first(value):
+        return value[0] if isinstance(value, list) and value else value
+
+    def parse(domain_name, text):
+        try:
+            entry = WhoisEntry.load(domain_name, text)
+        except PywhoisError:
+            return None
+        except Exception:
+            return {}
+        # Same field handling the service used before the table-driven parser
+        result = {
+            'expiration_date': first(getattr(entry, 'expiration_date', None)),
+            'registration_date': first(getattr(entry, 'creation_date', None)),
+            'registrar': first(getattr(entry, 'registrar', None)),
+            'name_servers': getattr(entry, 'name_servers', None) or [],
+        }
+        if isinstance(result['name_servers'], str):
+            result['name_servers'] = [result['name_servers']]
+        for field in ('expiration_date', 'registration_date'):
+            if not isinstance(result[field], datetime):
+                result[field] = None
+        return result
+    return parse
+
+def normalize(field, value):
+    if value is None:
+        return None
+    if field.endswith('_date'):
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        return value.replace(microsecond=0).isoformat()
+    return str(value).strip().lower()
+
+def score(parse, corpus):
+    correct = 0
+    total = 0
+    misses = []
+    for filename, text, expected in corpus:
+        domain_name = expected['domain_name']
+        result = parse(domain_name, text)
+        total += 1
+        if expected['not_found']:
+            if result is None:
+                correct += 1
+            else:
+                misses.append(f"{filename}: expected not found")
+            continue
+        if result is None:
+            misses.append(f"{filename}: reported as not found")
+            total += len(FIELDS) - 1
+            continue
+        for field in FIELDS:
+            if field == 'name_server':
+                servers = [s.lower().rstrip('.') for s in result.get('name_servers') or []]
+                got = servers[0] if servers else None
+            else:
+                got = normalize(field, result.get(field))
+            want = normalize(field, expected[field])
+            if got == want:
+                correct += 1
+            else:
+                misses.append(f"{filename}: {field} = {got!r}, expected {want!r}")
+        total += len(FIELDS) - 1
+    return correct, total, misses
+
+def throughput(parse, corpus, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for _, text, expected in corpus:
+            parse(expected['domain_name'], text)
+    elapsed = time.perf_counter() - start
+    return iterations * len(corpus) / elapsed
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--iterations", type=int, default=200)
+    arg_parser.add_argument("--verbose", action="store_true", help="List every field that was missed")
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"Corpus: {len(corpus)} responses, {len({e['domain_name'].rsplit('.', 1)[-1] for _, _, e in corpus})} TLDs")
+
+    parsers = [("table-driven", table_parser(WhoisParser()))]
+    try:
+        parsers.append(("python-whois", python_whois_parser()))
+    except ImportError:
+        print("python-whois not installed, skipping baseline")
+
+    for name, parse in parsers:
+        correct, total, misses = score(parse, corpus)
+        rate = throughput(parse, corpus, args.iterations)
+        print(f"{name:>14}: {rate:10,.0f} parses/sec   accuracy {correct}/{total} ({correct / total:.1%})")
+        if args.verbose:
+            for miss in misses:
+                print(f"{'':>16}{miss}")
+
+if __name__ == "__main__":
+    main()
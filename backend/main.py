@@ -6,8 +6,18 @@ import os
 from dotenv import load_dotenv
 
 from app.models.database import create_tables, connect_db, disconnect_db
+from app.models.domain import pinned_time
 from app.api.domains import router as domains_router
 from app.api.notifications import router as notifications_router
+from app.api.whois import router as whois_router
+from app.services.domain_search import domain_search
+from app.services.http_client import close_http_client
+from app.services.tag_service import migrate_domain_tags
+from app.services.notification_service import get_notification_service
+from app.services.smtp_pool import smtp_pool
+from app.services.whois_engine import whois_engine
+from app.tasks.outbox import migrate_dead_letters
+from app.tasks.scheduler import scheduler
 
 # Load environment variables
 load_dotenv()
@@ -27,18 +37,35 @@ async def lifespan(app: FastAPI):
     
     # Create database tables
     create_tables()
+    domain_search.install()
+    migrate_domain_tags()
+    migrate_dead_letters()
     logger.info("Database tables created/verified")
     
     # Connect to database
     await connect_db()
     logger.info("Database connected")
     
+    # Build the shared notification service (and compile its templates) up front
+    get_notification_service()
+    
+    # Background jobs; disable on extra replicas so jobs run once
+    scheduler_enabled = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    if scheduler_enabled:
+        scheduler.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down DomainPing API...")
+    if scheduler_enabled:
+        await scheduler.dispatcher.stop()
+        scheduler.stop()
     await disconnect_db()
     logger.info("Database disconnected")
+    await close_http_client()
+    whois_engine.shutdown()
+    smtp_pool.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -77,11 +104,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+class RequestTimeMiddleware:
+    """Pin one "now" per request, so every domain status and day count in a response agrees"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with pinned_time():
+            await self.app(scope, receive, send)
+
+app.add_middleware(RequestTimeMiddleware)
+
 # Include routers
 app.include_router(domains_router, prefix="/api")
 app.include_router(notifications_router, prefix="/api")
+app.include_router(whois_router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+# The app builds its engine from DATABASE_URL at import time, so point it at a
+# throwaway database before any test imports it
+_db_dir = tempfile.mkdtemp(prefix="domainping-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import pytest_asyncio
+
+class StubHttpServer:
+    """
+    Local HTTP server for provider stand-ins
+
+    Every request is recorded and answered by respond(method, path, headers,
+    body), which returns (status, JSON body). Requests are served on threads,
+    so a slow respond() sees real concurrency.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                stub.requests.append((self.command, self.path, dict(self.headers), body))
+                status, payload = stub.respond(self.command, self.path, self.headers, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest_asyncio.fixture
+async def shared_http_client():
+    """Close the process-wide HTTP client after the test, since each test runs on its own loop"""
+    from app.services.http_client import close_http_client
+    yield
+    await close_http_client()
+
+@pytest.fixture
+def db():
+    """A session on the test database, emptied of domains and notifications"""
+    from app.models.database import SessionLocal, create_tables
+    from app.models.domain import Domain
+    from app.models.domain_tag import DomainTag
+    from app.models.notification import Notification
+    create_tables()
+    session = SessionLocal()
+    for model in (Notification, DomainTag, Domain):
+        session.query(model).delete()
+    session.commit()
+    yield session
+    session.close()
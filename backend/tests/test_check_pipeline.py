@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from app.tasks.check_pipeline import DomainCheckPipeline
+
+DOMAINS = [(i, f"domain{i}.com", None) for i in range(1, 6)]
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = DomainCheckPipeline(workers=2, write_batch_size=100)
+
+    async def lookup(name, force=False):
+        return {'domain_name': name}
+
+    monkeypatch.setattr(pipeline.whois_service, "get_domain_info", lookup)
+    return pipeline
+
+def failing_writes(monkeypatch, pipeline, failures):
+    attempts = []
+
+    def write(batch):
+        attempts.append(len(batch))
+        if len(attempts) <= failures:
+            raise RuntimeError("database is locked")
+        return len(batch)
+
+    monkeypatch.setattr(pipeline, "_write_batch_once", write)
+    return attempts
+
+@pytest.mark.asyncio
+async def test_failed_write_is_retried_once(monkeypatch, pipeline):
+    attempts = failing_writes(monkeypatch, pipeline, failures=1)
+    progress = await pipeline.run(DOMAINS)
+    assert attempts == [5, 5]
+    assert progress['done'] == 5
+    assert progress['written'] == 5
+    assert progress['write_failed'] == 0
+
+@pytest.mark.asyncio
+async def test_batch_that_cannot_be_written_counts_as_failed(monkeypatch, pipeline):
+    attempts = failing_writes(monkeypatch, pipeline, failures=2)
+    progress = await pipeline.run(DOMAINS)
+    assert attempts == [5, 5]
+    assert progress['done'] == 0
+    assert progress['failed'] == 5
+    assert progress['written'] == 0
+    assert progress['write_failed'] == 5
+    assert progress['remaining'] == 0
+
+@pytest.mark.asyncio
+async def test_cache_reads_and_writes_stay_off_the_event_loop(monkeypatch, db):
+    from app.services.whois_cache import whois_cache
+
+    pipeline = DomainCheckPipeline(workers=2, write_batch_size=100)
+    threads = []
+
+    async def fetch(name):
+        return {'domain_name': name}
+
+    def tracked(method):
+        def call(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+        return call
+
+    monkeypatch.setattr(pipeline.whois_service, "_fetch_domain_info", fetch)
+    monkeypatch.setattr(pipeline, "_write_batch_once", lambda batch: len(batch))
+    monkeypatch.setattr(whois_cache, "_load", tracked(whois_cache._load))
+    monkeypatch.setattr(whois_cache, "_store", tracked(whois_cache._store))
+    for _, name, _ in DOMAINS:
+        await whois_cache.invalidate(name)
+
+    progress = await pipeline.run(DOMAINS)
+    assert progress['done'] == 5
+    # One read and one write per domain, none of them on the loop's thread
+    assert len(threads) == 10
+    assert threading.get_ident() not in threads
@@ -0,0 +1,19 @@
+import json
+from datetime import datetime, timedelta
+
+import app.services.domain_service as domain_service_module
+from app.models.domain import Domain, pinned_time
+from app.services.export_service import ExportService
+
+def test_status_filter_and_rows_share_the_export_time(db, monkeypatch):
+    now = datetime.utcnow()
+    db.add(Domain(name="warning.com", expiration_date=now + timedelta(days=20)))
+    db.commit()
+
+    with pinned_time(now):
+        chunks = ExportService().stream("ndjson", status_filter="warning")
+    # By the time the generator runs its query the clock has moved on a lot
+    monkeypatch.setattr(domain_service_module, "current_time", lambda: now + timedelta(days=15))
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+
+    assert [(row['name'], row['status']) for row in rows] == [("warning.com", "warning")]
@@ -0,0 +1,187 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database import SessionLocal
+from app.models.domain import Domain
+from app.models.notification import Notification, NotificationStatus, NotificationType
+from app.services.reminder_service import ReminderService
+from app.tasks.outbox import NotificationOutbox, migrate_dead_letters
+
+class RecordingNotificationService:
+    """Stands in for NotificationService and remembers what it was asked to send"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.digests = []
+        self.emails = []
+
+    async def _wait(self):
+        await asyncio.sleep(self.delay)
+
+    async def send_email_digest(self, to_email, domains, message_id):
+        await self._wait()
+        self.digests.append((to_email, len(domains), message_id))
+        return True
+
+    async def send_email_notification(self, to_email, domain_name, message_id, **kwargs):
+        await self._wait()
+        self.emails.append((to_email, domain_name, message_id))
+        return True
+
+    async def send_sms_notification(self, **kwargs):
+        return True
+
+    async def send_desktop_notification(self, **kwargs):
+        return True
+
+def add_domains(db, count, prefix="domain", **fields):
+    now = datetime.utcnow()
+    domains = [
+        Domain(name=f"{prefix}{i}.com", expiration_date=now + timedelta(days=20), desktop_notifications=False, **fields)
+        for i in range(count)
+    ]
+    db.add_all(domains)
+    db.commit()
+    return [domain.id for domain in domains]
+
+def add_reminders(db, domain_ids, recipient="owner@example.com"):
+    now = datetime.utcnow()
+    db.execute(Notification.__table__.insert(), [
+        {
+            'domain_id': domain_id, 'type': NotificationType.EMAIL, 'status': NotificationStatus.PENDING,
+            'days_before_expiration': 14, 'message': "Renew soon", 'recipient': recipient,
+            'scheduled_at': now - timedelta(minutes=1), 'retry_count': 0, 'max_retries': 3,
+            'idempotency_key': f"test-{domain_id}-{recipient}", 'created_at': now, 'updated_at': now
+        }
+        for domain_id in domain_ids
+    ])
+    db.commit()
+
+def make_outbox(service, batch_size=100, workers=4):
+    outbox = NotificationOutbox(service)
+    outbox.batch_size = batch_size
+    outbox.workers = workers
+    outbox.digest_enabled = True
+    return outbox
+
+@pytest.mark.asyncio
+async def test_each_recipient_gets_one_digest_across_batches(db):
+    add_reminders(db, add_domains(db, 250))
+    other = Domain(name="other.com", expiration_date=datetime.utcnow() + timedelta(days=20))
+    another = Domain(name="another.com", expiration_date=datetime.utcnow() + timedelta(days=20))
+    db.add_all([other, another])
+    db.commit()
+    add_reminders(db, [other.id, another.id], recipient="Other@Example.com")
+
+    service = RecordingNotificationService()
+    totals = await make_outbox(service, batch_size=100).run_once()
+
+    assert totals == {'sent': 252, 'failed': 0}
+    assert sorted((to, count) for to, count, _ in service.digests) == [
+        ("Other@Example.com", 2), ("owner@example.com", 250)
+    ]
+    assert service.emails == []
+
+@pytest.mark.asyncio
+async def test_lease_is_renewed_while_a_slow_batch_is_delivered(db):
+    add_reminders(db, add_domains(db, 1))
+    service = RecordingNotificationService(delay=0.6)
+    outbox = make_outbox(service, workers=1)
+    outbox.lease = timedelta(seconds=0.3)
+    intruder = make_outbox(RecordingNotificationService())
+    stolen = []
+
+    async def try_to_steal():
+        # Runs while the first worker is mid-send, well past its original lease
+        await asyncio.sleep(0.45)
+        other = SessionLocal()
+        try:
+            stolen.extend(intruder.claim(other, "intruder"))
+        finally:
+            other.close()
+
+    thief = asyncio.ensure_future(try_to_steal())
+    totals = await outbox.run_once()
+    await thief
+
+    assert totals == {'sent': 1, 'failed': 0}
+    assert stolen == []
+    assert len(service.emails) == 1
+
+@pytest.mark.asyncio
+async def test_interrupted_delivery_is_dead_lettered_not_resent(db):
+    add_reminders(db, add_domains(db, 3))
+    crashed = make_outbox(RecordingNotificationService())
+    claimed = [n.id for n in crashed.claim(db, "worker-a")]
+    # The worker dies mid-send and its lease runs out without an outcome recorded
+    db.query(Notification).update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    service = RecordingNotificationService()
+    outbox = make_outbox(service)
+    assert await outbox.run_once() == {'sent': 0, 'failed': 0}
+    assert service.digests == [] and service.emails == []
+    assert outbox.dead_lettered == 3
+    db.expire_all()
+    assert {n.id for n in outbox.dead_letters(db)} == set(claimed)
+
+    # Requeueing is the explicit decision to send again
+    assert outbox.requeue(db) == 3
+    assert await outbox.run_once() == {'sent': 3, 'failed': 0}
+
+def test_recorded_failure_clears_the_attempt(db):
+    add_reminders(db, add_domains(db, 1))
+    outbox = make_outbox(RecordingNotificationService())
+    [notification] = outbox.claim(db, "worker-a")
+    assert notification.attempted_at is not None
+    outbox.record(db, "worker-a", [notification], [(notification.id, "SMTP 451")])
+    db.query(Notification).update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    [retry] = outbox.claim(db, "worker-b")
+    assert retry.id == notification.id
+    assert retry.status == NotificationStatus.FAILED
+
+def test_sync_leaves_started_reminders_alone(db):
+    [domain_id] = add_domains(db, 1, admin_email="owner@example.com")
+    reminders = ReminderService(db)
+    assert reminders.sync_domains([domain_id]) > 0
+    started = db.query(Notification).filter(Notification.domain_id == domain_id).order_by(Notification.scheduled_at).first()
+    started_id, started_key = started.id, started.idempotency_key
+    # Stamped by a claim whose worker has since died, so the lease is gone too
+    db.query(Notification).filter(Notification.id == started_id).update({
+        'attempted_at': datetime.utcnow(), 'lease_owner': "worker-a",
+        'lease_expires_at': datetime.utcnow() - timedelta(minutes=5)
+    })
+    db.commit()
+    total = db.query(Notification).count()
+
+    reminders.sync_domains([domain_id])
+    reminders.rebuild_all()
+
+    assert db.query(Notification).count() == total
+    kept = db.query(Notification).filter(Notification.idempotency_key == started_key).one()
+    assert kept.id == started_id
+    assert kept.attempted_at is not None
+
+def test_exhausted_failures_are_dead_lettered_once(db):
+    add_reminders(db, add_domains(db, 3))
+    [exhausted, retrying, pending] = [n.id for n in db.query(Notification).order_by(Notification.id)]
+    db.query(Notification).filter(Notification.id == exhausted).update(
+        {'status': NotificationStatus.FAILED, 'retry_count': 3}
+    )
+    db.query(Notification).filter(Notification.id == retrying).update(
+        {'status': NotificationStatus.FAILED, 'retry_count': 1}
+    )
+    db.commit()
+
+    assert migrate_dead_letters() == 1
+    assert migrate_dead_letters() == 0
+    statuses = dict(db.query(Notification.id, Notification.status))
+    assert statuses == {
+        exhausted: NotificationStatus.DEAD_LETTER,
+        retrying: NotificationStatus.FAILED,
+        pending: NotificationStatus.PENDING
+    }
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import engine
+from tests.test_outbox import RecordingNotificationService, add_domains, add_reminders, make_outbox
+
+@contextmanager
+def count_statements():
+    """Count the SQL statements sent to the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+async def claim_and_deliver(db, size):
+    """Statements spent claiming a batch of size reminders, each for its own domain and recipient, and delivering it"""
+    domain_ids = add_domains(db, size, prefix=f"batch{size}-")
+    for domain_id in domain_ids:
+        add_reminders(db, [domain_id], recipient=f"owner{domain_id}@example.com")
+    db.expire_all()
+    service = RecordingNotificationService()
+    outbox = make_outbox(service, batch_size=size)
+
+    with count_statements() as statements:
+        notifications = outbox.claim(db, "worker")
+        outcomes = await outbox.deliver(notifications)
+        outbox.record(db, "worker", notifications, outcomes)
+
+    assert len(notifications) == size
+    assert len(service.emails) == size
+    return len(statements)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [50, 200])
+async def test_batch_costs_the_same_statements_as_a_single_notification(db, size):
+    single = await claim_and_deliver(db, 1)
+    assert await claim_and_deliver(db, size) == single
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.rate_limit import CircuitBreaker, CircuitOpenError
+from app.services.rdap_service import RdapNotFoundError, RdapService
+from app.services.whois_engine import whois_engine
+from tests.conftest import StubHttpServer
+
+DOMAIN_OBJECT = {
+    "objectClassName": "domain",
+    "ldhName": "EXAMPLE.COM",
+    "status": ["client transfer prohibited"],
+    "events": [
+        {"eventAction": "registration", "eventDate": "1995-08-14T04:00:00Z"},
+        {"eventAction": "expiration", "eventDate": "2030-08-13T04:00:00Z"}
+    ],
+    "entities": [{
+        "roles": ["registrar"],
+        "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "Example Registrar, Inc."]]]
+    }],
+    "nameservers": [{"ldhName": "A.IANA-SERVERS.NET"}]
+}
+
+def answer_with(status, payload=None):
+    return lambda method, path, headers, body: (status, payload or {"errorCode": status})
+
+@pytest.fixture
+def rdap_stub(shared_http_client):
+    servers = []
+
+    def start(respond):
+        stub = StubHttpServer(respond).__enter__()
+        servers.append(stub)
+        return stub, RdapService(base_urls={'com': f"{stub.url}/rdap/"}), stub.url.split("/")[2]
+
+    yield start
+    for stub in servers:
+        stub.__exit__()
+        whois_engine._breakers.pop(stub.url.split("/")[2], None)
+
+@pytest.mark.asyncio
+async def test_domain_lookup(rdap_stub):
+    stub, rdap, _ = rdap_stub(answer_with(200, DOMAIN_OBJECT))
+
+    info = await rdap.get_domain_info("example.com")
+
+    assert stub.requests[0][1] == "/rdap/domain/example.com"
+    assert stub.requests[0][2]["Accept"] == "application/rdap+json"
+    assert info['expiration_date'].isoformat() == "2030-08-13T04:00:00"
+    assert info['registrar'] == "Example Registrar, Inc."
+    assert info['name_servers'] == ["a.iana-servers.net"]
+
+@pytest.mark.asyncio
+async def test_unknown_domain_is_not_found_without_tripping_the_breaker(rdap_stub):
+    _, rdap, server = rdap_stub(answer_with(404))
+
+    for _ in range(whois_engine.breaker_threshold + 1):
+        with pytest.raises(RdapNotFoundError):
+            await rdap.get_domain_info("missing.com")
+
+    assert whois_engine._breaker(server).state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [429, 503])
+async def test_throttling_and_server_errors_open_the_breaker(rdap_stub, status):
+    stub, rdap, server = rdap_stub(answer_with(status))
+
+    for _ in range(whois_engine.breaker_threshold):
+        with pytest.raises(Exception) as raised:
+            await rdap.get_domain_info("example.com")
+        assert not isinstance(raised.value, CircuitOpenError)
+    assert whois_engine._breaker(server).state == CircuitBreaker.OPEN
+
+    # Refused locally while open
+    with pytest.raises(CircuitOpenError):
+        await rdap.get_domain_info("example.com")
+    assert len(stub.requests) == whois_engine.breaker_threshold
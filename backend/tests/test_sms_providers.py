@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+
+import pytest
+
+from app.services.sms_providers import HttpStubSmsProvider, SmsError, SmsSender, TwilioSmsProvider
+from tests.conftest import StubHttpServer
+
+class SlowGateway:
+    """Answers every message after a delay and records how many were in flight at once"""
+
+    def __init__(self, delay=0.0, status=200):
+        self.delay = delay
+        self.status = status
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.arrivals = []
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, headers, body):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.arrivals.append(time.monotonic())
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return self.status, {'id': f"msg-{json.loads(body)['to']}"}
+
+def make_sender(monkeypatch, url, rate, burst, concurrency):
+    monkeypatch.setenv("SMS_RATE_LIMIT", str(rate))
+    monkeypatch.setenv("SMS_RATE_BURST", str(burst))
+    monkeypatch.setenv("SMS_MAX_CONCURRENCY", str(concurrency))
+    return SmsSender(HttpStubSmsProvider(f"{url}/sms", "+15550000000"))
+
+@pytest.mark.asyncio
+async def test_message_reaches_the_gateway(monkeypatch, shared_http_client):
+    with StubHttpServer(SlowGateway()) as stub:
+        sender = make_sender(monkeypatch, stub.url, rate=0, burst=1, concurrency=1)
+        message_id = await sender.send("+15551234567", "example.com expires in 7 days", "outbox-42")
+    assert message_id == "msg-+15551234567"
+    [(method, path, headers, body)] = stub.requests
+    assert (method, path) == ("POST", "/sms")
+    assert headers["Idempotency-Key"] == "outbox-42"
+    assert json.loads(body) == {'to': "+15551234567", 'from': "+15550000000", 'body': "example.com expires in 7 days"}
+
+@pytest.mark.asyncio
+async def test_twilio_request_shape(shared_http_client):
+    with StubHttpServer(lambda *request: (201, {'sid': "SM123"})) as stub:
+        provider = TwilioSmsProvider("AC123", "secret", "+15550000000")
+        provider.API_URL = stub.url + "/Accounts/{account_sid}/Messages.json"
+        message_id = await provider.send("+15551234567", "hello", "reminder-1-sms-7-202610170900")
+    assert message_id == "SM123"
+    [(method, path, headers, body)] = stub.requests
+    assert path == "/Accounts/AC123/Messages.json"
+    assert body == "To=%2B15551234567&From=%2B15550000000&Body=hello"
+    # Twilio documents no idempotency header for the Messages API
+    assert not any("idempotency" in header.lower() for header in headers)
+
+@pytest.mark.asyncio
+async def test_gateway_errors_raise_sms_error(monkeypatch, shared_http_client):
+    with StubHttpServer(SlowGateway(status=503)) as stub:
+        sender = make_sender(monkeypatch, stub.url, rate=0, burst=1, concurrency=1)
+        with pytest.raises(SmsError):
+            await sender.send("+15551234567", "hello")
+    assert sender.get_stats()['failed'] == 1
+
+@pytest.mark.asyncio
+async def test_send_rate_is_limited(monkeypatch, shared_http_client):
+    gateway = SlowGateway()
+    with StubHttpServer(gateway) as stub:
+        sender = make_sender(monkeypatch, stub.url, rate=20, burst=1, concurrency=10)
+        started = time.monotonic()
+        results = await sender.send_many([(f"+1555000{i:04d}", "hello") for i in range(8)])
+        elapsed = time.monotonic() - started
+    assert results == [None] * 8
+    # 20/s is one message every 50ms after the first; connection setup can
+    # bunch arrivals up by one slot, but never get ahead of the bucket
+    assert elapsed >= 7 * 0.05 * 0.95
+    for i, arrival in enumerate(gateway.arrivals[1:], start=1):
+        assert arrival - started >= (i - 1) * 0.05 * 0.95
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(monkeypatch, shared_http_client):
+    gateway = SlowGateway(delay=0.2)
+    with StubHttpServer(gateway) as stub:
+        sender = make_sender(monkeypatch, stub.url, rate=0, burst=1, concurrency=3)
+        results = await sender.send_many([(f"+1555000{i:04d}", "hello") for i in range(9)])
+    assert results == [None] * 9
+    assert gateway.max_in_flight == 3
+    assert sender.get_stats()['sent'] == 9
@@ -0,0 +1,172 @@
+import socketserver
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from app.services.smtp_pool import SmtpPool
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP server that accepts everything except a few test recipients
+
+    rejected@ gets a 550, deferred@ a 451, and closing@ a 421 followed by a
+    hang-up the first time it is seen. With drop_after set, the server hangs
+    up on a session once it has taken that many messages.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, drop_after=None):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.delivered = []
+        self.resets = 0
+        self.closed_once = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        sink = self.server
+        with sink._lock:
+            sink.connections += 1
+        taken = 0
+        recipients = []
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 ok")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ").lower()
+                if address.startswith("rejected@"):
+                    self.reply("550 no such user")
+                elif address.startswith("deferred@"):
+                    self.reply("451 try again later")
+                elif address.startswith("closing@") and address not in sink.closed_once:
+                    sink.closed_once.add(address)
+                    self.reply("421 closing connection")
+                    return
+                else:
+                    recipients.append(address)
+                    self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with sink._lock:
+                    sink.delivered.extend(recipients)
+                taken += 1
+                self.reply("250 queued")
+                if sink.drop_after and taken >= sink.drop_after:
+                    return
+            elif verb == "RSET":
+                with sink._lock:
+                    sink.resets += 1
+                self.reply("250 ok")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+def message(to):
+    msg = EmailMessage()
+    msg["From"] = "alerts@domainping.test"
+    msg["To"] = to
+    msg["Subject"] = "Domain expiring"
+    msg.set_content("Renew soon.")
+    return msg
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    pools = []
+
+    def make(sink):
+        monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+        monkeypatch.setenv("SMTP_PORT", str(sink.server_address[1]))
+        monkeypatch.setenv("SMTP_USE_TLS", "false")
+        monkeypatch.setenv("SMTP_USERNAME", "")
+        monkeypatch.setenv("SMTP_POOL_SIZE", "1")
+        monkeypatch.setenv("SMTP_TIMEOUT", "5")
+        pool = SmtpPool()
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+@pytest.mark.asyncio
+async def test_one_connection_carries_many_messages(make_pool):
+    with SmtpSink() as sink:
+        pool = make_pool(sink)
+        results = await pool.send_many([message(f"user{i}@example.com") for i in range(20)])
+        await pool.send(message("later@example.com"))
+    assert results == [None] * 20
+    assert sink.connections == 1
+    assert len(sink.delivered) == 21
+    assert pool.get_stats()['connections_opened'] == 1
+
+@pytest.mark.asyncio
+async def test_reconnects_after_the_server_drops_the_session(make_pool):
+    with SmtpSink(drop_after=3) as sink:
+        pool = make_pool(sink)
+        results = await pool.send_many([message(f"user{i}@example.com") for i in range(7)])
+    assert results == [None] * 7
+    assert sorted(sink.delivered) == sorted(f"user{i}@example.com" for i in range(7))
+    assert sink.connections == 3
+    assert pool.get_stats()['reconnects'] == 2
+
+@pytest.mark.asyncio
+async def test_permanent_rejection_keeps_the_session(make_pool):
+    with SmtpSink() as sink:
+        pool = make_pool(sink)
+        results = await pool.send_many([
+            message("a@example.com"), message("rejected@example.com"), message("b@example.com")
+        ])
+    assert results[0] is None and results[2] is None
+    assert results[1] is not None
+    assert sink.connections == 1
+    assert sink.delivered == ["a@example.com", "b@example.com"]
+
+@pytest.mark.asyncio
+async def test_temporary_failure_discards_the_session(make_pool):
+    with SmtpSink() as sink:
+        pool = make_pool(sink)
+        results = await pool.send_many([
+            message("a@example.com"), message("deferred@example.com"), message("b@example.com")
+        ])
+    assert results[0] is None and results[2] is None
+    assert results[1] is not None
+    assert sink.connections == 2
+    assert sink.delivered == ["a@example.com", "b@example.com"]
+
+@pytest.mark.asyncio
+async def test_421_reconnects_and_retries_the_message(make_pool):
+    with SmtpSink() as sink:
+        pool = make_pool(sink)
+        results = await pool.send_many([message("a@example.com"), message("closing@example.com")])
+    assert results == [None, None]
+    assert sink.connections == 2
+    assert sink.delivered == ["a@example.com", "closing@example.com"]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from app.services.whois_client import WhoisClient
+from app.services.whois_engine import whois_engine
+
+REGISTRY = "127.0.0.1"
+REGISTRAR = "127.0.0.2"
+
+REGISTRY_RESPONSE = f"""Domain Name: EXAMPLE.COM
+Registrar WHOIS Server: {REGISTRAR}
+Registry Expiry Date: 2030-01-01T00:00:00Z
+"""
+REGISTRAR_RESPONSE = """Domain Name: example.com
+Registrar: Example Registrar, Inc.
+Registrar Registration Expiration Date: 2030-01-01T00:00:00Z
+"""
+
+class StubWhoisServer:
+    """Answers WHOIS queries on the registry and registrar loopback addresses with fixed responses"""
+
+    def __init__(self, responses, delay=0.0):
+        self.responses = responses
+        self.delay = delay
+        self.queries = []
+        self.servers = []
+        self.handlers = []
+        self.port = None
+
+    async def _handle(self, reader, writer):
+        self.handlers.append(asyncio.current_task())
+        query = (await reader.readline()).decode().strip()
+        host = writer.get_extra_info("sockname")[0]
+        self.queries.append((host, query))
+        await asyncio.sleep(self.delay)
+        writer.write(self.responses[host].encode())
+        await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        first = await asyncio.start_server(self._handle, REGISTRY, 0)
+        self.port = first.sockets[0].getsockname()[1]
+        self.servers = [first, await asyncio.start_server(self._handle, REGISTRAR, self.port)]
+        return self
+
+    async def __aexit__(self, *exc):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        for handler in self.handlers:
+            handler.cancel()
+
+def make_client(port, timeout=2):
+    return WhoisClient(server_map={'com': REGISTRY}, port=port, timeout=timeout)
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    yield
+    whois_engine._breakers.clear()
+
+@pytest.mark.asyncio
+async def test_follows_referral_to_registrar():
+    responses = {REGISTRY: REGISTRY_RESPONSE, REGISTRAR: REGISTRAR_RESPONSE}
+    async with StubWhoisServer(responses) as stub:
+        response = await make_client(stub.port).query("example.com")
+
+    assert stub.queries == [(REGISTRY, "example.com"), (REGISTRAR, "example.com")]
+    # Most specific server first
+    assert response.index("Example Registrar") < response.index("Registry Expiry Date")
+
+@pytest.mark.asyncio
+async def test_open_breaker_on_registrar_keeps_registry_answer():
+    for _ in range(whois_engine.breaker_threshold):
+        whois_engine._breaker(REGISTRAR).record_failure()
+
+    responses = {REGISTRY: REGISTRY_RESPONSE, REGISTRAR: REGISTRAR_RESPONSE}
+    async with StubWhoisServer(responses) as stub:
+        response = await make_client(stub.port).query("example.com")
+
+    assert response == REGISTRY_RESPONSE
+    assert [host for host, _ in stub.queries] == [REGISTRY]
+
+@pytest.mark.asyncio
+async def test_response_is_capped_in_bytes():
+    responses = {REGISTRY: "Domain Name: EXAMPLE.COM\n" + "x" * 100000}
+    async with StubWhoisServer(responses) as stub:
+        client = make_client(stub.port)
+        client.max_response_bytes = 1024
+        response = await client.query("example.com")
+
+    assert len(response.encode()) == 1024
+
+@pytest.mark.asyncio
+async def test_slow_server_times_out():
+    async with StubWhoisServer({REGISTRY: REGISTRY_RESPONSE}, delay=5) as stub:
+        with pytest.raises(asyncio.TimeoutError):
+            await make_client(stub.port, timeout=0.3).query("example.com")
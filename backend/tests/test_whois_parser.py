@@ -0,0 +1,40 @@
+import os
+from datetime import datetime
+
+from app.services.whois_parser import WhoisParser
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "whois_corpus")
+
+# How WhoisClient joins a referral: the registrar's answer, then the registry's
+REGISTRAR_THEN_REGISTRY = """\
+Domain Name: example.com
+Registrar WHOIS Server: whois.example-registrar.test
+Registrar Registration Expiration Date: 2026-01-01T00:00:00Z
+Registrar: Example Registrar, Inc.
+Admin Email: hostmaster@example.com
+
+Domain Name: EXAMPLE.COM
+Registry Expiry Date: 2027-01-01T00:00:00Z
+Registrar: Example Registrar, Inc.
+Registrant Email: owner@example.com
+"""
+
+def test_registry_expiry_outranks_the_registrar_date_before_it():
+    parsed = WhoisParser().parse("example.com", REGISTRAR_THEN_REGISTRY)
+    assert parsed['expiration_date'] == datetime(2027, 1, 1)
+    assert parsed['registrar'] == "Example Registrar, Inc."
+    # Admin Email outranks Registrant Email whichever comes first
+    assert parsed['admin_email'] == "hostmaster@example.com"
+
+def test_lower_priority_label_is_used_when_the_top_one_is_missing():
+    text = "Domain Name: example.com\nRegistrar Registration Expiration Date: 2026-01-01T00:00:00Z\n"
+    assert WhoisParser().parse("example.com", text)['expiration_date'] == datetime(2026, 1, 1)
+
+def test_unparseable_top_label_falls_back_to_the_next():
+    text = "Expires: soon\nRegistry Expiry Date: not available\nExpiration Date: 2026-05-01\n"
+    assert WhoisParser().parse("example.com", text)['expiration_date'] == datetime(2026, 5, 1)
+
+def test_referral_response_in_the_corpus_takes_the_registry_date():
+    with open(os.path.join(CORPUS_DIR, "google.com.txt"), encoding="utf-8") as f:
+        parsed = WhoisParser().parse("google.com", f.read())
+    assert parsed['expiration_date'] == datetime(2028, 9, 14, 4, 0)
@@ -0,0 +1,62 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app.models.database import create_tables
+from app.services.whois_cache import whois_cache
+from app.services.whois_service import WhoisService
+
+@pytest_asyncio.fixture
+async def service(monkeypatch):
+    create_tables()
+    await whois_cache.invalidate("example.com")
+    service = WhoisService()
+    lookups = []
+
+    async def fetch(domain_name):
+        lookups.append(domain_name)
+        return {'domain_name': domain_name, 'expiration_date': datetime.utcnow() + timedelta(days=365)}
+
+    monkeypatch.setattr(service, "_fetch_domain_info", fetch)
+    yield service, lookups
+    await whois_cache.invalidate("example.com")
+
+@pytest.mark.asyncio
+async def test_cached_answer_is_reused(service):
+    service, lookups = service
+    await service.get_domain_info("example.com")
+    await service.get_domain_info("example.com")
+    assert lookups == ["example.com"]
+
+@pytest.mark.asyncio
+async def test_force_skips_the_cache_and_refreshes_it(service):
+    service, lookups = service
+    first = await service.get_domain_info("example.com")
+    forced = await service.get_domain_info("example.com", force=True)
+    assert lookups == ["example.com", "example.com"]
+    assert forced['expiration_date'] > first['expiration_date']
+    # The forced answer replaced the cached one
+    assert (await service.get_domain_info("example.com"))['expiration_date'] == forced['expiration_date']
+    assert len(lookups) == 2
+
+@pytest.mark.asyncio
+async def test_persistent_cache_is_read_off_the_event_loop(service, monkeypatch):
+    service, lookups = service
+    await service.get_domain_info("example.com")
+    # Forget the in-memory copy so the next read goes to the table
+    whois_cache._entries.clear()
+    loop_thread = threading.get_ident()
+    threads = []
+    load = whois_cache._load
+
+    def tracking_load(domain_name):
+        threads.append(threading.get_ident())
+        return load(domain_name)
+
+    monkeypatch.setattr(whois_cache, "_load", tracking_load)
+    cached = await service.get_domain_info("example.com")
+    assert cached['domain_name'] == "example.com"
+    assert lookups == ["example.com"]
+    assert threads and loop_thread not in threads